@@ -1,9 +1,25 @@
-from flask import Flask, request, jsonify
+import json
+
+from flask import Flask, Response, request, jsonify, stream_with_context
 from pipeline import RAGPipeline
+from encoding import get_embedding_cache
+from filter_search import get_filter_catalog
+from retrieval_cache import get_retrieval_cache
+from semantic_cache import get_semantic_cache
+from rerank_cache import get_rerank_cache
+from candidate_depth import get_candidate_depth_stats
+from rerank_service import get_rerank_service
+from generation_scheduler import get_generation_scheduler
+from prefix_cache import get_prefix_cache
+from generation_cache import get_generation_cache
+from token_cache import get_passage_token_cache
+from registry import get_model_registry
 
 app = Flask(__name__)
 
 # Initialize BOTH pipelines ONCE
+# (they share one LLM, reranker and Pinecone client through the model registry,
+# plus the process-wide caches)
 print("Initializing RAG Pipelines...")
 baseline_pipeline = RAGPipeline(use_reranking=False)
 hybrid_pipeline = RAGPipeline(use_reranking=True)
@@ -23,6 +39,10 @@ def serialize_chunks(chunks):
         if 'rerank_score' in chunk:
             chunk_data['rerank_score'] = float(chunk.get('rerank_score', 0))
         
+        # Add IDs of near-duplicate chunks collapsed into this one
+        if chunk.get('duplicate_ids'):
+            chunk_data['duplicate_ids'] = list(chunk['duplicate_ids'])
+        
         # Add all metadata fields
         if 'metadata' in chunk:
             metadata = chunk['metadata']
@@ -41,6 +61,60 @@ def serialize_chunks(chunks):
 def health():
     return jsonify({"status": "healthy", "gpu": "available"})
 
+@app.route('/stats', methods=['GET'])
+def stats():
+    rerank_service = get_rerank_service()
+    generation_scheduler = get_generation_scheduler()
+    prefix_cache = get_prefix_cache()
+    return jsonify({
+        "models_loaded": get_model_registry().loaded(),
+        "embedding_cache": get_embedding_cache().stats(),
+        "retrieval_cache": get_retrieval_cache().stats(),
+        "semantic_cache": get_semantic_cache().stats(),
+        "rerank_cache": get_rerank_cache().stats(),
+        "rerank_service": rerank_service.stats() if rerank_service is not None else None,
+        "passage_token_cache": get_passage_token_cache().stats(),
+        "generation_scheduler": generation_scheduler.stats() if generation_scheduler is not None else None,
+        "prefix_cache": prefix_cache.stats() if prefix_cache is not None else None,
+        "generation_cache": get_generation_cache().stats(),
+        "candidate_depth": get_candidate_depth_stats().stats()
+    })
+
+def parse_query_request(data):
+    """
+    Extract and validate the parameters of a query request.
+
+    An empty query with filters is a filter-only search.
+
+    Returns:
+        Tuple of (query_text, filters, mode, error message or None)
+    """
+    query_text = data.get('query', '')
+    filters = data.get('filters', {})
+    mode = data.get('mode', 'hybrid')  # Default to hybrid
+
+    # Validate query_text
+    if not isinstance(query_text, str):
+        return query_text, filters, mode, "query must be a string"
+
+    # Validate filters
+    if not isinstance(filters, dict):
+        return query_text, filters, mode, "filters must be a dictionary"
+    if not query_text.strip():
+        if not filters:
+            return query_text, filters, mode, "query cannot be empty without filters"
+        query_text = ""  # Filter-only search
+
+    # Validate mode
+    if mode not in ['hybrid', 'baseline']:
+        return query_text, filters, mode, "mode must be 'hybrid' or 'baseline'"
+
+    return query_text, filters, mode, None
+
+def sse_event(event, data):
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @app.route('/query', methods=['POST'])
 def query():
     try:
@@ -48,26 +122,9 @@ def query():
         if not request.json:
             return jsonify({"error": "No JSON data provided"}), 400
 
-        data = request.json
-
-        # Extract and validate parameters
-        query_text = data.get('query', '')
-        filters = data.get('filters', {})
-        mode = data.get('mode', 'hybrid')  # Default to hybrid
-
-        # Validate query_text
-        if not isinstance(query_text, str):
-            return jsonify({"error": "query must be a string"}), 400
-        if not query_text.strip():
-            return jsonify({"error": "query cannot be empty"}), 400
-
-        # Validate filters
-        if not isinstance(filters, dict):
-            return jsonify({"error": "filters must be a dictionary"}), 400
-
-        # Validate mode
-        if mode not in ['hybrid', 'baseline']:
-            return jsonify({"error": "mode must be 'hybrid' or 'baseline'"}), 400
+        query_text, filters, mode, error = parse_query_request(request.json)
+        if error:
+            return jsonify({"error": error}), 400
 
         # Select pipeline based on mode
         pipeline = hybrid_pipeline if mode == 'hybrid' else baseline_pipeline
@@ -76,16 +133,107 @@ def query():
         # Serialize chunks to JSON-safe format
         serialized_chunks = serialize_chunks(retrieved_chunks)
 
-        return jsonify({
+        result = {
             "response": llm_output,
             "chunks": serialized_chunks,
             "mode": mode
-        })
+        }
+        if not query_text:
+            # Filter-only: the chunks are the first page; 'next_cursor' continues at /filter
+            result.update(pipeline.filter_only_page(filters, retrieved_chunks))
+
+        return jsonify(result)
 
     except Exception as e:
         # Log the error and return a 500 response
         print(f"Error processing query: {str(e)}")
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
+@app.route('/query/stream', methods=['POST'])
+def query_stream():
+    """
+    Server-sent events version of /query.
+
+    Events: 'chunks' (the retrieved chunks, as soon as retrieval finishes),
+    'token' ({"text": ...} per decoded piece of the answer), then 'done'
+    (timing stats in seconds), or 'error' if the pipeline fails midway.
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "No JSON data provided"}), 400
+
+    query_text, filters, mode, error = parse_query_request(data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    pipeline = hybrid_pipeline if mode == 'hybrid' else baseline_pipeline
+
+    def events():
+        stages = pipeline.run_stream(query_text, filters)
+        try:
+            for event, payload in stages:
+                if event == 'chunks':
+                    chunks_event = {"chunks": serialize_chunks(payload), "mode": mode}
+                    if not query_text:
+                        chunks_event.update(pipeline.filter_only_page(filters, payload))
+                    yield sse_event('chunks', chunks_event)
+                elif event == 'token':
+                    yield sse_event('token', {"text": payload})
+                else:
+                    yield sse_event('done', payload)
+        except Exception as e:
+            print(f"Error streaming query: {str(e)}")
+            yield sse_event('error', {"error": f"Internal server error: {str(e)}"})
+        finally:
+            # Runs when the client disconnects, too: stops the LLM decoding for nobody
+            stages.close()
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/filter', methods=['POST'])
+def filter_only():
+    """Filter-only search: one page of matching chunks plus facet counts."""
+    try:
+        filter_catalog = get_filter_catalog()
+        if filter_catalog is None:
+            return jsonify({"error": "filter-only search requires METADATA_CATALOG_PATH to be set"}), 503
+
+        data = request.get_json(silent=True) or {}
+
+        filters = data.get('filters', {})
+        cursor = data.get('cursor')
+        page_size = data.get('page_size')  # None: Config.FILTER_ONLY_PAGE_SIZE
+        include_facets = data.get('facets', cursor is None)  # Facets default to the first page only
+
+        # Validate parameters
+        if not isinstance(filters, dict):
+            return jsonify({"error": "filters must be a dictionary"}), 400
+        if cursor is not None and not isinstance(cursor, str):
+            return jsonify({"error": "cursor must be a string"}), 400
+        if page_size is not None and (not isinstance(page_size, int) or not 1 <= page_size <= 1000):
+            return jsonify({"error": "page_size must be an integer between 1 and 1000"}), 400
+
+        try:
+            page = filter_catalog.search(filters, cursor=cursor, page_size=page_size)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        result = {
+            "chunks": serialize_chunks(page['matches']),
+            "next_cursor": page['next_cursor']
+        }
+        if include_facets:
+            result["facets"] = filter_catalog.facets(filters)
+
+        return jsonify(result)
+
+    except Exception as e:
+        print(f"Error processing filter-only search: {str(e)}")
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8000)
\ No newline at end of file
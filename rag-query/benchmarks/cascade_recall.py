@@ -0,0 +1,108 @@
+"""
+Recall of the BM25 cascade shortlist against a full cross-encoder rerank.
+
+For every evaluation question the location's HYBRID_TOP_K Pinecone candidates
+are reranked in full, then each shortlist size is checked: what fraction of
+the full rerank's top RERANK_TOP_N survives the shortlist (the top
+--retrieval-keep by retrieval score plus the BM25 best of the rest), how often
+the top-1 chunk survives, and how many cross-encoder pairs the cutoff saves.
+
+Run from rag-query/ (needs PINECONE_API_KEY):
+    python -m benchmarks.cascade_recall --sizes 10 20 30 50 --retrieval-keep 10
+"""
+import argparse
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from encoding import encode_query_hybrid
+from lexical import shortlist_candidates
+from models import initialize_reranker
+from retrieval import initialize_pinecone, retrieve_chunks_hybrid_reranking, score_candidates
+
+
+def eval_location(state: str, county: str) -> dict:
+    """Pinecone filter for an evaluation row's (State, County), formatted like the evaluator does."""
+    county = county.lower().replace(" ", "-")
+    if not county.endswith("-county"):
+        county = f"{county}-county"
+    return {"state": {"$in": [state.lower()]}, "county": {"$in": [county]}}
+
+
+def shortlist_metrics(
+    query: str, matches: List[dict], scores: List[float], sizes: List[int], retrieval_keep: int
+) -> Dict[int, dict]:
+    """
+    Compare each shortlist size against the full rerank of `matches`.
+
+    Returns:
+        {size: {'recall', 'top1_kept', 'pairs'}}
+    """
+    order = np.argsort(-np.asarray(scores), kind="stable")
+    full_top = {matches[i]['id'] for i in order[:Config.RERANK_TOP_N]}
+    best = matches[order[0]]['id']
+
+    metrics = {}
+    for size in sizes:
+        kept = {match['id'] for match in shortlist_candidates(query, matches, size, retrieval_keep)}
+        metrics[size] = {
+            'recall': len(full_top & kept) / len(full_top),
+            'top1_kept': float(best in kept),
+            'pairs': min(size, len(matches)),
+        }
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shortlist recall of the BM25 cascade vs full reranking")
+    parser.add_argument("--eval-csv", default="../evaluation/eval_dataset_final.csv")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 20, 30, 50])
+    parser.add_argument("--retrieval-keep", type=int, default=Config.CASCADE_RETRIEVAL_KEEP,
+                        help="Top matches by retrieval score always shortlisted")
+    parser.add_argument("--out", default=None, help="Optional CSV with per-question results")
+    args = parser.parse_args()
+
+    pc, pinecone_index = initialize_pinecone()
+    reranker_model = initialize_reranker()
+    df = pd.read_csv(args.eval_csv)
+
+    rows = []
+    for _, row in df.iterrows():
+        query = str(row['Question'])
+        query_vectors = encode_query_hybrid(pc, query)
+        response = retrieve_chunks_hybrid_reranking(
+            pc, pinecone_index, query, eval_location(row['State'], row['County']), query_vectors
+        )
+        matches = list(response.get('matches', []))
+        if not matches:
+            continue
+
+        scores = score_candidates(reranker_model, query, matches)
+        for size, metrics in shortlist_metrics(query, matches, scores, args.sizes, args.retrieval_keep).items():
+            rows.append({'question': query, 'size': size, 'candidates': len(matches), **metrics})
+
+    results = pd.DataFrame(rows)
+    if results.empty:
+        print("No candidates retrieved; nothing to report.")
+        return
+
+    summary = results.groupby('size').agg(
+        questions=('question', 'count'),
+        recall=('recall', 'mean'),
+        top1_kept=('top1_kept', 'mean'),
+        pairs=('pairs', 'sum'),
+        candidates=('candidates', 'sum'),
+    )
+    summary['pairs_saved'] = 1.0 - summary['pairs'] / summary['candidates']
+    print(f"\nShortlist recall of the full top-{Config.RERANK_TOP_N} (HYBRID_TOP_K={Config.HYBRID_TOP_K}):")
+    print(summary[['questions', 'recall', 'top1_kept', 'pairs_saved']].to_string(float_format="%.3f"))
+
+    if args.out:
+        results.to_csv(args.out, index=False)
+        print(f"Per-question results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
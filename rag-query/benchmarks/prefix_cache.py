@@ -0,0 +1,88 @@
+"""
+Prefill time with and without the system-prompt prefix cache.
+
+Each evaluation question gets an answer prompt whose context is built from
+the evaluation answers (standing in for retrieved chunks). The baseline
+prefills the whole prompt; the cached path copies the system prompt's
+past_key_values and prefills only the rest. Decoding is identical in both
+cases and is left out. The last-position logits of both paths are compared
+to confirm the cache does not change the model's output.
+
+Run from rag-query/ (needs HF_TOKEN and the LLM):
+    python -m benchmarks.prefix_cache --queries 20 --chunks 10
+"""
+import argparse
+import time
+
+import torch
+
+from benchmarks.rerank_backends import load_eval_pairs
+from llm_generation import (
+    ANSWER_SYSTEM_PROMPT,
+    build_answer_messages,
+    build_context_string,
+    chat_prefix_ids,
+    encode_chat
+)
+from models import initialize_llm
+from prefix_cache import PrefixKVCache
+
+
+def timed_prefill(model, input_ids, past_key_values=None):
+    """Run one prefill forward pass; returns (last-position logits, seconds)."""
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    with torch.inference_mode():
+        logits = model(input_ids, past_key_values=past_key_values, use_cache=True).logits[:, -1]
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    return logits.float(), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prefill with the system-prompt prefix cache")
+    parser.add_argument("--eval-csv", default="../evaluation/eval_dataset_final.csv")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=10, help="Evaluation answers used as context per prompt")
+    args = parser.parse_args()
+
+    tokenizer, model = initialize_llm()
+    queries, passages = load_eval_pairs(args.eval_csv, args.queries, args.chunks)
+    context_string = build_context_string([{'metadata': {'chunk_text': text}} for text in passages])
+    prompts = [encode_chat(tokenizer, build_answer_messages(query, context_string)) for query in queries]
+
+    cache = PrefixKVCache(model)
+    start = time.perf_counter()
+    prefix = tuple(chat_prefix_ids(tokenizer, ANSWER_SYSTEM_PROMPT))
+    cache.register(prefix)
+    warm_seconds = time.perf_counter() - start
+
+    # Warm-up both paths
+    timed_prefill(model, torch.tensor([prompts[0]], device=model.device))
+    timed_prefill(model, torch.tensor([prompts[0][len(prefix):]], device=model.device), cache.expand(prefix, 1))
+
+    full_seconds, cached_seconds, max_diff = 0.0, 0.0, 0.0
+    for prompt in prompts:
+        if cache.match(prompt) != prefix:
+            raise RuntimeError("Prompt does not start with the cached system-prompt prefix")
+        full_logits, seconds = timed_prefill(model, torch.tensor([prompt], device=model.device))
+        full_seconds += seconds
+
+        past_key_values = cache.expand(prefix, 1)
+        suffix = torch.tensor([prompt[len(prefix):]], device=model.device)
+        cached_logits, seconds = timed_prefill(model, suffix, past_key_values)
+        cached_seconds += seconds
+        max_diff = max(max_diff, (full_logits - cached_logits).abs().max().item())
+
+    mean_tokens = sum(map(len, prompts)) / len(prompts)
+    print(f"\n{len(prompts)} prompts, {mean_tokens:.0f} tokens on average, "
+          f"{len(prefix)}-token system prompt prefix (prefilled once in {warm_seconds:.3f}s)")
+    print(f"Full prefill:   {full_seconds / len(prompts) * 1000:.1f} ms per prompt")
+    print(f"Cached prefix:  {cached_seconds / len(prompts) * 1000:.1f} ms per prompt")
+    print(f"Saved:          {1.0 - cached_seconds / full_seconds:.1%} of prefill time")
+    print(f"Max last-token logit difference: {max_diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
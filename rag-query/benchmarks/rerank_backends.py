@@ -0,0 +1,114 @@
+"""
+Benchmark the PyTorch and ONNX Runtime reranker backends.
+
+Every evaluation question is scored against the pool of distinct evaluation
+answers (no Pinecone access needed). Reports pairs/second per backend and how
+closely the ONNX rankings agree with PyTorch's.
+
+Run from rag-query/:
+    python -m benchmarks.rerank_backends --onnx-dir onnx_reranker
+"""
+import argparse
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+
+
+def load_eval_pairs(eval_csv: str, max_queries: int, max_candidates: int) -> Tuple[List[str], List[str]]:
+    """
+    Load questions and a shared candidate passage pool from the evaluation set.
+
+    Args:
+        eval_csv: Path to eval_dataset_final.csv
+        max_queries: Number of questions to use
+        max_candidates: Number of distinct answers in the candidate pool
+
+    Returns:
+        Tuple of (queries, passages)
+    """
+    df = pd.read_csv(eval_csv)
+    queries = df['Question'].dropna().astype(str).tolist()[:max_queries]
+    passages = df['Answer'].dropna().astype(str).drop_duplicates().tolist()[:max_candidates]
+    return queries, passages
+
+
+def score_all(model, queries: List[str], passages: List[str], batch_size: int) -> Tuple[np.ndarray, float]:
+    """
+    Score every (query, passage) pair.
+
+    Returns:
+        Tuple of (scores of shape (queries, passages), elapsed seconds)
+    """
+    model.predict([(queries[0], passages[0])], batch_size=batch_size)  # Warm-up
+    start = time.perf_counter()
+    scores = [
+        np.asarray(model.predict([(query, passage) for passage in passages], batch_size=batch_size), dtype=np.float64)
+        for query in queries
+    ]
+    return np.vstack(scores), time.perf_counter() - start
+
+
+def spearman(a: np.ndarray, b: np.ndarray) -> float:
+    """Spearman rank correlation (no tie correction)."""
+    rank_a = np.argsort(np.argsort(a))
+    rank_b = np.argsort(np.argsort(b))
+    return float(np.corrcoef(rank_a, rank_b)[0, 1])
+
+
+def ranking_agreement(reference: np.ndarray, candidate: np.ndarray, top_n: int) -> Dict[str, float]:
+    """
+    Compare per-query rankings of two score matrices.
+
+    Returns:
+        Mean Spearman correlation, top-1 agreement, top-n overlap and max absolute score difference
+    """
+    top_ref = np.argsort(-reference, axis=1)[:, :top_n]
+    top_cand = np.argsort(-candidate, axis=1)[:, :top_n]
+    return {
+        "spearman": float(np.mean([spearman(r, c) for r, c in zip(reference, candidate)])),
+        "top1_agreement": float(np.mean(top_ref[:, 0] == top_cand[:, 0])),
+        f"top{top_n}_overlap": float(np.mean([len(set(r) & set(c)) / top_n for r, c in zip(top_ref, top_cand)])),
+        "max_abs_score_diff": float(np.max(np.abs(reference - candidate))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PyTorch and ONNX reranker backends")
+    parser.add_argument("--eval-csv", default="../evaluation/eval_dataset_final.csv")
+    parser.add_argument("--onnx-dir", default=Config.RERANKER_ONNX_DIR)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--candidates", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=Config.RERANK_BATCH_SIZE)
+    args = parser.parse_args()
+
+    from sentence_transformers.cross_encoder import CrossEncoder
+    from onnx_reranker import load_onnx_reranker
+
+    queries, passages = load_eval_pairs(args.eval_csv, args.queries, args.candidates)
+    num_pairs = len(queries) * len(passages)
+    print(f"Scoring {len(queries)} queries x {len(passages)} passages = {num_pairs} pairs per backend")
+
+    backends = {
+        "pytorch": CrossEncoder(Config.RERANKER_MODEL_ID, max_length=Config.RERANKER_MAX_LENGTH, device="cpu"),
+        "onnx-fp32": load_onnx_reranker(args.onnx_dir, quantized=False),
+        "onnx-int8": load_onnx_reranker(args.onnx_dir, quantized=True),
+    }
+
+    results = {}
+    for name, model in backends.items():
+        scores, elapsed = score_all(model, queries, passages, args.batch_size)
+        results[name] = scores
+        print(f"{name:>10}: {elapsed:8.2f}s  {num_pairs / elapsed:8.1f} pairs/s")
+
+    reference = results["pytorch"]
+    for name in ("onnx-fp32", "onnx-int8"):
+        agreement = ranking_agreement(reference, results[name], Config.RERANK_TOP_N)
+        print(f"{name} vs pytorch: " + ", ".join(f"{k}={v:.4f}" for k, v in agreement.items()))
+
+
+if __name__ == "__main__":
+    main()
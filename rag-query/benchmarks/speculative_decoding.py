@@ -0,0 +1,175 @@
+"""
+Decode throughput with and without assisted (speculative) generation.
+
+Each evaluation question gets an answer prompt whose context is built from
+the evaluation answers (standing in for retrieved chunks) and is decoded
+greedily twice, one prompt at a time: by the LLM alone and with the draft
+model proposing Config.NUM_ASSISTANT_TOKENS tokens per step for the LLM to
+verify. Forward passes of both models are counted to report the draft's
+acceptance rate (accepted / proposed draft tokens), and the outputs are
+compared to confirm assisted decoding does not change the answer.
+
+Run from rag-query/ (needs HF_TOKEN, the LLM and the draft model):
+    python -m benchmarks.speculative_decoding --queries 20 --max-new-tokens 256
+
+or on CPU with tiny random stand-ins. The stand-in draft is the stand-in
+LLM's first layer, and the LLM's later layers are scaled down so they only
+refine its predictions; the draft then agrees with the LLM often enough to
+exercise verification. Their acceptance rate and speedup say nothing about
+the real models:
+    python -m benchmarks.speculative_decoding --tiny
+"""
+import argparse
+import copy
+import time
+
+import torch
+
+from benchmarks.rerank_backends import load_eval_pairs
+from config import Config
+from generation_scheduler import generate_batch, terminator_ids
+from llm_generation import build_answer_messages, build_context_string, encode_chat
+
+TINY_CHAT_TEMPLATE = (
+    "<s>{% for message in messages %}<{{ message['role'] }}> {{ message['content'] }} </s>{% endfor %}"
+    "{% if add_generation_prompt %}<assistant>{% endif %}"
+)
+
+
+def tiny_models(texts, layers=4, draft_layers=1, refine_scale=0.1):
+    """
+    A word-level tokenizer over `texts`, a random Llama and a draft made of its first layers.
+
+    The output projections of the layers the draft lacks are scaled by
+    `refine_scale`; the smaller it is, the more often the draft agrees.
+
+    Returns:
+        Tuple of (tokenizer, model, draft_model)
+    """
+    from tokenizers import Tokenizer, models, pre_tokenizers, trainers
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+    specials = ["<unk>", "<s>", "</s>", "<system>", "<user>", "<assistant>"]
+    backend = Tokenizer(models.WordLevel(unk_token="<unk>"))
+    backend.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+    backend.train_from_iterator(texts, trainers.WordLevelTrainer(special_tokens=specials))
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend, unk_token="<unk>", bos_token="<s>", eos_token="</s>"
+    )
+    tokenizer.chat_template = TINY_CHAT_TEMPLATE
+
+    torch.manual_seed(0)
+    config = LlamaConfig(
+        vocab_size=len(tokenizer), hidden_size=128, intermediate_size=256, num_hidden_layers=layers,
+        num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=8192,
+        bos_token_id=tokenizer.bos_token_id, eos_token_id=tokenizer.eos_token_id
+    )
+    model = LlamaForCausalLM(config).eval()
+    with torch.no_grad():
+        for layer in model.model.layers[draft_layers:]:
+            layer.self_attn.o_proj.weight.mul_(refine_scale)
+            layer.mlp.down_proj.weight.mul_(refine_scale)
+
+    draft_model = copy.deepcopy(model)
+    draft_model.model.layers = draft_model.model.layers[:draft_layers]
+    draft_model.config.num_hidden_layers = draft_layers
+    # Random models are never confident; do not let the draft stop proposing early
+    draft_model.generation_config.assistant_confidence_threshold = 0.0
+    return tokenizer, model, draft_model
+
+
+class ForwardCounter:
+    """Counts a model's forward passes."""
+
+    def __init__(self, model):
+        self.calls = 0
+        self._handle = model.register_forward_hook(self._hook)
+
+    def _hook(self, module, args, output):
+        self.calls += 1
+
+    def reset(self):
+        self.calls = 0
+
+    def remove(self):
+        self._handle.remove()
+
+
+def timed_decode(model, tokenizer, prompt, max_new_tokens, assistant_model=None):
+    """Greedy-decode one prompt; returns (generated token IDs, seconds)."""
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    response = generate_batch(
+        model, [prompt], tokenizer.eos_token_id, terminator_ids(tokenizer), max_new_tokens,
+        do_sample=False, assistant_model=assistant_model
+    )[0]
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    return response, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark assisted generation with a draft model")
+    parser.add_argument("--eval-csv", default="../evaluation/eval_dataset_final.csv")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=5, help="Evaluation answers used as context per prompt")
+    parser.add_argument("--max-new-tokens", type=int, default=256)
+    parser.add_argument("--num-assistant-tokens", type=int, default=Config.NUM_ASSISTANT_TOKENS)
+    parser.add_argument("--tiny", action="store_true", help="Tiny random stand-in models on CPU (no download)")
+    args = parser.parse_args()
+
+    queries, passages = load_eval_pairs(args.eval_csv, args.queries, args.chunks)
+    context_string = build_context_string([{'metadata': {'chunk_text': text}} for text in passages])
+    messages = [build_answer_messages(query, context_string) for query in queries]
+
+    if args.tiny:
+        texts = [message['content'] for conversation in messages for message in conversation]
+        tokenizer, model, draft_model = tiny_models(texts)
+    else:
+        from models import initialize_draft_model, initialize_llm
+        tokenizer, model = initialize_llm()
+        draft_model = initialize_draft_model()
+    draft_model.generation_config.num_assistant_tokens = args.num_assistant_tokens
+    prompts = [encode_chat(tokenizer, conversation) for conversation in messages]
+
+    # Warm-up both paths
+    timed_decode(model, tokenizer, prompts[0], 8)
+    timed_decode(model, tokenizer, prompts[0], 8, draft_model)
+
+    main_counter, draft_counter = ForwardCounter(model), ForwardCounter(draft_model)
+    plain_seconds, plain_tokens = 0.0, 0
+    assisted_seconds, assisted_tokens = 0.0, 0
+    verify_steps, proposed, matching = 0, 0, 0
+    for prompt in prompts:
+        plain, seconds = timed_decode(model, tokenizer, prompt, args.max_new_tokens)
+        plain_seconds += seconds
+        plain_tokens += len(plain)
+
+        main_counter.reset()
+        draft_counter.reset()
+        assisted, seconds = timed_decode(model, tokenizer, prompt, args.max_new_tokens, draft_model)
+        assisted_seconds += seconds
+        assisted_tokens += len(assisted)
+        verify_steps += main_counter.calls
+        # Every LLM pass verifies one step's candidates; every draft pass proposes one token.
+        proposed += draft_counter.calls
+        matching += assisted == plain
+    main_counter.remove()
+    draft_counter.remove()
+
+    # Each verification step keeps the accepted draft tokens plus one token from the LLM.
+    accepted = max(assisted_tokens - verify_steps, 0)
+    mean_tokens = sum(map(len, prompts)) / len(prompts)
+    print(f"\n{len(prompts)} prompts, {mean_tokens:.0f} tokens on average, up to {args.max_new_tokens} new tokens, "
+          f"{args.num_assistant_tokens} draft tokens per step{' (tiny stand-in models)' if args.tiny else ''}")
+    print(f"LLM alone:        {plain_tokens / plain_seconds:.1f} tokens/s")
+    print(f"Assisted:         {assisted_tokens / assisted_seconds:.1f} tokens/s "
+          f"({plain_seconds / assisted_seconds:.2f}x)")
+    print(f"Acceptance rate:  {accepted / proposed if proposed else 0.0:.1%} "
+          f"({accepted} of {proposed} draft tokens, {assisted_tokens / max(verify_steps, 1):.2f} tokens per LLM pass)")
+    print(f"Identical output: {matching} of {len(prompts)} prompts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Tokenization cost of reranking with and without the passage token cache.
+
+Each evaluation question is paired with the pool of distinct evaluation
+answers (standing in for a location's candidates). The baseline tokenizes
+every (query, passage) pair, as CrossEncoder.predict does; the cached path
+tokenizes only the query and collates cached passage IDs. The model forward
+pass is identical in both cases and is left out.
+
+Run from rag-query/:
+    python -m benchmarks.token_cache --candidates 100
+"""
+import argparse
+import time
+
+import numpy as np
+from transformers import AutoTokenizer
+
+from benchmarks.rerank_backends import load_eval_pairs
+from config import Config
+from token_cache import PairTemplate, PassageTokenCache, collate_pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pre-tokenized passage cache")
+    parser.add_argument("--eval-csv", default="../evaluation/eval_dataset_final.csv")
+    parser.add_argument("--tokenizer", default=Config.RERANKER_MODEL_ID)
+    parser.add_argument("--queries", type=int, default=95)
+    parser.add_argument("--candidates", type=int, default=100)
+    parser.add_argument("--max-length", type=int, default=Config.RERANKER_MAX_LENGTH)
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+    max_length = min(args.max_length, tokenizer.model_max_length)
+    queries, passages = load_eval_pairs(args.eval_csv, args.queries, args.candidates)
+    chunk_ids = [f"chunk-{i}" for i in range(len(passages))]
+    print(f"{len(queries)} reranks x {len(passages)} passages, max_length={max_length}")
+
+    start = time.perf_counter()
+    baseline = None
+    for query in queries:
+        encoded = tokenizer(
+            [query] * len(passages), passages,
+            padding=True, truncation="longest_first", max_length=max_length, return_tensors="np"
+        )
+        baseline = baseline if baseline is not None else encoded
+    baseline_seconds = time.perf_counter() - start
+
+    template = PairTemplate(tokenizer)
+    cache = PassageTokenCache(Config.TOKEN_CACHE_MAX_TOKENS)
+
+    start = time.perf_counter()
+    for chunk_id, ids in zip(chunk_ids, tokenizer(passages, add_special_tokens=False)['input_ids']):
+        cache.put(chunk_id, np.asarray(ids[:max_length], dtype=np.int32))
+    warm_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cached = None
+    for query in queries:
+        query_ids = tokenizer(query, add_special_tokens=False)['input_ids']
+        passage_ids = [cache.get(chunk_id) for chunk_id in chunk_ids]
+        features = collate_pairs(template, [query_ids] * len(passages), passage_ids, max_length)
+        cached = cached if cached is not None else features
+    cached_seconds = time.perf_counter() - start
+
+    identical = np.array_equal(baseline['input_ids'], cached['input_ids'])
+    per_rerank = 1000.0 / len(queries)
+    print(f"  pair tokenization: {baseline_seconds:8.3f}s  ({baseline_seconds * per_rerank:7.2f} ms/rerank)")
+    print(f"  cache warm-up:     {warm_seconds:8.3f}s  (once per chunk)")
+    print(f"  cached collation:  {cached_seconds:8.3f}s  ({cached_seconds * per_rerank:7.2f} ms/rerank)")
+    print(f"  speedup: {baseline_seconds / cached_seconds:.1f}x, identical input_ids: {identical}")
+
+
+if __name__ == "__main__":
+    main()
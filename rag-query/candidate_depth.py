@@ -0,0 +1,116 @@
+"""
+Adaptive candidate depth: decide how many retrieved matches are worth reranking.
+
+Cross-encoder cost grows linearly with the number of candidates, but hybrid
+scores often fall off a cliff after the first handful of matches. The depth
+policy cuts the candidate list at the largest score gap (if it is large
+relative to the score spread) and drops matches under an absolute score
+floor, while always keeping enough candidates for the final top-N.
+"""
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from config import Config
+
+
+class CandidateDepthStats:
+    """Thread-safe counters for how much rerank work the depth policy saved."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.candidates_in = 0
+        self.candidates_kept = 0
+
+    def record(self, candidates_in: int, candidates_kept: int) -> None:
+        with self._lock:
+            self.calls += 1
+            self.candidates_in += candidates_in
+            self.candidates_kept += candidates_kept
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "candidates_in": self.candidates_in,
+                "candidates_kept": self.candidates_kept,
+                "rerank_pairs_saved": self.candidates_in - self.candidates_kept,
+                "kept_fraction": self.candidates_kept / self.candidates_in if self.candidates_in else 1.0,
+            }
+
+
+_depth_stats = CandidateDepthStats()
+
+
+def get_candidate_depth_stats() -> CandidateDepthStats:
+    """Return the process-wide candidate depth counters."""
+    return _depth_stats
+
+
+def adaptive_depth(
+    scores: np.ndarray,
+    min_depth: int,
+    gap_ratio: float,
+    score_floor: Optional[float] = None
+) -> int:
+    """
+    Number of leading candidates to keep for scores sorted in descending order.
+
+    Args:
+        scores: Retrieval scores, highest first
+        min_depth: Never keep fewer than this many candidates
+        gap_ratio: Cut at the largest gap after min_depth if it is at least
+            this fraction of the full score range (top score - last score)
+        score_floor: Drop candidates scoring below this (None disables the floor)
+
+    Returns:
+        Depth to keep
+    """
+    n = len(scores)
+    if n <= min_depth:
+        return n
+
+    depth = n
+    score_range = scores[0] - scores[-1]
+    if score_range > 0:
+        # gaps[i] is the drop between candidate i and i + 1; cutting after
+        # candidate i keeps i + 1 candidates, so only i >= min_depth - 1 qualify.
+        gaps = scores[:-1] - scores[1:]
+        tail_gaps = gaps[min_depth - 1:]
+        cliff = int(np.argmax(tail_gaps))
+        if tail_gaps[cliff] >= gap_ratio * score_range:
+            depth = min_depth + cliff
+
+    if score_floor is not None:
+        above_floor = int(np.count_nonzero(scores >= score_floor))  # Sorted, so a prefix
+        depth = min(depth, max(above_floor, min_depth))
+
+    return depth
+
+
+def select_candidates(matches: List[dict], min_depth: Optional[int] = None) -> List[dict]:
+    """
+    Trim a location's retrieved matches to the adaptive candidate depth.
+
+    Args:
+        matches: Pinecone matches, sorted by score (highest first)
+        min_depth: Minimum candidates to keep (defaults to
+            max(Config.RERANK_TOP_N, Config.ADAPTIVE_DEPTH_MIN))
+
+    Returns:
+        Leading slice of `matches` to send to the reranker
+    """
+    if not Config.ADAPTIVE_DEPTH_ENABLED or not matches:
+        return matches
+    if min_depth is None:
+        min_depth = max(Config.RERANK_TOP_N, Config.ADAPTIVE_DEPTH_MIN)
+
+    scores = np.fromiter((match.get('score', 0.0) for match in matches), dtype=np.float64, count=len(matches))
+    depth = adaptive_depth(scores, min_depth, Config.ADAPTIVE_DEPTH_GAP_RATIO, Config.ADAPTIVE_DEPTH_SCORE_FLOOR)
+
+    _depth_stats.record(len(matches), depth)
+    if depth < len(matches):
+        print(f"Adaptive depth: reranking {depth} of {len(matches)} candidates")
+    return matches[:depth]
@@ -17,12 +17,29 @@ class Config:
     PINECONE_NAMESPACE: str = "__default__"
     VECTOR_DIMENSION: int = 1024
     
+    # Index Backend: "pinecone" (remote) or "local" (in-process NumPy index, see local_index.py)
+    INDEX_BACKEND: str = os.getenv("INDEX_BACKEND", "pinecone")
+    LOCAL_INDEX_DIR: str = os.getenv("LOCAL_INDEX_DIR", "local_index")
+    
+    # Filter-Only Search Catalog (parquet, see filter_search.py). Unset = Pinecone zero-vector query.
+    METADATA_CATALOG_PATH: str = os.getenv("METADATA_CATALOG_PATH", "")
+    FILTER_ONLY_PAGE_SIZE: int = 100
+    CATALOG_ROW_GROUP_SIZE: int = 10000
+    
     # Model Configuration
     LLM_MODEL_ID: str = "meta-llama/Llama-3.1-8B-Instruct"
     EMBEDDING_MODEL_DENSE: str = "llama-text-embed-v2"
     EMBEDDING_MODEL_SPARSE: str = "pinecone-sparse-english-v0"
     RERANKER_MODEL_ID: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
     
+    # Reranker Backend: "pytorch" (sentence-transformers) or "onnx" (ONNX Runtime, see onnx_reranker.py)
+    RERANKER_BACKEND: str = os.getenv("RERANKER_BACKEND", "pytorch")
+    RERANKER_ONNX_DIR: str = os.getenv("RERANKER_ONNX_DIR", "onnx_reranker")  # Exported on first load if missing
+    RERANKER_ONNX_QUANTIZE: bool = True  # Dynamic int8 weights
+    RERANKER_MAX_LENGTH: int = 512
+    TOKEN_CACHE_ENABLED: bool = True  # Reuse passage token IDs by tokenizer and chunk ID (see token_cache.py)
+    TOKEN_CACHE_MAX_TOKENS: int = 5_000_000  # ~20 MB of int32 token IDs
+    
     # Quantization Settings
     LOAD_IN_4BIT: bool = True
     BNB_4BIT_USE_DOUBLE_QUANT: bool = True
@@ -33,11 +50,91 @@ class Config:
     HYBRID_TOP_K: int = 100
     FILTER_ONLY_TOP_K: int = 1000
     RERANK_TOP_N: int = 5
+    RERANK_BATCH_SIZE: int = 64  # Cross-encoder batch size (pairs are length-bucketed)
+    STREAMING_RERANK: bool = True  # Rerank locations as their queries return (see streaming.py)
+    STREAM_MICRO_BATCH_PAIRS: int = 64  # Max pairs the stream worker drains into one micro-batch
+    MAX_CONCURRENT_QUERIES: int = 16  # Max per-location Pinecone queries in flight
+    GROUPED_COUNTY_QUERIES: bool = True  # One county $in query per group instead of one per county
+    GROUPED_QUERY_OVERSAMPLE: float = 2.0  # Group top_k = per-county quota * counties * oversample
+    PINECONE_MAX_TOP_K: int = 1000  # Pinecone's top_k limit when returning metadata
+    
+    # Adaptive Candidate Depth (how many of the HYBRID_TOP_K matches get reranked)
+    ADAPTIVE_DEPTH_ENABLED: bool = True
+    ADAPTIVE_DEPTH_MIN: int = 10  # Always rerank at least this many (and at least RERANK_TOP_N)
+    ADAPTIVE_DEPTH_GAP_RATIO: float = 0.25  # Cut at a score gap >= this fraction of the score range
+    ADAPTIVE_DEPTH_SCORE_FLOOR: Optional[float] = None  # Absolute score floor (None disables it)
+    
+    # Near-Duplicate Collapse (MinHash over chunk_text within the same section)
+    DEDUP_ENABLED: bool = True
+    DEDUP_SHINGLE_SIZE: int = 5  # Words per shingle
+    DEDUP_NUM_PERM: int = 64  # MinHash signature length
+    DEDUP_JACCARD_THRESHOLD: float = 0.8  # Estimated Jaccard similarity to collapse
+    
+    # Reranking Cascade (BM25 shortlist over chunk_text before the cross-encoder)
+    CASCADE_ENABLED: bool = False  # Opt in after checking recall with benchmarks/cascade_recall.py
+    CASCADE_SHORTLIST_SIZE: int = 30  # Per location; tune with benchmarks/cascade_recall.py
+    CASCADE_RETRIEVAL_KEEP: int = 10  # Top matches by retrieval score always shortlisted
+    BM25_K1: float = 1.2
+    BM25_B: float = 0.75
+    
+    # Reranker Service (one worker thread batches pairs across concurrent requests)
+    RERANK_SERVICE_ENABLED: bool = True
+    RERANK_SERVICE_MAX_BATCH_PAIRS: int = 256  # Pairs collected per batch; forwarded in RERANK_BATCH_SIZE chunks
+    RERANK_SERVICE_MAX_WAIT_MS: float = 5.0  # How long a batch waits for other requests' pairs
+    
+    # Query Embedding Cache (shared by all pipelines in the process)
+    EMBEDDING_CACHE_SIZE: int = 2048
+    EMBEDDING_CACHE_TTL_SECONDS: int = 3600
+    
+    # Retrieval Result Cache (keyed by query embedding, canonical filters and index version)
+    RETRIEVAL_CACHE_ENABLED: bool = True
+    RETRIEVAL_CACHE_SIZE: int = 512
+    RETRIEVAL_CACHE_PATH: str = os.getenv("RETRIEVAL_CACHE_PATH", "")  # SQLite file; empty = memory only
+    INDEX_VERSION_CHECK_SECONDS: int = 60  # Min seconds between describe_index_stats calls
+    
+    # Semantic Answer Cache (reuse LLM output for near-duplicate questions over the same chunks)
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_SIZE: int = 1024
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95  # Min cosine similarity between query embeddings
+    
+    # Rerank Score Cache (keyed by normalized query, chunk ID and RERANKER_MODEL_ID)
+    RERANK_CACHE_ENABLED: bool = True
+    RERANK_CACHE_SIZE: int = 200000
+    RERANK_CACHE_PATH: str = os.getenv("RERANK_CACHE_PATH", "")  # SQLite file; empty = memory only
+    
+    # Generation Backend: "local" (in-process HF model) or "openai" (OpenAI-compatible server such as vLLM)
+    GENERATION_BACKEND: str = os.getenv("GENERATION_BACKEND", "local")
+    GENERATION_API_BASE: str = os.getenv("GENERATION_API_BASE", "http://localhost:8001/v1")
+    GENERATION_API_MODEL: str = os.getenv("GENERATION_API_MODEL", LLM_MODEL_ID)
+    GENERATION_API_KEY: str = os.getenv("GENERATION_API_KEY", "")
+    GENERATION_API_TIMEOUT: float = 300.0  # Seconds; a full MAX_NEW_TOKENS answer can take a while
+    GENERATION_API_POOL_SIZE: int = 32  # Pooled keep-alive connections to the server
     
     # LLM Generation Settings
     MAX_NEW_TOKENS: int = 1024
     DO_SAMPLE: bool = False
     
+    # Generation Scheduler (batches concurrent requests' prompts into one generate call)
+    GENERATION_BATCHING_ENABLED: bool = True
+    GENERATION_MAX_BATCH_SIZE: int = 8  # Prompts per generate call
+    GENERATION_BATCH_WAIT_MS: float = 20.0  # How long the first prompt waits for others
+    PREFIX_CACHE_ENABLED: bool = True  # Prefill the static system prompts once and reuse their KV cache
+    
+    # Assisted Generation (a small draft model proposes tokens, the LLM verifies them in one forward pass)
+    ASSISTED_GENERATION_ENABLED: bool = False
+    DRAFT_MODEL_ID: str = os.getenv("DRAFT_MODEL_ID", "meta-llama/Llama-3.2-1B-Instruct")  # Must share the LLM's tokenizer
+    NUM_ASSISTANT_TOKENS: int = 5  # Draft tokens proposed per verification step
+    
+    # LLM Context Packing (retrieved chunks are fit into a token budget, fairly per location)
+    CONTEXT_TOKEN_BUDGET: int = 6000  # Approximate LLM tokens for all chunk entries (summed per-piece counts)
+    CONTEXT_TOKEN_CACHE_SIZE: int = 100000  # Chunks whose token counts are memoized
+    
+    # Generation Cache (greedy outputs keyed by model, load settings, prompt token IDs and parameters)
+    GENERATION_CACHE_ENABLED: bool = True  # Always bypassed while DO_SAMPLE is True
+    GENERATION_CACHE_SIZE: int = 10000
+    GENERATION_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # Size limit of the SQLite tier
+    GENERATION_CACHE_PATH: str = os.getenv("GENERATION_CACHE_PATH", "")  # SQLite file; empty = memory only
+    
     # Output Configuration
     OUTPUT_DIR: str = "outputs"
     # BASELINE_CSV_FILENAME: str = "baseline_retrieval_output.csv"
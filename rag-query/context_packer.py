@@ -0,0 +1,298 @@
+"""
+Token-budgeted packing of retrieved chunks into the LLM context.
+
+Multi-county hybrid searches can return dozens of long chunks; including all
+of them in full made prompts (and their prefill time and KV memory) grow
+without limit. The packer fits the chunks into Config.CONTEXT_TOKEN_BUDGET
+tokens of the LLM's tokenizer:
+
+1. Each location (state, county) gets an equal share of the budget and fills
+   it with its own chunks in rank order (rerank_score, else score), so one
+   county with long chunks cannot crowd out the others.
+2. Budget a location leaves unused goes to the remaining chunks in global
+   rank order.
+
+A chunk that does not fit is cut at a sentence boundary; when not even its
+first sentence fits, that sentence is cut at a word boundary with whatever
+budget the other chunks leave. A chunk that gains nothing from the budget
+left is skipped and lower-ranked (shorter) chunks still get their turn. Token
+counts are memoized by chunk ID, so a chunk is tokenized once however many
+searches return it.
+
+The budget is approximate: an entry's cost is the sum of its pieces' token
+counts (entry template, details, kept sentences), which can differ by a few
+tokens from tokenizing the joined entry.
+"""
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from config import Config
+from llm_generation import chunk_details, format_chunk
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?;])\s+')
+NOTHING_FIT = "No retrieved document fit in the context budget."
+
+# Stand-in for the "[Chunk N]\nScore: ..." line, which differs per request but not in length.
+_ENTRY_TEMPLATE_MATCH = {'score': 0.0, 'metadata': {'chunk_text': ''}}
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text after '.', '!', '?' or ';' followed by whitespace."""
+    return [sentence for sentence in SENTENCE_BOUNDARY.split(text.strip()) if sentence]
+
+
+class ChunkTokenCounter:
+    """Memoized token counts per chunk ID (LRU) for one tokenizer."""
+
+    def __init__(self, tokenizer: Any, max_entries: Optional[int] = None):
+        """
+        Initialize the counter.
+
+        Args:
+            tokenizer: LLM tokenizer
+            max_entries: Maximum chunks remembered (defaults to Config.CONTEXT_TOKEN_CACHE_SIZE)
+        """
+        self.tokenizer = tokenizer
+        self.max_entries = max_entries or Config.CONTEXT_TOKEN_CACHE_SIZE
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Tokens of an entry with empty details and text: the [Chunk N], Score and Text framing.
+        self.entry_overhead = self.count(format_chunk(99, _ENTRY_TEMPLATE_MATCH)) - self.count(
+            chunk_details(_ENTRY_TEMPLATE_MATCH)
+        )
+
+        self.hits = 0
+        self.misses = 0
+
+    def count(self, text: str) -> int:
+        return len(self.tokenizer(text, add_special_tokens=False)['input_ids'])
+
+    def measure(self, matches: List[dict]) -> List[dict]:
+        """
+        Token counts for each chunk.
+
+        Args:
+            matches: Retrieved chunks
+
+        Returns:
+            Per chunk: {'sentences', 'sentence_tokens', 'text_tokens', 'details_tokens'}
+        """
+        results: List[Optional[dict]] = [None] * len(matches)
+        missing: List[int] = []
+        with self._lock:
+            for i, match in enumerate(matches):
+                entry = self._entries.get(match.get('id')) if match.get('id') is not None else None
+                if entry is None:
+                    missing.append(i)
+                else:
+                    self._entries.move_to_end(match['id'])
+                    results[i] = entry
+            self.hits += len(matches) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            # One tokenizer call for every string of every uncounted chunk.
+            texts, details, sentences = [], [], []
+            for i in missing:
+                text = matches[i].get('metadata', {}).get('chunk_text', 'N/A')
+                texts.append(text)
+                details.append(chunk_details(matches[i]))
+                sentences.append(split_sentences(text))
+            flat = [sentence for chunk_sentences in sentences for sentence in chunk_sentences]
+            encoded = self.tokenizer(texts + details + flat, add_special_tokens=False)['input_ids']
+            lengths = [len(ids) for ids in encoded]
+
+            offset = 2 * len(missing)
+            for j, i in enumerate(missing):
+                count = len(sentences[j])
+                entry = {
+                    'sentences': sentences[j],
+                    'sentence_tokens': lengths[offset:offset + count],
+                    'text_tokens': lengths[j],
+                    'details_tokens': lengths[len(missing) + j],
+                }
+                offset += count
+                results[i] = entry
+                if matches[i].get('id') is not None:
+                    self._store(matches[i]['id'], entry)
+        return results
+
+    def _store(self, chunk_id: str, entry: dict) -> None:
+        with self._lock:
+            self._entries[chunk_id] = entry
+            self._entries.move_to_end(chunk_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit-rate metrics and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_token_counters: Dict[int, ChunkTokenCounter] = {}
+_token_counters_lock = threading.Lock()
+
+
+def get_chunk_token_counter(tokenizer: Any) -> ChunkTokenCounter:
+    """Return the process-wide token counter for `tokenizer`."""
+    with _token_counters_lock:
+        counter = _token_counters.get(id(tokenizer))
+        if counter is None or counter.tokenizer is not tokenizer:
+            counter = _token_counters[id(tokenizer)] = ChunkTokenCounter(tokenizer)
+        return counter
+
+
+def rank_score(match: dict) -> float:
+    """The score chunks are ranked by: rerank_score (hybrid), else the retrieval score."""
+    return float(match.get('rerank_score', match.get('score', 0.0)))
+
+
+def location_key(match: dict) -> tuple:
+    metadata = match.get('metadata', {})
+    return metadata.get('state'), metadata.get('county')
+
+
+def pack_context(
+    retrieved_chunks: List[dict],
+    tokenizer: Any,
+    budget: Optional[int] = None,
+    max_chunks: Optional[int] = None,
+    counter: Optional[ChunkTokenCounter] = None
+) -> Dict[str, Any]:
+    """
+    Build the LLM context from as much of the retrieved chunks as fits the budget.
+
+    Chunks keep their position in retrieved_chunks and their [Chunk N] number,
+    so the LLM's citations still match the returned chunk list.
+
+    Args:
+        retrieved_chunks: Retrieved chunks, in the order returned to the user
+        tokenizer: LLM tokenizer
+        budget: Context tokens (defaults to Config.CONTEXT_TOKEN_BUDGET)
+        max_chunks: Only consider the first N chunks (filter-only search)
+        counter: Token counter (defaults to the process-wide one for the tokenizer)
+
+    Returns:
+        {'text', 'tokens', 'dropped_tokens', 'chunks', 'truncated_chunks', 'dropped_chunks'}
+    """
+    budget = Config.CONTEXT_TOKEN_BUDGET if budget is None else budget
+    matches = retrieved_chunks[:max_chunks] if max_chunks is not None else retrieved_chunks
+    if not matches:
+        return {
+            'text': "No documents were retrieved.", 'tokens': 0, 'dropped_tokens': 0,
+            'chunks': 0, 'truncated_chunks': 0, 'dropped_chunks': 0
+        }
+
+    counter = counter or get_chunk_token_counter(tokenizer)
+    counts = counter.measure(matches)
+    fixed = [counter.entry_overhead + c['details_tokens'] for c in counts]
+    full = [f + c['text_tokens'] for f, c in zip(fixed, counts)]
+    kept = [0] * len(matches)  # Sentences kept per truncated chunk
+    words = [0] * len(matches)  # Words kept of an oversized first sentence
+    cost = [0] * len(matches)  # Tokens used per chunk (0 = not included)
+
+    def complete(i: int) -> bool:
+        return cost[i] == full[i]
+
+    def grow(i: int, available: int, split_words: bool = False) -> int:
+        """Keep more of chunk i within `available` more tokens; returns the tokens added."""
+        before = cost[i]
+        if full[i] - before <= available:  # The rest of the chunk fits
+            cost[i] = full[i]
+            return full[i] - before
+
+        # Otherwise add whole sentences; stop short of the last one so a
+        # truncated chunk is never reported as complete.
+        sentence_tokens = counts[i]['sentence_tokens']
+        spent = before or fixed[i]
+        k = kept[i]
+        while k < len(sentence_tokens) - 1 and spent + sentence_tokens[k] - before <= available:
+            spent += sentence_tokens[k]
+            k += 1
+        if k > kept[i]:
+            kept[i], cost[i] = k, spent
+            return spent - before
+        if split_words and kept[i] == 0 and sentence_tokens:
+            return cut_words(i, available)
+        return 0
+
+    def cut_words(i: int, available: int) -> int:
+        """Include chunk i with as many words of its first sentence as fit; returns the tokens used."""
+        sentence_words = counts[i]['sentences'][0].split()
+        limit = available - fixed[i]
+        low, high = 0, len(sentence_words) - 1  # Binary search for the largest word count within limit
+        while low < high:
+            middle = (low + high + 1) // 2
+            if counter.count(" ".join(sentence_words[:middle])) <= limit:
+                low = middle
+            else:
+                high = middle - 1
+        if not low:
+            return 0
+        words[i], cost[i] = low, fixed[i] + counter.count(" ".join(sentence_words[:low]))
+        return cost[i]
+
+    by_rank = sorted(range(len(matches)), key=lambda i: -rank_score(matches[i]))
+    locations: Dict[tuple, List[int]] = {}
+    for i in by_rank:
+        locations.setdefault(location_key(matches[i]), []).append(i)
+
+    # 1. Equal share per location, filled in rank order.
+    share = budget // len(locations)
+    for ranked in locations.values():
+        remaining = share
+        for i in ranked:
+            if remaining <= 0:
+                break
+            remaining -= grow(i, remaining)
+
+    # 2. Unused budget to the remaining chunks in global rank order.
+    remaining = budget - sum(cost)
+    for i in by_rank:
+        if remaining <= 0:
+            break
+        if not complete(i):
+            remaining -= grow(i, remaining)
+
+    # 3. Still unused budget to chunks whose first sentence alone is too long, cut at a word.
+    for i in by_rank:
+        if remaining <= 0:
+            break
+        if not cost[i]:
+            remaining -= grow(i, remaining, split_words=True)
+
+    entries = []
+    for i, match in enumerate(matches):
+        if not cost[i]:
+            continue
+        if complete(i):
+            text = None
+        elif kept[i]:
+            text = " ".join(counts[i]['sentences'][:kept[i]])
+        else:
+            text = " ".join(counts[i]['sentences'][0].split()[:words[i]])
+        entries.append(format_chunk(i + 1, match, text))
+
+    used = sum(cost)
+    result = {
+        'text': "".join(entries) or NOTHING_FIT,
+        'tokens': used,
+        'dropped_tokens': sum(full) - used,
+        'chunks': sum(1 for c in cost if c),
+        'truncated_chunks': sum(1 for i, c in enumerate(cost) if c and not complete(i)),
+        'dropped_chunks': sum(1 for c in cost if not c),
+    }
+    print(f"Packed context: {result['tokens']} tokens from {result['chunks']} chunks "
+          f"({result['truncated_chunks']} truncated, {result['dropped_chunks']} dropped, "
+          f"{result['dropped_tokens']} tokens over the {budget}-token budget)")
+    return result
@@ -0,0 +1,145 @@
+"""
+Near-duplicate collapse for retrieved candidates.
+
+Overlapping chunks of the same ordinance section often come back together.
+Candidates from the same (state, county, section) whose chunk_text has a high
+estimated Jaccard similarity (MinHash over word shingles) are collapsed into
+the highest-scoring one, which keeps the others' IDs as provenance in
+'duplicate_ids'. Signatures are computed for the whole candidate set at once.
+"""
+import re
+import zlib
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from config import Config
+
+_MERSENNE_PRIME = np.uint64(4294967311)  # Smallest prime above 2**32
+_MAX_BLOCK_ELEMENTS = 4_000_000  # Bounds the (permutations x shingles) work matrix
+_WORD_RE = re.compile(r"\w+")
+
+_rng = np.random.default_rng(1)
+# a < 2**31 and shingle hashes < 2**32 keep a * h + b inside uint64.
+_PERM_A = _rng.integers(1, 2**31, size=512, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 2**31, size=512, dtype=np.uint64)
+
+
+def shingle_hashes(text: str, shingle_size: int) -> np.ndarray:
+    """
+    Hash the word shingles of a text.
+
+    Args:
+        text: Chunk text
+        shingle_size: Words per shingle
+
+    Returns:
+        Unique uint64 shingle hashes (at least one, even for empty text)
+    """
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= shingle_size:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+    return np.unique(np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles)))
+
+
+def minhash_signatures(texts: List[str], num_perm: int, shingle_size: int) -> np.ndarray:
+    """
+    MinHash signatures for a batch of texts.
+
+    All shingles are concatenated into one array and each permutation's
+    per-text minimum is taken with a single reduceat, so the work is
+    vectorized across the whole batch.
+
+    Args:
+        texts: Chunk texts
+        num_perm: Number of hash permutations (signature length)
+        shingle_size: Words per shingle
+
+    Returns:
+        uint64 array of shape (len(texts), num_perm)
+    """
+    if num_perm > len(_PERM_A):
+        raise ValueError(f"num_perm must be at most {len(_PERM_A)}")
+
+    per_text = [shingle_hashes(text, shingle_size) for text in texts]
+    lengths = np.array([len(h) for h in per_text])
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    hashes = np.concatenate(per_text)
+
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint64)
+    block = max(1, _MAX_BLOCK_ELEMENTS // max(1, len(hashes)))
+    for p in range(0, num_perm, block):
+        end = min(p + block, num_perm)
+        a = _PERM_A[p:end, None]
+        b = _PERM_B[p:end, None]
+        permuted = (a * hashes[None, :] + b) % _MERSENNE_PRIME
+        signatures[:, p:end] = np.minimum.reduceat(permuted, starts, axis=1).T
+    return signatures
+
+
+def collapse_near_duplicates(candidate_lists: List[List[dict]]) -> List[List[dict]]:
+    """
+    Collapse near-duplicate candidates within each location's list.
+
+    Args:
+        candidate_lists: Per-location match lists, each sorted by score (highest first)
+
+    Returns:
+        Per-location match lists with duplicates removed. Each kept match that
+        absorbed others has their IDs in 'duplicate_ids'.
+    """
+    flat: List[Tuple[int, int, dict]] = [
+        (list_index, position, match)
+        for list_index, matches in enumerate(candidate_lists)
+        for position, match in enumerate(matches)
+    ]
+    if not Config.DEDUP_ENABLED or len(flat) < 2:
+        return candidate_lists
+
+    # Only candidates that share a location and section can be duplicates.
+    groups: Dict[Tuple, List[int]] = {}
+    for flat_index, (list_index, _, match) in enumerate(flat):
+        metadata = match.get('metadata', {})
+        key = (list_index, metadata.get('state'), metadata.get('county'), metadata.get('section'))
+        groups.setdefault(key, []).append(flat_index)
+
+    to_sign = sorted(i for members in groups.values() if len(members) > 1 for i in members)
+    if not to_sign:
+        return candidate_lists
+
+    texts = [str(flat[i][2].get('metadata', {}).get('chunk_text', '')) for i in to_sign]
+    signatures = minhash_signatures(texts, Config.DEDUP_NUM_PERM, Config.DEDUP_SHINGLE_SIZE)
+    signature_row = {flat_index: row for row, flat_index in enumerate(to_sign)}
+
+    dropped = set()
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        group_signatures = signatures[[signature_row[i] for i in members]]
+        similarity = (group_signatures[:, None, :] == group_signatures[None, :, :]).mean(axis=2)
+
+        # Members are in score order, so the first of each cluster is the representative.
+        for a in range(len(members)):
+            if members[a] in dropped:
+                continue
+            absorbed = [
+                members[b] for b in range(a + 1, len(members))
+                if members[b] not in dropped and similarity[a, b] >= Config.DEDUP_JACCARD_THRESHOLD
+            ]
+            if absorbed:
+                representative = flat[members[a]][2]
+                duplicate_ids = list(representative.get('duplicate_ids', []) or [])
+                duplicate_ids.extend(flat[i][2].get('id') for i in absorbed)
+                representative['duplicate_ids'] = duplicate_ids
+                dropped.update(absorbed)
+
+    if dropped:
+        print(f"Collapsed {len(dropped)} near-duplicate candidates")
+
+    collapsed: List[List[dict]] = [[] for _ in candidate_lists]
+    for flat_index, (list_index, _, match) in enumerate(flat):
+        if flat_index not in dropped:
+            collapsed[list_index].append(match)
+    return collapsed
@@ -0,0 +1,166 @@
+"""
+Query encoding stage with a process-wide embedding cache.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from config import Config
+from fanout import fan_out
+
+
+class EmbeddingCache:
+    """Thread-safe LRU cache whose entries expire after a fixed TTL."""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size: Maximum number of entries before LRU eviction
+            ttl_seconds: Seconds an entry stays valid after it is stored
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for `key`, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if time.monotonic() - stored_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store `value` under `key`, evicting the least recently used entry if full."""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop all entries and reset counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Shared by every RAGPipeline in the process (baseline and hybrid).
+_embedding_cache = EmbeddingCache(Config.EMBEDDING_CACHE_SIZE, Config.EMBEDDING_CACHE_TTL_SECONDS)
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Return the process-wide query embedding cache."""
+    return _embedding_cache
+
+
+def normalize_query_text(query: str) -> str:
+    """Normalize query text for cache keys (case and whitespace insensitive)."""
+    return " ".join(query.split()).casefold()
+
+
+def embed_query(pc: Any, model: str, query: str, cache: Optional[EmbeddingCache] = None) -> Any:
+    """
+    Embed a query with a Pinecone inference model, using the cache when possible.
+
+    Args:
+        pc: Pinecone client
+        model: Pinecone inference model name
+        query: Query string
+        cache: Embedding cache (defaults to the process-wide cache)
+
+    Returns:
+        Dense vector (list of floats) for dense models, or a
+        {'indices', 'values'} dictionary for sparse models
+    """
+    if cache is None:
+        cache = _embedding_cache
+
+    key = (model, normalize_query_text(query))
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    response = pc.inference.embed(
+        model=model,
+        inputs=query,
+        parameters={"input_type": "query", "truncate": "END"}
+    )
+    embedding = response[0]
+
+    if model == Config.EMBEDDING_MODEL_SPARSE:
+        encoded = {
+            'indices': list(embedding['sparse_indices']),
+            'values': list(embedding['sparse_values'])
+        }
+    else:
+        encoded = list(embedding['values'])
+
+    cache.put(key, encoded)
+    return encoded
+
+
+def encode_query_dense(pc: Any, query: str) -> list:
+    """
+    Encode a query for baseline (dense-only) retrieval.
+
+    Args:
+        pc: Pinecone client
+        query: Query string
+
+    Returns:
+        Dense query vector
+    """
+    return embed_query(pc, Config.EMBEDDING_MODEL_DENSE, query)
+
+
+def encode_query_hybrid(pc: Any, query: str) -> Tuple[list, dict]:
+    """
+    Encode a query for hybrid retrieval, running the dense and sparse
+    embedding calls concurrently.
+
+    Args:
+        pc: Pinecone client
+        query: Query string
+
+    Returns:
+        Tuple of (dense vector, sparse vector dictionary)
+    """
+    models = [Config.EMBEDDING_MODEL_DENSE, Config.EMBEDDING_MODEL_SPARSE]
+    results = fan_out(models, lambda model: embed_query(pc, model, query), max_workers=2)
+
+    for _, error in results:
+        if error is not None:
+            raise error
+
+    (dense_vector, _), (sparse_vector, _) = results
+    return dense_vector, sparse_vector
@@ -0,0 +1,49 @@
+"""
+Bounded-concurrency fan-out for per-location retrieval.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from config import Config
+
+
+def fan_out(
+    items: Sequence[Any],
+    worker: Callable[[Any], Any],
+    max_workers: Optional[int] = None
+) -> List[Tuple[Any, Optional[Exception]]]:
+    """
+    Run `worker` on every item with at most `max_workers` calls in flight.
+
+    A failing item does not cancel the others: its exception is captured and
+    returned in place of a result so the caller can decide what to do with it.
+
+    Args:
+        items: Work items (e.g. {state, county} location dicts)
+        worker: Callable applied to each item
+        max_workers: Maximum concurrent calls (defaults to Config.MAX_CONCURRENT_QUERIES)
+
+    Returns:
+        List of (result, error) tuples in the same order as `items`.
+        Exactly one of result/error is set for each item.
+    """
+    if max_workers is None:
+        max_workers = Config.MAX_CONCURRENT_QUERIES
+
+    if not items:
+        return []
+
+    def run_isolated(item: Any) -> Tuple[Any, Optional[Exception]]:
+        try:
+            return worker(item), None
+        except Exception as e:
+            return None, e
+
+    # A single item (or a concurrency of 1) gains nothing from a thread pool.
+    if len(items) == 1 or max_workers <= 1:
+        return [run_isolated(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        # executor.map yields results in submission order, which keeps the
+        # merged output deterministic regardless of completion order.
+        return list(executor.map(run_isolated, items))
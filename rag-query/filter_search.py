@@ -0,0 +1,297 @@
+"""
+Filter-only search over a local columnar metadata catalog.
+
+Filter-only searches don't need vector similarity, so instead of sending a
+zero vector through Pinecone they scan a parquet catalog with the filters
+pushed down into the scan (row groups are pruned by their min/max stats).
+Results stream in (state, county, id) order with keyset cursor pagination and
+come with exact facet counts.
+
+Build a catalog from the ingestion parquet with:
+    python filter_search.py --parquet chunks.parquet --out catalog.parquet
+"""
+import argparse
+import base64
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+import pyarrow as pa
+import pyarrow.compute
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from config import Config
+from filters import BINARY_FIELDS, NUMERIC_FIELDS, build_pinecone_filter, flatten_locations_payload
+
+
+# Catalog sort order; cursors resume after the last (state, county, id) seen.
+KEY_FIELDS = ("state", "county", "id")
+
+# Column left out of the scan when only IDs and metadata are needed.
+TEXT_FIELD = "chunk_text"
+
+
+def encode_cursor(key: tuple) -> str:
+    """Encode the sort key of the last match on a page as an opaque cursor string."""
+    return base64.urlsafe_b64encode(json.dumps({"after": list(key)}).encode()).decode()
+
+
+def match_cursor(match: dict) -> str:
+    """Cursor that resumes right after `match` (a match returned by FilterCatalog)."""
+    metadata = match.get("metadata", {})
+    return encode_cursor((metadata.get("state"), metadata.get("county"), match.get("id")))
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[tuple]:
+    """Decode a cursor string back into a sort key (None means the start)."""
+    if not cursor:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))["after"]
+        if not isinstance(key, list) or len(key) != len(KEY_FIELDS):
+            raise ValueError
+        return tuple(key)
+    except Exception:
+        raise ValueError("Invalid cursor") from None
+
+
+class FilterCatalog:
+    """Parquet-backed metadata catalog for filter-only search."""
+
+    def __init__(self, path: str):
+        """
+        Open a catalog written by build_catalog.
+
+        Keyset cursors rely on the scan returning rows in (state, county, id)
+        order, which only a single sorted file guarantees; a directory of
+        parquet files is rejected.
+
+        Args:
+            path: Catalog parquet file
+
+        Raises:
+            ValueError: If `path` is not a file
+        """
+        if not os.path.isfile(path):
+            raise ValueError(f"Filter catalog must be a single parquet file written by build_catalog: {path}")
+        self.path = path
+        self.dataset = ds.dataset(path, format="parquet")
+        self.schema = self.dataset.schema
+
+    def build_expression(self, filters: dict) -> Optional[ds.Expression]:
+        """
+        Convert frontend filters into a pyarrow dataset expression.
+
+        Locations are matched as exact (state, county) pairs, and the remaining
+        fields follow build_pinecone_filter semantics.
+
+        Args:
+            filters: Frontend filters (nested or flattened 'locations')
+
+        Returns:
+            Filter expression, or None to match every row
+        """
+        filters = dict(filters)
+        locations = filters.pop("locations", [])
+        if locations and isinstance(locations[0].get("county"), list):
+            locations = flatten_locations_payload({"locations": locations})["locations"]
+
+        clauses = []
+        if locations:
+            counties_by_state: Dict[str, List[str]] = {}
+            for loc in locations:
+                counties_by_state.setdefault(loc["state"], []).append(loc["county"])
+            location_clause = None
+            for state, counties in counties_by_state.items():
+                clause = (ds.field("state") == state) & ds.field("county").isin(counties)
+                location_clause = clause if location_clause is None else location_clause | clause
+            clauses.append(location_clause)
+
+        for field, condition in build_pinecone_filter(filters).items():
+            if field not in self.schema.names:
+                return ds.scalar(False)  # A field missing from the catalog matches nothing
+            column = ds.field(field)
+            if field in NUMERIC_FIELDS and not pa.types.is_floating(self.schema.field(field).type) \
+                    and not pa.types.is_integer(self.schema.field(field).type):
+                column = column.cast(pa.float64())
+            for op, operand in condition.items():
+                if op == "$in":
+                    clauses.append(column.isin(operand))
+                elif op == "$eq":
+                    clauses.append(column == operand)
+                elif op == "$gte":
+                    clauses.append(column >= operand)
+                elif op == "$lte":
+                    clauses.append(column <= operand)
+
+        if not clauses:
+            return None
+        expression = clauses[0]
+        for clause in clauses[1:]:
+            expression = expression & clause
+        return expression
+
+    def after_key(self, key: tuple) -> ds.Expression:
+        """
+        Expression matching rows that sort after `key` in catalog order.
+
+        Args:
+            key: (state, county, id) of the last row already returned
+
+        Returns:
+            Lexicographic "greater than" over KEY_FIELDS
+        """
+        pairs = [(ds.field(name), value) for name, value in zip(KEY_FIELDS, key) if name in self.schema.names]
+        field, value = pairs[-1]
+        expression = field > value
+        for field, value in reversed(pairs[:-1]):
+            expression = (field > value) | ((field == value) & expression)
+        return expression
+
+    def iter_matches(self, filters: dict, after: Optional[tuple] = None, with_text: bool = True) -> Iterator[dict]:
+        """
+        Stream every chunk matching `filters`, in catalog order.
+
+        Args:
+            filters: Frontend filters
+            after: Sort key to resume after (from a cursor); rows up to it are skipped in the scan
+            with_text: Whether to read chunk_text (False loads only IDs and metadata)
+
+        Yields:
+            Match dictionaries shaped like Pinecone matches ('id', 'score', 'metadata')
+        """
+        expression = self.build_expression(filters)
+        if after is not None:
+            expression = self.after_key(after) if expression is None else expression & self.after_key(after)
+        columns = None if with_text else [name for name in self.schema.names if name != TEXT_FIELD]
+
+        scanner = self.dataset.scanner(filter=expression, columns=columns, use_threads=False)
+        for batch in scanner.to_batches():
+            for row in batch.to_pylist():
+                chunk_id = row.pop("id", None)
+                yield {"id": chunk_id, "score": 0.0, "metadata": row}
+
+    def search(
+        self,
+        filters: dict,
+        cursor: Optional[str] = None,
+        page_size: Optional[int] = None,
+        with_text: bool = True
+    ) -> dict:
+        """
+        Return one page of chunks matching `filters`.
+
+        Args:
+            filters: Frontend filters
+            cursor: Cursor from the previous page (None for the first page)
+            page_size: Page size (defaults to Config.FILTER_ONLY_PAGE_SIZE)
+            with_text: Whether to include chunk_text in the matches' metadata
+
+        Returns:
+            Dictionary with 'matches' and 'next_cursor' (None on the last page)
+        """
+        if page_size is None:
+            page_size = Config.FILTER_ONLY_PAGE_SIZE
+        after = decode_cursor(cursor)
+
+        matches = []
+        has_more = False
+        for match in self.iter_matches(filters, after, with_text):
+            if len(matches) == page_size:
+                has_more = True
+                break
+            matches.append(match)
+
+        next_cursor = match_cursor(matches[-1]) if has_more else None
+        return {"matches": matches, "next_cursor": next_cursor}
+
+    def facets(self, filters: dict) -> dict:
+        """
+        Count chunks matching `filters`, in total, per state, county and Y/N flag.
+
+        Only the facet columns are read, so no chunk text is loaded. County
+        names repeat across states, so counties are counted per state.
+
+        Args:
+            filters: Frontend filters
+
+        Returns:
+            Dictionary with 'total', 'state' ({state: count}), 'county'
+            ({state: {county: count}}) and one {value: count} dictionary per flag field
+        """
+        facet_fields = [f for f in ["state", "county"] + BINARY_FIELDS if f in self.schema.names]
+        table = self.dataset.to_table(filter=self.build_expression(filters), columns=facet_fields)
+
+        facets: Dict[str, Any] = {"total": table.num_rows}
+        for field in facet_fields:
+            if field == "county" and "state" in facet_fields:
+                continue
+            counts = pa.compute.value_counts(table.column(field))
+            facets[field] = {
+                item["values"]: item["counts"] for item in counts.to_pylist() if item["values"] is not None
+            }
+        if "county" in facet_fields and "state" in facet_fields:
+            counties: Dict[str, Dict[str, int]] = {}
+            grouped = table.group_by(["state", "county"]).aggregate([("county", "count")])
+            for row in grouped.to_pylist():
+                if row["state"] is not None and row["county"] is not None:
+                    counties.setdefault(row["state"], {})[row["county"]] = row["county_count"]
+            facets["county"] = counties
+        return facets
+
+    def count(self, filters: dict) -> int:
+        """Number of chunks matching `filters`."""
+        return self.dataset.count_rows(filter=self.build_expression(filters))
+
+
+_filter_catalog: Optional[FilterCatalog] = None
+
+
+def get_filter_catalog() -> Optional[FilterCatalog]:
+    """Return the process-wide catalog, or None if Config.METADATA_CATALOG_PATH is unset."""
+    global _filter_catalog
+    if _filter_catalog is None and Config.METADATA_CATALOG_PATH:
+        _filter_catalog = FilterCatalog(Config.METADATA_CATALOG_PATH)
+    return _filter_catalog
+
+
+def build_catalog(parquet_path: str, out_path: str, id_template: str = "{county}#chunk{idx}") -> None:
+    """
+    Build a catalog from the ingestion parquet.
+
+    Adds the vector ID column (same template as ingestion) and sorts rows by
+    (state, county, id): row-group statistics then prune location filters
+    well, and the order is the one keyset cursors resume in.
+
+    Args:
+        parquet_path: Path to the chunk parquet
+        out_path: Output parquet path
+        id_template: Vector ID template, matching the ingestion pipeline
+    """
+    table = pq.read_table(parquet_path)
+
+    ids = []
+    for idx, row in enumerate(table.to_pylist()):
+        try:
+            ids.append(id_template.format(**row, idx=idx))
+        except Exception:
+            ids.append(f"chunk{idx}")
+    table = table.append_column("id", pa.array(ids, type=pa.string()))
+
+    table = table.sort_by([(f, "ascending") for f in KEY_FIELDS if f in table.column_names])
+
+    pq.write_table(table, out_path, row_group_size=Config.CATALOG_ROW_GROUP_SIZE)
+    print(f"Wrote catalog with {table.num_rows} chunks to {out_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the filter-only metadata catalog")
+    parser.add_argument("--parquet", required=True, help="Path to the chunk parquet file")
+    parser.add_argument("--out", required=True, help="Output catalog parquet path")
+    args = parser.parse_args()
+    build_catalog(args.parquet, args.out)
+
+
+if __name__ == "__main__":
+    main()
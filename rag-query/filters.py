@@ -3,6 +3,11 @@ Filter processing utilities for RAG pipeline.
 """
 from typing import Dict, List, Any
 
+# Metadata fields understood by build_pinecone_filter
+MULTI_SELECT_FIELDS = ['state', 'county']
+BINARY_FIELDS = ['penalty', 'obligation', 'permission', 'prohibition']
+NUMERIC_FIELDS = ['fk_grade', 'fre', 'wc', 'pct_complex']
+
 
 def flatten_locations_payload(filters_payload: dict) -> dict:
     """
@@ -45,24 +50,20 @@ def build_pinecone_filter(frontend_filters: dict) -> dict:
     Returns:
         Pinecone-compatible filter dictionary
     """
-    multi_select_fields = ['state', 'county']
-    binary_fields = ['penalty', 'obligation', 'permission', 'prohibition']
-    numeric_fields = ['fk_grade', 'fre', 'wc', 'pct_complex']
-
     pinecone_filter = {}
     for key, value in frontend_filters.items():
         # --- Handle Multi-Select fields (e.g., state, county) ---
-        if key in multi_select_fields:
+        if key in MULTI_SELECT_FIELDS:
             if isinstance(value, list) and len(value) > 0:
                 pinecone_filter[key] = {"$in": value}
 
         # --- Handle Binary Y/N fields ---
-        elif key in binary_fields:
+        elif key in BINARY_FIELDS:
             if value in ('Y', 'N'):
                 pinecone_filter[key] = {"$eq": value}
 
         # --- Handle Numeric fields ---
-        elif key in numeric_fields:
+        elif key in NUMERIC_FIELDS:
             range_query = {}
             if 'min' in value and value['min'] is not None:
                 range_query["$gte"] = value['min']
@@ -0,0 +1,211 @@
+"""
+Deterministic generation cache keyed by the exact LLM input.
+
+With greedy decoding (Config.DO_SAMPLE False) the output is a pure function
+of the model (and how it was loaded), the rendered prompt token IDs and the
+generation parameters, so
+a repeated prompt (the same question over the same chunks) is served without
+touching the GPU. Entries hold the generated token IDs in an in-memory LRU
+tier, optionally backed by SQLite with entry-count and byte limits so they
+survive restarts. Lookups and stores are skipped whenever sampling is on.
+"""
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+from config import Config
+from kv_store import SQLiteStore
+
+
+def model_settings() -> Dict[str, Any]:
+    """Load and decoding settings that change a model's greedy outputs, from Config."""
+    return {
+        'load_in_4bit': Config.LOAD_IN_4BIT,
+        'bnb_4bit_quant_type': Config.BNB_4BIT_QUANT_TYPE,
+        'bnb_4bit_use_double_quant': Config.BNB_4BIT_USE_DOUBLE_QUANT,
+        'assisted_generation': Config.ASSISTED_GENERATION_ENABLED,
+        'draft_model_id': Config.DRAFT_MODEL_ID if Config.ASSISTED_GENERATION_ENABLED else None,
+        'num_assistant_tokens': Config.NUM_ASSISTANT_TOKENS if Config.ASSISTED_GENERATION_ENABLED else None,
+    }
+
+
+def generation_key(
+    model_id: str,
+    prompt_ids: Sequence[int],
+    params: Dict[str, Any],
+    settings: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Hash of everything that determines a greedy generation.
+
+    Args:
+        model_id: LLM identifier
+        prompt_ids: Rendered chat-template input IDs
+        params: Generation parameters (max_new_tokens, terminators, ...)
+        settings: Model load settings (see model_settings)
+
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha256()
+    digest.update(model_id.encode())
+    digest.update(b"\x00" + repr(sorted((settings or {}).items())).encode())
+    digest.update(b"\x00" + repr(sorted(params.items())).encode() + b"\x00")
+    digest.update(array('q', prompt_ids).tobytes())
+    return digest.hexdigest()
+
+
+class GenerationCache:
+    """Two-tier (memory LRU + optional SQLite) cache of generated token IDs."""
+
+    def __init__(
+        self,
+        max_entries: int,
+        persist_path: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        model_id: Optional[str] = None,
+        settings: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum cached generations (memory and disk)
+            persist_path: SQLite file for the on-disk tier (None keeps the cache in memory)
+            max_bytes: Size limit of the on-disk tier
+            model_id: LLM identifier baked into every key (defaults to Config.LLM_MODEL_ID)
+            settings: Model load settings baked into every key (defaults to model_settings())
+        """
+        self.max_entries = max_entries
+        self.model_id = model_id or Config.LLM_MODEL_ID
+        self.settings = model_settings() if settings is None else settings
+        self.store = SQLiteStore(persist_path, max_entries, max_bytes) if persist_path else None
+
+        self._outputs: "OrderedDict[str, List[int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0  # Lookups skipped because sampling was on
+
+    def get(self, prompt_ids: Sequence[int], params: Dict[str, Any]) -> Optional[List[int]]:
+        """
+        Look up a generation.
+
+        Args:
+            prompt_ids: Rendered chat-template input IDs
+            params: Generation parameters; do_sample=True always misses
+
+        Returns:
+            Generated token IDs, or None
+        """
+        if params.get('do_sample'):
+            with self._lock:
+                self.bypassed += 1
+            return None
+
+        key = generation_key(self.model_id, prompt_ids, params, self.settings)
+        with self._lock:
+            output = self._outputs.get(key)
+            if output is not None:
+                self._outputs.move_to_end(key)
+
+        if self.store is not None:
+            if output is not None:
+                self.store.touch(key)  # Keep disk recency in step, so hot entries survive restarts
+            else:
+                raw = self.store.get(key)
+                if raw is not None:
+                    output = array('q', raw).tolist()
+                    self._remember(key, output)
+
+        with self._lock:
+            if output is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return output
+
+    def put(self, prompt_ids: Sequence[int], params: Dict[str, Any], output_ids: Sequence[int]) -> None:
+        """
+        Cache a generation (ignored when do_sample is set).
+
+        Args:
+            prompt_ids: Rendered chat-template input IDs
+            params: Generation parameters
+            output_ids: Generated token IDs
+        """
+        if params.get('do_sample'):
+            return
+        key = generation_key(self.model_id, prompt_ids, params, self.settings)
+        output = list(output_ids)
+        self._remember(key, output)
+        if self.store is not None:
+            self.store.put(key, array('q', output).tobytes())
+
+    def _remember(self, key: str, output: List[int]) -> None:
+        with self._lock:
+            self._outputs[key] = output
+            self._outputs.move_to_end(key)
+            while len(self._outputs) > self.max_entries:
+                self._outputs.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every cached generation."""
+        with self._lock:
+            self._outputs.clear()
+        if self.store is not None:
+            self.store.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            counters = {
+                "size": len(self._outputs),
+                "max_size": self.max_entries,
+                "model_id": self.model_id,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+        counters["persisted"] = len(self.store) if self.store is not None else 0
+        counters["persisted_bytes"] = self.store.size_bytes() if self.store is not None else 0
+        return counters
+
+
+_generation_cache: Optional[GenerationCache] = None
+_generation_cache_lock = threading.Lock()
+
+
+def get_generation_cache() -> GenerationCache:
+    """Return the process-wide generation cache."""
+    global _generation_cache
+    with _generation_cache_lock:
+        if _generation_cache is None:
+            _generation_cache = GenerationCache(
+                Config.GENERATION_CACHE_SIZE,
+                persist_path=Config.GENERATION_CACHE_PATH or None,
+                max_bytes=Config.GENERATION_CACHE_MAX_BYTES
+            )
+        return _generation_cache
+
+
+def generation_cache_for(model: Any) -> Optional[GenerationCache]:
+    """
+    The process-wide generation cache if it is enabled and its keys belong to `model`.
+
+    Args:
+        model: LLM about to generate
+
+    Returns:
+        GenerationCache, or None
+    """
+    if not Config.GENERATION_CACHE_ENABLED:
+        return None
+    cache = get_generation_cache()
+    name_or_path = getattr(getattr(model, 'config', None), 'name_or_path', None)
+    return cache if name_or_path == cache.model_id else None
@@ -0,0 +1,448 @@
+"""
+Dynamic batching scheduler for LLM generation.
+
+Each Flask request used to call model.generate for its own prompt, so
+concurrent users were serialized on (or contended for) the GPU. The scheduler
+gives the model to a single worker thread: callers enqueue their prompt's token
+IDs and wait on a future, and the worker left-pads every prompt that arrives
+within a short window into one batch, runs a single generate call (finished
+sequences stop on the terminators while the rest keep decoding) and resolves
+each caller's future with its own generated tokens.
+
+Streamed requests go through the same worker: a BatchTextStreamer splits each
+decoding step's tokens by row and hands every streaming caller only its own
+text, and a caller that goes away sets its stop event so its row stops
+decoding (the rest of the batch carries on).
+
+With a draft model (assisted generation), a prompt that arrives alone is
+decoded speculatively: the draft proposes tokens and the LLM verifies them in
+one forward pass. Transformers only supports this for one sequence per call,
+so prompts that arrive together are still batched without the draft.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import torch
+from transformers import StoppingCriteria, StoppingCriteriaList
+
+from config import Config
+from rerank_service import Histogram
+
+_STOP = object()
+
+
+def terminator_ids(tokenizer: Any) -> List[int]:
+    """
+    Token IDs that end a response: EOS and Llama 3's <|eot_id|>.
+
+    Args:
+        tokenizer: LLM tokenizer
+
+    Returns:
+        Distinct terminator IDs (tokens the vocabulary lacks are skipped)
+    """
+    candidates = [tokenizer.eos_token_id, tokenizer.convert_tokens_to_ids("<|eot_id|>")]
+    unknown = getattr(tokenizer, 'unk_token_id', None)
+    return list(dict.fromkeys(t for t in candidates if t is not None and t != unknown))
+
+
+class BatchTextStreamer:
+    """
+    transformers streamer that decodes each row of a batch separately.
+
+    Text is emitted up to the last space (or newline) as it is decoded, like
+    TextStreamer, and a row stops emitting at its first terminator.
+    """
+
+    def __init__(
+        self,
+        tokenizer: Any,
+        callbacks: Sequence[Optional[Callable[[str], None]]],
+        terminators: Sequence[int]
+    ):
+        """
+        Initialize the streamer.
+
+        Args:
+            tokenizer: LLM tokenizer
+            callbacks: Per row, called with each new piece of text (None = row not streamed)
+            terminators: IDs that end a row
+        """
+        self.tokenizer = tokenizer
+        self.callbacks = list(callbacks)
+        self.terminators = set(terminators)
+        self._tokens: List[List[int]] = [[] for _ in self.callbacks]
+        self._printed = [0] * len(self.callbacks)
+        self._finished = [callback is None for callback in self.callbacks]
+        self._prompt_seen = False
+
+    def put(self, value: torch.Tensor) -> None:
+        if not self._prompt_seen:  # generate passes the prompt first
+            self._prompt_seen = True
+            return
+        rows = value.tolist()
+        if value.dim() == 1:
+            rows = [[token] for token in rows]
+        for row, tokens in enumerate(rows):
+            if self._finished[row]:
+                continue
+            for token in tokens:
+                if token in self.terminators:
+                    self._flush(row)
+                    break
+                self._tokens[row].append(token)
+            else:
+                self._emit(row, final=False)
+
+    def end(self) -> None:
+        for row in range(len(self.callbacks)):
+            if not self._finished[row]:
+                self._flush(row)
+
+    def _emit(self, row: int, final: bool) -> None:
+        text = self.tokenizer.decode(self._tokens[row], skip_special_tokens=True)
+        printed = self._printed[row]
+        if final or text.endswith("\n"):
+            printable = text
+            self._tokens[row], self._printed[row] = [], 0  # Start a fresh segment
+        else:
+            printable = text[:text.rfind(" ") + 1]  # A word may still change as tokens arrive
+            self._printed[row] = max(printed, len(printable))
+        if len(printable) > printed:
+            self.callbacks[row](printable[printed:])
+
+    def _flush(self, row: int) -> None:
+        self._emit(row, final=True)
+        self._finished[row] = True
+
+
+class StopRequested(StoppingCriteria):
+    """Stops the rows whose stop event is set (e.g. the streaming client disconnected)."""
+
+    def __init__(self, stop_events: Sequence[Optional[threading.Event]]):
+        self.stop_events = list(stop_events)
+
+    def __call__(self, input_ids: torch.Tensor, scores: Any, **kwargs) -> torch.Tensor:
+        stopped = [event is not None and event.is_set() for event in self.stop_events]
+        return torch.tensor(stopped, dtype=torch.bool, device=input_ids.device)
+
+
+def generate_batch(
+    model: Any,
+    prompts: Sequence[Sequence[int]],
+    pad_token_id: int,
+    terminators: Sequence[int],
+    max_new_tokens: int,
+    do_sample: bool,
+    streamer: Any = None,
+    prefix_cache: Any = None,
+    assistant_model: Any = None,
+    stop_events: Optional[Sequence[Optional[threading.Event]]] = None
+) -> List[List[int]]:
+    """
+    Run one generate call over left-padded prompts.
+
+    When every prompt starts with the same prefix from `prefix_cache`, that
+    prefix is not prefilled again: rows are laid out as prefix, padding,
+    rest of prompt, and generate starts from a copy of the prefix's cache.
+
+    Args:
+        model: Causal LM
+        prompts: Prompt token IDs, one list per sequence
+        pad_token_id: ID used for padding and for finished sequences
+        terminators: IDs that end a sequence
+        max_new_tokens: Generation limit per sequence
+        do_sample: Sample instead of greedy decoding
+        streamer: Optional transformers streamer (TextStreamer for one prompt,
+            BatchTextStreamer for several)
+        prefix_cache: Optional PrefixKVCache for this model
+        assistant_model: Optional draft model for assisted generation (single-prompt batches only)
+        stop_events: Optional per-prompt events; a prompt stops decoding once its event is set
+
+    Returns:
+        Generated token IDs per prompt, cut before the first terminator
+    """
+    if assistant_model is not None and len(prompts) > 1:
+        raise ValueError("Assisted generation takes one prompt per generate call")
+
+    prefix: Tuple[int, ...] = ()
+    past_key_values = None
+    if prefix_cache is not None:
+        matches = {prefix_cache.match(ids) for ids in prompts}
+        if len(matches) == 1 and None not in matches:
+            prefix = matches.pop()
+            past_key_values = prefix_cache.expand(prefix, len(prompts))
+        else:
+            prefix_cache.record_miss(len(prompts))
+
+    suffixes = [ids[len(prefix):] for ids in prompts]
+    suffix_width = max(len(ids) for ids in suffixes)
+    width = len(prefix) + suffix_width
+    input_ids = torch.full((len(prompts), width), pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(prompts), width), dtype=torch.long)
+    if prefix:
+        input_ids[:, :len(prefix)] = torch.as_tensor(prefix, dtype=torch.long)
+        attention_mask[:, :len(prefix)] = 1
+    for row, ids in enumerate(suffixes):
+        input_ids[row, width - len(ids):] = torch.as_tensor(ids, dtype=torch.long)
+        attention_mask[row, width - len(ids):] = 1
+
+    generate_kwargs = {'past_key_values': past_key_values} if past_key_values is not None else {}
+    if assistant_model is not None:
+        generate_kwargs['assistant_model'] = assistant_model
+    if stop_events is not None and any(event is not None for event in stop_events):
+        generate_kwargs['stopping_criteria'] = StoppingCriteriaList([StopRequested(stop_events)])
+    with torch.inference_mode():
+        outputs = model.generate(
+            input_ids.to(model.device),
+            attention_mask=attention_mask.to(model.device),
+            pad_token_id=pad_token_id,
+            max_new_tokens=max_new_tokens,
+            eos_token_id=list(terminators),
+            do_sample=do_sample,
+            streamer=streamer,
+            **generate_kwargs
+        )
+
+    stop = set(terminators)
+    responses = []
+    for row in outputs[:, width:].tolist():
+        end = next((i for i, token in enumerate(row) if token in stop), len(row))
+        responses.append(row[:end])
+    return responses
+
+
+class _Request(NamedTuple):
+    prompt_ids: List[int]
+    params: Tuple[int, bool]
+    future: Future
+    on_text: Optional[Callable[[str], None]]
+    stop_event: Optional[threading.Event]
+
+
+class GenerationScheduler:
+    """Single worker thread that owns the LLM and batches prompts across callers."""
+
+    def __init__(
+        self,
+        tokenizer: Any,
+        model: Any,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+        prefix_cache: Any = None,
+        assistant_model: Any = None
+    ):
+        """
+        Start the scheduler.
+
+        Args:
+            tokenizer: LLM tokenizer (supplies the pad and terminator IDs)
+            model: Causal LM
+            max_batch_size: Stop collecting once a batch has this many prompts
+                (defaults to Config.GENERATION_MAX_BATCH_SIZE)
+            max_wait_ms: How long the first prompt in a batch waits for others
+                (defaults to Config.GENERATION_BATCH_WAIT_MS)
+            prefix_cache: Optional PrefixKVCache for this model (see prefix_cache.py)
+            assistant_model: Optional draft model, used for prompts that are served alone
+        """
+        self.tokenizer = tokenizer
+        self.model = model
+        self.prefix_cache = prefix_cache
+        self.assistant_model = assistant_model
+        self.max_batch_size = max_batch_size or Config.GENERATION_MAX_BATCH_SIZE
+        self.max_wait = (Config.GENERATION_BATCH_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000.0
+        self.terminators = terminator_ids(tokenizer)
+        self.pad_token_id = tokenizer.eos_token_id if tokenizer.eos_token_id is not None else tokenizer.pad_token_id
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.assisted_requests = 0
+        self.streamed_requests = 0
+        self.stopped_requests = 0
+        self.prompt_tokens = 0
+        self.generated_tokens = 0
+        self.busy_seconds = 0.0
+        self.queue_depth = Histogram(max_bucket=64)
+        self.batch_size = Histogram(max_bucket=64)
+
+        self._worker = threading.Thread(target=self._run, name="generation-scheduler", daemon=True)
+        self._worker.start()
+
+    def submit(
+        self,
+        prompt_ids: Sequence[int],
+        max_new_tokens: Optional[int] = None,
+        do_sample: Optional[bool] = None,
+        on_text: Optional[Callable[[str], None]] = None,
+        stop_event: Optional[threading.Event] = None
+    ) -> Future:
+        """
+        Queue a prompt for generation.
+
+        Args:
+            prompt_ids: Prompt token IDs (chat template already applied)
+            max_new_tokens: Defaults to Config.MAX_NEW_TOKENS
+            do_sample: Defaults to Config.DO_SAMPLE
+            on_text: Called from the worker thread with each decoded piece of text (streaming)
+            stop_event: Set it to stop decoding this prompt early; the future
+                then resolves to the tokens generated so far
+
+        Returns:
+            Future resolving to the generated token IDs (terminator excluded)
+        """
+        params = (
+            Config.MAX_NEW_TOKENS if max_new_tokens is None else max_new_tokens,
+            Config.DO_SAMPLE if do_sample is None else do_sample,
+        )
+        future: Future = Future()
+        self._queue.put(_Request(list(prompt_ids), params, future, on_text, stop_event))
+        return future
+
+    def generate(self, prompt_ids: Sequence[int], **kwargs) -> List[int]:
+        """Generate for one prompt through the shared worker, blocking until it is done."""
+        return self.submit(prompt_ids, **kwargs).result()
+
+    def close(self) -> None:
+        """Stop the worker after the queued prompts are served."""
+        self._queue.put(_STOP)
+        self._worker.join()
+
+    def _collect(self) -> Optional[List[tuple]]:
+        """Block for one prompt, then gather more until the batch is full or the window closes."""
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        self.queue_depth.record(self._queue.qsize() + 1)
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)  # Stop after serving this batch
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            # Prompts can only share a generate call if they share its settings
+            # (and, to reuse a cached prefix, the prefix).
+            groups: Dict[tuple, List[_Request]] = {}
+            for request in batch:
+                if request.stop_event is not None and request.stop_event.is_set():
+                    request.future.set_result([])  # Caller went away while queued
+                    with self._stats_lock:
+                        self.stopped_requests += 1
+                    continue
+                prefix = self.prefix_cache.match(request.prompt_ids) if self.prefix_cache is not None else None
+                groups.setdefault((request.params, prefix), []).append(request)
+            for ((max_new_tokens, do_sample), _), requests in groups.items():
+                self._serve(requests, max_new_tokens, do_sample)
+
+    def _serve(self, requests: List[_Request], max_new_tokens: int, do_sample: bool) -> None:
+        prompts = [request.prompt_ids for request in requests]
+        # Under load, batching beats speculation; a lone prompt gets the draft model
+        assistant_model = self.assistant_model if len(prompts) == 1 else None
+        streamed = sum(1 for request in requests if request.on_text is not None)
+        streamer = BatchTextStreamer(
+            self.tokenizer, [request.on_text for request in requests], self.terminators
+        ) if streamed else None
+        try:
+            start_time = time.time()
+            responses = generate_batch(
+                self.model, prompts, self.pad_token_id, self.terminators, max_new_tokens, do_sample,
+                streamer=streamer, prefix_cache=self.prefix_cache, assistant_model=assistant_model,
+                stop_events=[request.stop_event for request in requests]
+            )
+            elapsed = time.time() - start_time
+            for request, response in zip(requests, responses):
+                request.future.set_result(response)
+        except Exception as e:
+            for request in requests:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+
+        self.batch_size.record(len(requests))
+        with self._stats_lock:
+            self.requests += len(requests)
+            self.batches += 1
+            if assistant_model is not None:
+                self.assisted_requests += 1
+            self.streamed_requests += streamed
+            self.stopped_requests += sum(
+                1 for request in requests if request.stop_event is not None and request.stop_event.is_set()
+            )
+            self.prompt_tokens += sum(len(ids) for ids in prompts)
+            self.generated_tokens += sum(len(ids) for ids in responses)
+            self.busy_seconds += elapsed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return throughput counters and queue-depth / batch-size histograms."""
+        with self._stats_lock:
+            counters = {
+                "requests": self.requests,
+                "batches": self.batches,
+                "assisted_requests": self.assisted_requests,
+                "streamed_requests": self.streamed_requests,
+                "stopped_requests": self.stopped_requests,
+                "prompt_tokens": self.prompt_tokens,
+                "generated_tokens": self.generated_tokens,
+                "busy_seconds": self.busy_seconds,
+                "tokens_per_second": self.generated_tokens / self.busy_seconds if self.busy_seconds else 0.0,
+                "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            }
+        counters["queue_size"] = self._queue.qsize()
+        counters["queue_depth_histogram"] = self.queue_depth.snapshot()
+        counters["batch_size_histogram"] = self.batch_size.snapshot()
+        return counters
+
+
+_generation_scheduler: Optional[GenerationScheduler] = None
+_generation_scheduler_lock = threading.Lock()
+
+
+def start_generation_scheduler(
+    tokenizer: Any,
+    model: Any,
+    prefix_cache: Any = None,
+    assistant_model: Any = None
+) -> GenerationScheduler:
+    """
+    Return the process-wide generation scheduler, starting it around `model` on first use.
+
+    Args:
+        tokenizer: LLM tokenizer
+        model: Loaded causal LM
+        prefix_cache: Optional PrefixKVCache for the model
+        assistant_model: Optional draft model for assisted generation
+
+    Returns:
+        GenerationScheduler
+    """
+    global _generation_scheduler
+    with _generation_scheduler_lock:
+        if _generation_scheduler is None:
+            _generation_scheduler = GenerationScheduler(
+                tokenizer, model, prefix_cache=prefix_cache, assistant_model=assistant_model
+            )
+        return _generation_scheduler
+
+
+def get_generation_scheduler() -> Optional[GenerationScheduler]:
+    """Return the process-wide generation scheduler, or None if it was never started."""
+    return _generation_scheduler
@@ -0,0 +1,123 @@
+"""
+Small SQLite-backed key/value store used as the on-disk tier of the caches.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+
+class SQLiteStore:
+    """Thread-safe persistent key/value store with LRU eviction by entry count (and optionally size)."""
+
+    def __init__(self, path: str, max_entries: int, max_bytes: Optional[int] = None):
+        """
+        Open (or create) a store.
+
+        Args:
+            path: SQLite database file
+            max_entries: Maximum number of entries kept; least recently used go first
+            max_bytes: Optional limit on the total size of the stored values
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS kv_last_access ON kv (last_access)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the value stored under `key`, or None."""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        """Return {key: value} for the keys that are present."""
+        keys = list(keys)
+        found: Dict[str, bytes] = {}
+        if not keys:
+            return found
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit.
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM kv WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE kv SET last_access = ? WHERE key = ?", [(now, k) for k in found])
+                self._conn.commit()
+        return found
+
+    def touch(self, key: str) -> None:
+        """Mark `key` as just used (for entries served from a memory tier in front of the store)."""
+        with self._lock:
+            self._conn.execute("UPDATE kv SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+
+    def put(self, key: str, value: bytes) -> None:
+        """Store `value` under `key`."""
+        self.put_many({key: value})
+
+    def put_many(self, items: Dict[str, bytes]) -> None:
+        """Store several entries in one transaction, then evict down to max_entries."""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO kv (key, value, last_access) VALUES (?, ?, ?)",
+                [(k, sqlite3.Binary(v), now) for k, v in items.items()]
+            )
+            overflow = self._count() - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM kv WHERE key IN (SELECT key FROM kv ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,)
+                )
+            if self.max_bytes is not None:
+                # Keep the most recently used entries whose running size fits.
+                self._conn.execute(
+                    "DELETE FROM kv WHERE key IN (SELECT key FROM (SELECT key, SUM(LENGTH(value)) OVER "
+                    "(ORDER BY last_access DESC, key) AS running FROM kv) WHERE running > ?)",
+                    (self.max_bytes,)
+                )
+            self._conn.commit()
+
+    def keys(self) -> List[str]:
+        """All stored keys."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT key FROM kv")]
+
+    def clear(self) -> None:
+        """Delete every entry."""
+        with self._lock:
+            self._conn.execute("DELETE FROM kv")
+            self._conn.commit()
+
+    def size_bytes(self) -> int:
+        """Total size of the stored values."""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM kv").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM kv").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
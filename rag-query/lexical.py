@@ -0,0 +1,109 @@
+"""
+BM25 pre-scorer for the reranking cascade.
+
+The cross-encoder is the most expensive retrieval stage, so each location's
+candidates are first scored with BM25 over their chunk_text (the candidate
+list itself is the corpus for IDF and length normalization) and only a
+shortlist goes on to the cross-encoder. The top candidates by retrieval
+score always make the shortlist, so paraphrased matches with little lexical
+overlap are not dropped by BM25 alone.
+"""
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import Config
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def bm25_scores(query: str, texts: List[str], k1: float = 1.2, b: float = 0.75) -> np.ndarray:
+    """
+    BM25 score of every text for a query, using the texts themselves as the corpus.
+
+    Only query terms are counted, so the term-frequency matrix is
+    (len(texts), distinct query terms) and the scoring is one vectorized pass.
+
+    Args:
+        query: Query text
+        texts: Candidate passages
+        k1: Term-frequency saturation
+        b: Length normalization strength
+
+    Returns:
+        float64 array with one score per text
+    """
+    query_terms: Dict[str, int] = {}
+    for term in tokenize(query):
+        query_terms.setdefault(term, len(query_terms))
+    if not texts or not query_terms:
+        return np.zeros(len(texts))
+
+    doc_tokens = [tokenize(text) for text in texts]
+    doc_lengths = np.fromiter((len(tokens) for tokens in doc_tokens), dtype=np.float64, count=len(texts))
+
+    # Flattened (document, query term) ids of every query-term occurrence.
+    doc_ids, term_ids = [], []
+    for doc_id, tokens in enumerate(doc_tokens):
+        for token in tokens:
+            term_id = query_terms.get(token)
+            if term_id is not None:
+                doc_ids.append(doc_id)
+                term_ids.append(term_id)
+
+    num_terms = len(query_terms)
+    tf = np.bincount(
+        np.asarray(doc_ids, dtype=np.int64) * num_terms + np.asarray(term_ids, dtype=np.int64),
+        minlength=len(texts) * num_terms
+    ).reshape(len(texts), num_terms).astype(np.float64)
+
+    doc_freq = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((len(texts) - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    avg_length = doc_lengths.mean() or 1.0
+    norm = k1 * (1.0 - b + b * doc_lengths / avg_length)
+    return ((tf * (k1 + 1.0)) / (tf + norm[:, None])) @ idf
+
+
+def shortlist_candidates(
+    query: str,
+    matches: List[dict],
+    size: Optional[int] = None,
+    retrieval_keep: Optional[int] = None
+) -> List[dict]:
+    """
+    Keep the top `retrieval_keep` candidates by retrieval score, then fill up
+    to `size` with the highest BM25 scores among the rest.
+
+    Args:
+        query: Query text
+        matches: One location's candidates, sorted by retrieval score
+        size: Shortlist size (defaults to Config.CASCADE_SHORTLIST_SIZE)
+        retrieval_keep: Leading matches kept regardless of BM25
+            (defaults to Config.CASCADE_RETRIEVAL_KEEP)
+
+    Returns:
+        Shortlisted matches, still in retrieval-score order
+    """
+    if size is None:
+        size = Config.CASCADE_SHORTLIST_SIZE
+    if retrieval_keep is None:
+        retrieval_keep = Config.CASCADE_RETRIEVAL_KEEP
+    if len(matches) <= size:
+        return matches
+    retrieval_keep = min(retrieval_keep, size)
+
+    rest = matches[retrieval_keep:]
+    texts = [str(match.get('metadata', {}).get('chunk_text', '')) for match in rest]
+    scores = bm25_scores(query, texts, Config.BM25_K1, Config.BM25_B)
+
+    # Stable sort: ties keep retrieval order, so a query with no lexical
+    # overlap degrades to a plain top-`size` cut.
+    keep = np.sort(np.argsort(-scores, kind="stable")[:size - retrieval_keep])
+    return matches[:retrieval_keep] + [rest[i] for i in keep]
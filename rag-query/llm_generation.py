@@ -1,16 +1,108 @@
 """
 LLM generation utilities for RAG pipeline.
 """
-import torch
-from typing import List, Dict, Any, Optional
+import json
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Iterator, List, Dict, Any, Optional
 
 from config import Config
+from generation_cache import generation_cache_for
+from generation_scheduler import BatchTextStreamer, generate_batch, get_generation_scheduler, terminator_ids
+from prefix_cache import PrefixKVCache, get_prefix_cache, start_prefix_cache
+
+_STREAM_END = object()
+
+ANSWER_SYSTEM_PROMPT = """
+    You are a highly intelligent legal analyst. Your goal is to help a user understand the legal information provided.
+    You will be given the user's original question and a list of 'Retrieved Chunks' from a legal database.
+
+    Your task is to generate a natural language response. You MUST follow these rules:
+    1. Base your answer *ONLY* on the information inside the "Retrieved Chunks". Do not use any outside knowledge.
+    2. Use the 'Score, State, County, Section, Tags' fields for quick understanding, but use the full 'Text' field to find the specific answer.
+    3. If the chunks do not contain a clear answer to the user's question, you MUST respond *only* with the text: 'The information was not found in the provided documents.'
+    4. If the chunks *do* contain an answer, summarize it and use the template below to explain the generation process.
+
+    ---
+    TEMPLATE FOR A SUCCESSFUL ANSWER:
+    ### Summary of Findings
+    [Your summary of the answer found in the chunks. Cite the chunks, e.g., "The law prohibits owners from letting their dog disturb the peace [Chunk 1]."]
+
+    ### How This Was Generated
+    To answer your question, this tool performed a search on the UnBarred 2.0 legal database. The "Retrieved Chunks" (which are provided in your CSV file) represent the top 10 most relevant sections of the law found by our search. This summary is based *only* on the information in those chunks. You can review the full text of each chunk in the CSV to verify the information for yourself.
+    ---
+  """
+
+FILTER_ONLY_SYSTEM_PROMPT = """
+    You are a highly intelligent legal analyst.
+    You will be given a *sample* of the top-retrieved legal documents.
+    Your task is to **provide a high-level summary of the main themes** found in this sample.
+
+    - DO NOT try to answer a question.
+    - DO NOT say "I cannot find an answer."
+    - Simply summarize what you see. Group similar topics together.
+    - Start your response with: "The documents in this sample primarily discuss..."
+  """
+
+
+def chunk_details(match: dict) -> str:
+    """
+    The metadata lines of a chunk's context entry (State through Tags).
+
+    Args:
+        match: Retrieved chunk dictionary
+
+    Returns:
+        Newline-terminated lines
+    """
+    metadata = match.get('metadata', {})
+    state = metadata.get('state', 'N/A')
+    county = metadata.get('county', 'N/A')
+    section = metadata.get('section', 'N/A')
+
+    tags = []
+    if metadata.get('obligation') == 'Y':
+        tags.append("Obligation")
+    if metadata.get('penalty') == 'Y':
+        tags.append("Penalty")
+    if metadata.get('permission') == 'Y':
+        tags.append("Permission")
+    if metadata.get('prohibition') == 'Y':
+        tags.append("Prohibition")
+
+    details = f"State: {state}\nCounty: {county}\nSection: {section}\n"
+    if tags:
+        details += f"Tags: {', '.join(tags)}\n"
+    return details
+
+
+def format_chunk(number: int, match: dict, chunk_text: Optional[str] = None) -> str:
+    """
+    One chunk's entry in the LLM context.
+
+    Args:
+        number: Chunk number the LLM cites ([Chunk N])
+        match: Retrieved chunk dictionary
+        chunk_text: Text to show (defaults to the full chunk_text; the context
+            packer passes a truncated version)
+
+    Returns:
+        The formatted entry
+    """
+    if chunk_text is None:
+        chunk_text = match.get('metadata', {}).get('chunk_text', 'N/A')
+    score = match.get('score', 0)
+    return f"[Chunk {number}]\nScore: {score:.4f}\n{chunk_details(match)}Text: \"{chunk_text}\"\n\n"
 
 
 def build_context_string(retrieved_chunks: List[dict], max_chunks: Optional[int] = None) -> str:
     """
     Send only useful metadata to the LLM.
-    
+
+    Every chunk is included in full; the pipeline uses context_packer.pack_context,
+    which fits the chunks into a token budget.
+
     Args:
         retrieved_chunks: List of retrieved chunk dictionaries
         max_chunks: Maximum number of chunks to include (for filter-only search)
@@ -18,7 +110,6 @@ def build_context_string(retrieved_chunks: List[dict], max_chunks: Optional[int]
     Returns:
         Formatted context string for LLM
     """
-    context_string = ""
     if not retrieved_chunks:
         return "No documents were retrieved."
 
@@ -26,73 +117,354 @@ def build_context_string(retrieved_chunks: List[dict], max_chunks: Optional[int]
     if max_chunks is not None:  # filter-only search, only send the first N chunks to LLM
         matches_to_process = matches_to_process[:max_chunks]
 
-    for i, match in enumerate(matches_to_process):
-        metadata = match.get('metadata', {})
-        score = match.get('score', 0)
+    return "".join(format_chunk(i + 1, match) for i, match in enumerate(matches_to_process))
+
 
-        chunk_text = metadata.get('chunk_text', 'N/A')
-        state = metadata.get('state', 'N/A')
-        county = metadata.get('county', 'N/A')
-        section = metadata.get('section', 'N/A')
+def encode_chat(tokenizer: Any, messages: List[Dict[str, str]]) -> List[int]:
+    """
+    Apply the chat template and return the prompt token IDs.
 
-        tags = []
-        if metadata.get('obligation') == 'Y':
-            tags.append("Obligation")
-        if metadata.get('penalty') == 'Y':
-            tags.append("Penalty")
-        if metadata.get('permission') == 'Y':
-            tags.append("Permission")
-        if metadata.get('prohibition') == 'Y':
-            tags.append("Prohibition")
+    Args:
+        tokenizer: LLM tokenizer
+        messages: Chat messages (system and user)
 
-        # --- Build the new, enriched context string ---
-        context_string += f"[Chunk {i+1}]\n"
-        context_string += f"Score: {score:.4f}\n"
-        context_string += f"State: {state}\n"
-        context_string += f"County: {county}\n"
-        context_string += f"Section: {section}\n"
+    Returns:
+        Prompt token IDs, ending with the assistant generation prompt
+    """
+    prompt = tokenizer.apply_chat_template(messages, add_generation_prompt=True, tokenize=False)
+    # The template already starts with the BOS token.
+    return tokenizer(prompt, add_special_tokens=False)['input_ids']
 
-        if tags:
-            context_string += f"Tags: {', '.join(tags)}\n"
 
-        context_string += f"Text: \"{chunk_text}\"\n\n"
+def chat_prefix_ids(tokenizer: Any, system_prompt: str) -> List[int]:
+    """
+    Token IDs every prompt with this system prompt starts with.
 
-    return context_string
+    Two probe conversations that differ only in the user message are encoded
+    and their common prefix is cut back to the last special token (the user
+    turn's header), so the boundary cannot merge with the user text.
 
+    Args:
+        tokenizer: LLM tokenizer
+        system_prompt: Static system prompt
 
-def generate_llm_response(query_text: str, context_string: str, tokenizer: Any, model: Any) -> str:
+    Returns:
+        Prefix token IDs (empty if the template shares nothing usable)
     """
-    Generate LLM response for standard search queries.
-    
+    probes = [
+        encode_chat(tokenizer, [{"role": "system", "content": system_prompt}, {"role": "user", "content": text}])
+        for text in ("a", "b")
+    ]
+    common = 0
+    while common < min(map(len, probes)) and probes[0][common] == probes[1][common]:
+        common += 1
+
+    special = set(tokenizer.all_special_ids)
+    special.update(getattr(tokenizer, 'added_tokens_decoder', {}))
+    while common and probes[0][common - 1] not in special:
+        common -= 1
+    return probes[0][:common]
+
+
+def warm_prefix_cache(tokenizer: Any, model: Any) -> PrefixKVCache:
+    """
+    Prefill the static system prompts once and cache their past_key_values.
+
     Args:
-        query_text: User's query
-        context_string: Context from retrieved chunks
         tokenizer: LLM tokenizer
         model: LLM model
-        
+
+    Returns:
+        The process-wide PrefixKVCache
+    """
+    prefix_cache = start_prefix_cache(model)
+    for system_prompt in (ANSWER_SYSTEM_PROMPT, FILTER_ONLY_SYSTEM_PROMPT):
+        prefix_cache.register(chat_prefix_ids(tokenizer, system_prompt))
+    print(f"Prefix cache ready: {prefix_cache.stats()['prefix_tokens']} tokens per system prompt")
+    return prefix_cache
+
+
+def generation_params(tokenizer: Any) -> Dict[str, Any]:
+    """Parameters that, with the prompt, determine a generation (and its cache key)."""
+    return {
+        'max_new_tokens': Config.MAX_NEW_TOKENS,
+        'do_sample': Config.DO_SAMPLE,
+        'terminators': terminator_ids(tokenizer),
+    }
+
+
+def generate_from_messages(
+    messages: List[Dict[str, str]],
+    tokenizer: Any,
+    model: Any,
+    assistant_model: Any = None
+) -> str:
+    """
+    Generate the assistant's reply to chat messages.
+
+    A prompt generated before (greedy decoding only) is served from the
+    generation cache. Otherwise the request goes through the shared generation
+    scheduler when it is running for this model, so concurrent requests are
+    batched into one generate call.
+
+    Args:
+        messages: Chat messages (system and user)
+        tokenizer: LLM tokenizer
+        model: LLM model
+        assistant_model: Optional draft model for assisted generation (the
+            scheduler uses its own)
+
     Returns:
         Generated response text
     """
-    system_prompt = """
-    You are a highly intelligent legal analyst. Your goal is to help a user understand the legal information provided.
-    You will be given the user's original question and a list of 'Retrieved Chunks' from a legal database.
+    prompt_ids = encode_chat(tokenizer, messages)
+    params = generation_params(tokenizer)
+    cache = generation_cache_for(model)
+    response = cache.get(prompt_ids, params) if cache is not None else None
+    if response is not None:
+        return tokenizer.decode(response, skip_special_tokens=True)
+
+    scheduler = get_generation_scheduler()
+    if scheduler is not None and scheduler.model is model:
+        response = scheduler.generate(prompt_ids)
+    else:
+        response = generate_batch(
+            model,
+            [prompt_ids],
+            pad_token_id=tokenizer.eos_token_id,
+            terminators=params['terminators'],
+            max_new_tokens=params['max_new_tokens'],
+            do_sample=params['do_sample'],
+            prefix_cache=get_prefix_cache(model),
+            assistant_model=assistant_model
+        )[0]
+
+    if cache is not None:
+        cache.put(prompt_ids, params, response)
+    return tokenizer.decode(response, skip_special_tokens=True)
+
+
+def stream_from_messages(
+    messages: List[Dict[str, str]],
+    tokenizer: Any,
+    model: Any,
+    assistant_model: Any = None
+) -> Iterator[str]:
+    """
+    Stream the assistant's reply to chat messages as it is decoded.
 
-    Your task is to generate a natural language response. You MUST follow these rules:
-    1. Base your answer *ONLY* on the information inside the "Retrieved Chunks". Do not use any outside knowledge.
-    2. Use the 'Score, State, County, Section, Tags' fields for quick understanding, but use the full 'Text' field to find the specific answer.
-    3. If the chunks do not contain a clear answer to the user's question, you MUST respond *only* with the text: 'The information was not found in the provided documents.'
-    4. If the chunks *do* contain an answer, summarize it and use the template below to explain the generation process.
+    The prompt goes through the shared generation scheduler when it is running
+    for this model, so streamed and non-streamed requests are batched by the
+    one worker that owns the model; otherwise generate runs on a background
+    thread. When the consumer stops early (e.g. the client disconnects and
+    the generator is closed), decoding stops too.
 
-    ---
-    TEMPLATE FOR A SUCCESSFUL ANSWER:
-    ### Summary of Findings
-    [Your summary of the answer found in the chunks. Cite the chunks, e.g., "The law prohibits owners from letting their dog disturb the peace [Chunk 1]."]
+    Args:
+        messages: Chat messages (system and user)
+        tokenizer: LLM tokenizer
+        model: LLM model
+        assistant_model: Optional draft model for assisted generation (the
+            scheduler uses its own)
 
-    ### How This Was Generated
-    To answer your question, this tool performed a search on the UnBarred 2.0 legal database. The "Retrieved Chunks" (which are provided in your CSV file) represent the top 10 most relevant sections of the law found by our search. This summary is based *only* on the information in those chunks. You can review the full text of each chunk in the CSV to verify the information for yourself.
-    ---
-  """
+    Yields:
+        Decoded text pieces (special tokens skipped)
+    """
+    prompt_ids = encode_chat(tokenizer, messages)
+    params = generation_params(tokenizer)
+    cache = generation_cache_for(model)
+    cached = cache.get(prompt_ids, params) if cache is not None else None
+    if cached is not None:
+        yield tokenizer.decode(cached, skip_special_tokens=True)
+        return
+
+    pieces: "queue.Queue" = queue.Queue()
+    stop = threading.Event()
+    scheduler = get_generation_scheduler()
+    if scheduler is not None and scheduler.model is model:
+        future = scheduler.submit(prompt_ids, on_text=pieces.put, stop_event=stop)
+    else:
+        future = Future()
+
+        def run() -> None:
+            try:
+                future.set_result(generate_batch(
+                    model,
+                    [prompt_ids],
+                    pad_token_id=tokenizer.eos_token_id,
+                    terminators=params['terminators'],
+                    max_new_tokens=params['max_new_tokens'],
+                    do_sample=params['do_sample'],
+                    streamer=BatchTextStreamer(tokenizer, [pieces.put], params['terminators']),
+                    prefix_cache=get_prefix_cache(model),
+                    assistant_model=assistant_model,
+                    stop_events=[stop]
+                )[0])
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name="llm-stream", daemon=True).start()
+    future.add_done_callback(lambda _: pieces.put(_STREAM_END))
+
+    try:
+        while True:
+            text = pieces.get()
+            if text is _STREAM_END:
+                break
+            yield text
+        response = future.result()  # Re-raises a generation error
+    finally:
+        stop.set()  # No-op once generation has finished
+
+    if cache is not None:
+        cache.put(prompt_ids, params, response)
+
+
+class InProcessBackend:
+    """Generates with the Hugging Face model loaded in this process."""
+
+    name = "local"
+
+    def __init__(self, tokenizer: Any, model: Any, assistant_model: Any = None):
+        """
+        Initialize the backend.
+
+        Args:
+            tokenizer: LLM tokenizer
+            model: LLM model
+            assistant_model: Optional draft model for assisted generation
+        """
+        self.tokenizer = tokenizer
+        self.model = model
+        self.assistant_model = assistant_model
+
+    def generate(self, messages: List[Dict[str, str]]) -> str:
+        """Return the assistant's reply to chat messages."""
+        return generate_from_messages(messages, self.tokenizer, self.model, self.assistant_model)
+
+    def stream(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        """Yield the assistant's reply to chat messages as it is decoded."""
+        return stream_from_messages(messages, self.tokenizer, self.model, self.assistant_model)
+
+
+class OpenAICompatibleBackend:
+    """
+    Generates through an OpenAI-compatible chat completions server (vLLM, TGI, ...).
+
+    Requests share a pooled HTTP session, so concurrent Flask threads reuse
+    keep-alive connections to the generation servers. The tokenizer is still
+    loaded locally for context packing, but the model is not.
+    """
+
+    name = "openai"
+    model = None
+
+    def __init__(
+        self,
+        tokenizer: Any,
+        base_url: Optional[str] = None,
+        model_name: Optional[str] = None,
+        api_key: Optional[str] = None,
+        timeout: Optional[float] = None,
+        pool_size: Optional[int] = None
+    ):
+        """
+        Initialize the client.
+
+        Args:
+            tokenizer: LLM tokenizer (used for token budgets, not for generation)
+            base_url: Server URL up to and including /v1 (defaults to Config.GENERATION_API_BASE)
+            model_name: Model name sent with each request (defaults to Config.GENERATION_API_MODEL)
+            api_key: Bearer token, if the server needs one (defaults to Config.GENERATION_API_KEY)
+            timeout: Seconds to wait for the server (defaults to Config.GENERATION_API_TIMEOUT)
+            pool_size: Maximum pooled connections (defaults to Config.GENERATION_API_POOL_SIZE)
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.tokenizer = tokenizer
+        self.url = (base_url or Config.GENERATION_API_BASE).rstrip("/") + "/chat/completions"
+        self.model_name = model_name or Config.GENERATION_API_MODEL
+        self.timeout = timeout or Config.GENERATION_API_TIMEOUT
+
+        pool_size = pool_size or Config.GENERATION_API_POOL_SIZE
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        api_key = Config.GENERATION_API_KEY if api_key is None else api_key
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+    def _payload(self, messages: List[Dict[str, str]], stream: bool) -> Dict[str, Any]:
+        payload = {
+            "model": self.model_name,
+            "messages": messages,
+            "max_tokens": Config.MAX_NEW_TOKENS,
+            "stream": stream,
+        }
+        if not Config.DO_SAMPLE:
+            payload["temperature"] = 0.0  # Greedy, like the in-process backend
+        return payload
+
+    def generate(self, messages: List[Dict[str, str]]) -> str:
+        """Return the assistant's reply to chat messages."""
+        response = self.session.post(self.url, json=self._payload(messages, False), timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"] or ""
+
+    def stream(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        """Yield the assistant's reply to chat messages from the server's event stream."""
+        with self.session.post(
+            self.url, json=self._payload(messages, True), timeout=self.timeout, stream=True
+        ) as response:
+            response.raise_for_status()
+            # Read to the end of the body even after [DONE]; a partly read
+            # response cannot go back to the pool and its connection is dropped.
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    continue
+                choices = json.loads(data).get("choices") or [{}]
+                text = choices[0].get("delta", {}).get("content")
+                if text:
+                    yield text
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def create_generation_backend(tokenizer: Any, model: Any = None, assistant_model: Any = None) -> Any:
+    """
+    Build the backend selected by Config.GENERATION_BACKEND.
+
+    Args:
+        tokenizer: LLM tokenizer
+        model: Loaded LLM (only used by the in-process backend)
+        assistant_model: Loaded draft model (only used by the in-process backend)
+
+    Returns:
+        InProcessBackend or OpenAICompatibleBackend
+    """
+    if Config.GENERATION_BACKEND == "openai":
+        print(f"Using remote generation backend: {Config.GENERATION_API_BASE} ({Config.GENERATION_API_MODEL})")
+        return OpenAICompatibleBackend(tokenizer)
+    if Config.GENERATION_BACKEND != "local":
+        raise ValueError(f"Unknown GENERATION_BACKEND: {Config.GENERATION_BACKEND}")
+    return InProcessBackend(tokenizer, model, assistant_model)
+
+
+def build_answer_messages(query_text: str, context_string: str) -> List[Dict[str, str]]:
+    """
+    Chat messages for a standard search answer.
 
+    Args:
+        query_text: User's query
+        context_string: Context from retrieved chunks
+
+    Returns:
+        System and user messages
+    """
     user_prompt = f"""
     **User's Question:**
     {query_text}
@@ -101,45 +473,62 @@ def generate_llm_response(query_text: str, context_string: str, tokenizer: Any,
     {context_string}
   """
 
-    messages = [
-        {"role": "system", "content": system_prompt},
+    return [
+        {"role": "system", "content": ANSWER_SYSTEM_PROMPT},
         {"role": "user", "content": user_prompt},
     ]
 
-    input_ids = tokenizer.apply_chat_template(
-        messages,
-        add_generation_prompt=True,
-        return_tensors="pt"
-    ).to(model.device)
 
-    terminators = [
-        tokenizer.eos_token_id,
-        tokenizer.convert_tokens_to_ids("<|eot_id|>")
+def build_filter_only_messages(context_string: str) -> List[Dict[str, str]]:
+    """
+    Chat messages for a filter-only search summary.
+
+    Args:
+        context_string: Context from retrieved chunks sample
+
+    Returns:
+        System and user messages
+    """
+    user_prompt = f"""
+    **Retrieved Chunks (Sample):**
+    {context_string}
+  """
+
+    return [
+        {"role": "system", "content": FILTER_ONLY_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt},
     ]
 
-    attention_mask = torch.ones_like(input_ids).to(model.device)
-    pad_token_id = tokenizer.eos_token_id
 
-    outputs = model.generate(
-        input_ids,
-        attention_mask=attention_mask,
-        pad_token_id=pad_token_id,
-        max_new_tokens=Config.MAX_NEW_TOKENS,
-        eos_token_id=terminators,
-        do_sample=Config.DO_SAMPLE
+def filter_only_preamble(num_total_chunks: int) -> str:
+    """Text placed before the LLM summary of a filter-only search."""
+    return (
+        f"Found {num_total_chunks} laws matching your filters. "
+        f"A full list is available in the generated CSV file.\n\n"
+        f"Here is a quick summary of the first 10 results:\n\n"
     )
 
-    response = outputs[0][input_ids.shape[-1]:]
-    response_text = tokenizer.decode(response, skip_special_tokens=True)
 
-    return response_text
+def generate_llm_response(query_text: str, context_string: str, backend: Any) -> str:
+    """
+    Generate LLM response for standard search queries.
+    
+    Args:
+        query_text: User's query
+        context_string: Context from retrieved chunks
+        backend: Generation backend (see create_generation_backend)
+        
+    Returns:
+        Generated response text
+    """
+    messages = build_answer_messages(query_text, context_string)
+    return backend.generate(messages)
 
 
 def generate_llm_response_filter_only_search(
     query_text: str, 
     context_string: str, 
-    tokenizer: Any, 
-    model: Any, 
+    backend: Any, 
     num_total_chunks: int
 ) -> str:
     """
@@ -148,65 +537,49 @@ def generate_llm_response_filter_only_search(
     Args:
         query_text: User's query (empty for filter-only)
         context_string: Context from retrieved chunks sample
-        tokenizer: LLM tokenizer
-        model: LLM model
+        backend: Generation backend (see create_generation_backend)
         num_total_chunks: Total number of chunks retrieved
         
     Returns:
         Generated response text with summary
     """
-    system_prompt = """
-    You are a highly intelligent legal analyst.
-    You will be given a *sample* of the top-retrieved legal documents.
-    Your task is to **provide a high-level summary of the main themes** found in this sample.
+    messages = build_filter_only_messages(context_string)
+    response_text = backend.generate(messages)
+    return filter_only_preamble(num_total_chunks) + response_text
 
-    - DO NOT try to answer a question.
-    - DO NOT say "I cannot find an answer."
-    - Simply summarize what you see. Group similar topics together.
-    - Start your response with: "The documents in this sample primarily discuss..."
-  """
 
-    user_prompt = f"""
-    **Retrieved Chunks (Sample):**
-    {context_string}
-  """
-
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": user_prompt},
-    ]
-
-    input_ids = tokenizer.apply_chat_template(
-        messages,
-        add_generation_prompt=True,
-        return_tensors="pt"
-    ).to(model.device)
+def stream_llm_response(query_text: str, context_string: str, backend: Any) -> Iterator[str]:
+    """
+    Stream the LLM response for a standard search as text pieces.
 
-    terminators = [
-        tokenizer.eos_token_id,
-        tokenizer.convert_tokens_to_ids("<|eot_id|>")
-    ]
+    Args:
+        query_text: User's query
+        context_string: Context from retrieved chunks
+        backend: Generation backend (see create_generation_backend)
 
-    attention_mask = torch.ones_like(input_ids).to(model.device)
-    pad_token_id = tokenizer.eos_token_id
+    Yields:
+        Decoded text, piece by piece; joined they equal generate_llm_response's output
+    """
+    messages = build_answer_messages(query_text, context_string)
+    yield from backend.stream(messages)
 
-    outputs = model.generate(
-        input_ids,
-        attention_mask=attention_mask,
-        pad_token_id=pad_token_id,
-        max_new_tokens=Config.MAX_NEW_TOKENS,
-        eos_token_id=terminators,
-        do_sample=Config.DO_SAMPLE
-    )
 
-    response = outputs[0][input_ids.shape[-1]:]
-    response_text = tokenizer.decode(response, skip_special_tokens=True)
+def stream_llm_response_filter_only_search(
+    context_string: str,
+    backend: Any,
+    num_total_chunks: int
+) -> Iterator[str]:
+    """
+    Stream the LLM response for a filter-only search, preamble first.
 
-    llm_output = (
-        f"Found {num_total_chunks} laws matching your filters. "
-        f"A full list is available in the generated CSV file.\n\n"
-        f"Here is a quick summary of the first 10 results:\n\n"
-        f"{response_text}"
-    )
+    Args:
+        context_string: Context from retrieved chunks sample
+        backend: Generation backend (see create_generation_backend)
+        num_total_chunks: Total number of chunks retrieved
 
-    return llm_output
+    Yields:
+        Decoded text, piece by piece
+    """
+    yield filter_only_preamble(num_total_chunks)
+    messages = build_filter_only_messages(context_string)
+    yield from backend.stream(messages)
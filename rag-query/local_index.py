@@ -0,0 +1,372 @@
+"""
+In-process vector index that serves the same query interface as a Pinecone index.
+
+The index lives in a directory of memory-mapped NumPy arrays:
+    dense.npy           float32 (num_vectors, dimension) dense embeddings
+    sparse_indptr.npy   int64 CSR row pointers for the sparse embeddings
+    sparse_indices.npy  uint32 CSR token indices
+    sparse_values.npy   float32 CSR token weights
+    ids.npy             vector IDs
+    metadata.parquet    one metadata row per vector
+    manifest.json       namespace, dimension and vector count
+
+Build one from the ingestion parquet (with its dense_embedding and
+sparse_embedding columns, or --embed to embed the chunks again) with:
+    python local_index.py --parquet chunks.parquet --out local_index [--states ca ga]
+"""
+import argparse
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from metadata_index import MetadataIndex
+
+
+class LocalIndex:
+    """NumPy-backed stand-in for `pc.Index(...)` (dotproduct metric, single namespace)."""
+
+    def __init__(self, index_dir: str):
+        """
+        Load a local index from disk. Vector arrays are memory-mapped.
+
+        Args:
+            index_dir: Directory written by LocalIndex.build
+        """
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "manifest.json"), "r") as f:
+            self.manifest = json.load(f)
+
+        self.dense = np.load(os.path.join(index_dir, "dense.npy"), mmap_mode="r")
+        self.sparse_indptr = np.load(os.path.join(index_dir, "sparse_indptr.npy"), mmap_mode="r")
+        self.sparse_indices = np.load(os.path.join(index_dir, "sparse_indices.npy"), mmap_mode="r")
+        self.sparse_values = np.load(os.path.join(index_dir, "sparse_values.npy"), mmap_mode="r")
+        self.ids = np.load(os.path.join(index_dir, "ids.npy"), allow_pickle=False)
+        self.metadata = pd.read_parquet(os.path.join(index_dir, "metadata.parquet"))
+        self.metadata_index = MetadataIndex(self.metadata)
+
+    @classmethod
+    def build(
+        cls,
+        index_dir: str,
+        ids: List[str],
+        dense_embeddings: List[List[float]],
+        sparse_embeddings: List[Dict[str, List[float]]],
+        metadata: pd.DataFrame,
+        namespace: str = Config.PINECONE_NAMESPACE
+    ) -> "LocalIndex":
+        """
+        Write a local index to disk and load it.
+
+        Args:
+            index_dir: Output directory
+            ids: Vector IDs
+            dense_embeddings: Dense embedding per vector
+            sparse_embeddings: Sparse embedding per vector ({'indices', 'values'})
+            metadata: DataFrame with one metadata row per vector
+            namespace: Namespace name reported by describe_index_stats
+
+        Returns:
+            The loaded LocalIndex
+        """
+        if not (len(ids) == len(dense_embeddings) == len(sparse_embeddings) == len(metadata)):
+            raise ValueError("ids, dense_embeddings, sparse_embeddings, and metadata must have the same length")
+
+        os.makedirs(index_dir, exist_ok=True)
+
+        dense = np.asarray(dense_embeddings, dtype=np.float32)
+        np.save(os.path.join(index_dir, "dense.npy"), dense)
+
+        lengths = [len(s.get("indices", [])) for s in sparse_embeddings]
+        indptr = np.zeros(len(sparse_embeddings) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        indices = np.fromiter(
+            (i for s in sparse_embeddings for i in s.get("indices", [])), dtype=np.uint32, count=int(indptr[-1])
+        )
+        values = np.fromiter(
+            (v for s in sparse_embeddings for v in s.get("values", [])), dtype=np.float32, count=int(indptr[-1])
+        )
+        np.save(os.path.join(index_dir, "sparse_indptr.npy"), indptr)
+        np.save(os.path.join(index_dir, "sparse_indices.npy"), indices)
+        np.save(os.path.join(index_dir, "sparse_values.npy"), values)
+
+        np.save(os.path.join(index_dir, "ids.npy"), np.asarray(ids, dtype=str))
+        metadata.reset_index(drop=True).to_parquet(os.path.join(index_dir, "metadata.parquet"), index=False)
+
+        manifest = {
+            "namespace": namespace,
+            "dimension": int(dense.shape[1]) if dense.ndim == 2 else 0,
+            "total_vector_count": len(ids),
+        }
+        with open(os.path.join(index_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f)
+
+        return cls(index_dir)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def describe_index_stats(self, **kwargs) -> dict:
+        """Return index statistics in the same shape as Pinecone's describe_index_stats."""
+        return {
+            "dimension": self.manifest["dimension"],
+            "total_vector_count": self.manifest["total_vector_count"],
+            "namespaces": {
+                self.manifest["namespace"]: {"vector_count": self.manifest["total_vector_count"]}
+            },
+        }
+
+    def query(
+        self,
+        namespace: Optional[str] = None,
+        top_k: int = 10,
+        vector: Optional[List[float]] = None,
+        sparse_vector: Optional[Dict[str, List[float]]] = None,
+        filter: Optional[dict] = None,
+        include_metadata: bool = False,
+        include_values: bool = False,
+        **kwargs
+    ) -> dict:
+        """
+        Score vectors matching `filter` and return the top_k, like pinecone_index.query.
+
+        Scores are dense dot product plus sparse dot product (Pinecone's
+        dotproduct metric for hybrid queries).
+
+        Args:
+            namespace: Ignored beyond echoing it back (the index holds one namespace)
+            top_k: Number of matches to return
+            vector: Dense query vector
+            sparse_vector: Sparse query vector ({'indices', 'values'})
+            filter: Metadata filter using the $in/$eq/$gte/$lte subset
+            include_metadata: Whether to attach metadata to each match
+            include_values: Whether to attach dense values to each match
+
+        Returns:
+            Dictionary with 'matches' (each with 'id', 'score' and optionally
+            'metadata'/'values') and 'namespace'
+        """
+        candidates = np.flatnonzero(self.evaluate_filter(filter))
+        scores = np.zeros(len(candidates), dtype=np.float32)
+
+        if len(candidates) and vector is not None:
+            query_vector = np.asarray(vector, dtype=np.float32)
+            scores += self.dense[candidates] @ query_vector
+
+        if len(candidates) and sparse_vector:
+            scores += self._sparse_scores(candidates, sparse_vector)
+
+        if top_k < len(candidates):
+            top = np.argpartition(-scores, top_k)[:top_k]
+        else:
+            top = np.arange(len(candidates))
+        # Stable sort keeps ties in index order, so results are deterministic.
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        matches = []
+        for position in top:
+            row = int(candidates[position])
+            match = {"id": str(self.ids[row]), "score": float(scores[position])}
+            if include_metadata:
+                match["metadata"] = self._metadata_row(row)
+            if include_values:
+                match["values"] = self.dense[row].tolist()
+            matches.append(match)
+
+        return {"matches": matches, "namespace": namespace or self.manifest["namespace"]}
+
+    def evaluate_filter(self, filter: Optional[dict]) -> np.ndarray:
+        """
+        Evaluate a Pinecone metadata filter into a boolean row mask.
+
+        Supports the operators build_pinecone_filter emits: $in, $eq, $gte, $lte.
+        A field missing from the metadata matches nothing, as in Pinecone.
+
+        Args:
+            filter: Pinecone-style metadata filter
+
+        Returns:
+            Boolean array with one entry per vector
+        """
+        if filter and any(field not in self.metadata.columns for field in filter):
+            return np.zeros(len(self), dtype=bool)
+        return self.metadata_index.mask(filter)
+
+    def _sparse_scores(self, rows: np.ndarray, sparse_vector: Dict[str, List[float]]) -> np.ndarray:
+        """Dot product of the sparse query with the CSR rows in `rows`."""
+        order = np.argsort(sparse_vector["indices"])
+        query_indices = np.asarray(sparse_vector["indices"], dtype=np.uint32)[order]
+        query_values = np.asarray(sparse_vector["values"], dtype=np.float32)[order]
+        if len(query_indices) == 0:
+            return np.zeros(len(rows), dtype=np.float32)
+
+        # Gather the nonzeros of the selected rows without a Python loop.
+        starts = self.sparse_indptr[rows]
+        lengths = self.sparse_indptr[rows + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.zeros(len(rows), dtype=np.float32)
+        row_of_nnz = np.repeat(np.arange(len(rows)), lengths)
+        offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        nnz = starts[row_of_nnz] + offsets
+
+        doc_indices = self.sparse_indices[nnz]
+        positions = np.minimum(np.searchsorted(query_indices, doc_indices), len(query_indices) - 1)
+        hit = query_indices[positions] == doc_indices
+        contributions = self.sparse_values[nnz][hit] * query_values[positions[hit]]
+
+        return np.bincount(row_of_nnz[hit], weights=contributions, minlength=len(rows)).astype(np.float32)
+
+    def _metadata_row(self, row: int) -> dict:
+        """Metadata for one vector as plain Python values."""
+        record = self.metadata.iloc[row].to_dict()
+        return {k: (v.item() if hasattr(v, "item") else v) for k, v in record.items()}
+
+
+def embed_passages(pc: Any, model: str, texts: List[str], batch_size: int = 96) -> list:
+    """
+    Embed chunk texts as passages with a Pinecone inference model.
+
+    Args:
+        pc: Pinecone client
+        model: Pinecone inference model name
+        texts: Chunk texts
+        batch_size: Batch size for embedding
+
+    Returns:
+        Dense vectors, or {'indices', 'values'} dictionaries for the sparse model
+    """
+    embeddings = []
+    for i in range(0, len(texts), batch_size):
+        result = pc.inference.embed(
+            model=model,
+            inputs=texts[i:i + batch_size],
+            parameters={"input_type": "passage", "truncate": "END"}
+        )
+        if model == Config.EMBEDDING_MODEL_SPARSE:
+            embeddings.extend(
+                {"indices": item["sparse_indices"], "values": item["sparse_values"]} for item in result
+            )
+        else:
+            embeddings.extend(item["values"] for item in result)
+        print(f"Embedded {min(i + batch_size, len(texts))}/{len(texts)} chunks with {model}")
+    return embeddings
+
+
+def ingestion_metadata(rows: List[dict], columns: List[str]) -> pd.DataFrame:
+    """
+    Metadata as the ingestion pipeline stores it in Pinecone: every field as str(value).
+
+    Args:
+        rows: Parquet rows as Python values (nulls as None)
+        columns: Metadata columns
+
+    Returns:
+        DataFrame of strings, one row per chunk
+    """
+    return pd.DataFrame({column: [str(row.get(column, "")) for row in rows] for column in columns})
+
+
+def build_local_index_from_parquet(
+    parquet_path: str,
+    index_dir: str,
+    states: Optional[List[str]] = None,
+    id_template: str = "{county}#chunk{idx}",
+    dense_column: str = "dense_embedding",
+    sparse_column: str = "sparse_embedding",
+    metadata_columns: Optional[List[str]] = None,
+    embed_missing: bool = False
+) -> LocalIndex:
+    """
+    Build a local index from the ingestion parquet.
+
+    Embeddings are read from the parquet's `dense_column` (list of floats) and
+    `sparse_column` ({'indices', 'values'}) when present, so no inference call
+    is made. Otherwise, with `embed_missing`, chunks are re-embedded with the
+    Pinecone models used at ingestion time. IDs and metadata follow ingestion:
+    IDs are numbered over the full parquet and every metadata field is stored
+    as a string, so filters and results match the Pinecone index.
+
+    Args:
+        parquet_path: Path to the chunk parquet (must have a 'chunk_text' column)
+        index_dir: Output directory
+        states: Only index these states (e.g. the hot states); all rows if omitted
+        id_template: Vector ID template, matching the ingestion pipeline
+        dense_column: Column holding precomputed dense embeddings
+        sparse_column: Column holding precomputed sparse embeddings
+        metadata_columns: Columns stored as metadata (defaults to every
+            non-embedding column, as ingestion does)
+        embed_missing: Embed through Pinecone inference when the embedding columns are missing
+
+    Returns:
+        The loaded LocalIndex
+
+    Raises:
+        ValueError: If the embedding columns are missing and `embed_missing` is False
+    """
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(parquet_path)
+    has_embeddings = dense_column in table.column_names and sparse_column in table.column_names
+    if not has_embeddings and not embed_missing:
+        raise ValueError(
+            f"{parquet_path} has no '{dense_column}'/'{sparse_column}' columns; "
+            f"pass embed_missing=True (--embed) to embed the chunks through Pinecone inference"
+        )
+    if metadata_columns is None:
+        metadata_columns = [c for c in table.column_names if c not in (dense_column, sparse_column)]
+    rows = table.to_pylist()
+
+    # IDs are numbered over the full parquet, as at ingestion, before any state filter
+    ids = []
+    for idx, row in enumerate(rows):
+        try:
+            ids.append(id_template.format(**row, idx=idx))
+        except Exception:
+            ids.append(f"chunk{idx}")
+
+    if states:
+        keep = [str(row.get("state")) in states for row in rows]
+        ids = [chunk_id for chunk_id, kept in zip(ids, keep) if kept]
+        rows = [row for row, kept in zip(rows, keep) if kept]
+    print(f"Building local index from {len(rows)} chunks in {parquet_path}")
+
+    if has_embeddings:
+        dense = [row[dense_column] for row in rows]
+        sparse = [row[sparse_column] for row in rows]
+    else:
+        from pinecone import Pinecone
+
+        pc = Pinecone(api_key=Config.PINECONE_API_KEY)
+        texts = [str(row["chunk_text"]) for row in rows]
+        dense = embed_passages(pc, Config.EMBEDDING_MODEL_DENSE, texts)
+        sparse = embed_passages(pc, Config.EMBEDDING_MODEL_SPARSE, texts)
+
+    return LocalIndex.build(index_dir, ids, dense, sparse, ingestion_metadata(rows, metadata_columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a local NumPy index from the ingestion parquet")
+    parser.add_argument("--parquet", required=True, help="Path to the chunk parquet file")
+    parser.add_argument("--out", default=Config.LOCAL_INDEX_DIR, help="Output index directory")
+    parser.add_argument("--states", nargs="*", default=None, help="Only index these states")
+    parser.add_argument("--dense-column", default="dense_embedding", help="Column with precomputed dense embeddings")
+    parser.add_argument("--sparse-column", default="sparse_embedding", help="Column with precomputed sparse embeddings")
+    parser.add_argument("--metadata-cols", nargs="*", default=None,
+                        help="Metadata columns, as passed to ingestion (default: all non-embedding columns)")
+    parser.add_argument("--embed", action="store_true",
+                        help="Embed through Pinecone inference if the parquet has no embedding columns")
+    args = parser.parse_args()
+
+    index = build_local_index_from_parquet(
+        args.parquet, args.out, args.states, dense_column=args.dense_column, sparse_column=args.sparse_column,
+        metadata_columns=args.metadata_cols or None, embed_missing=args.embed
+    )
+    print(index.describe_index_stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Precomputed metadata indexes for fast filter evaluation over local chunks.
+
+Categorical fields (state, county, Y/N flags) get one posting per value and
+numeric fields (readability metrics) get a sorted array, so a Pinecone-style
+filter compiles into a handful of bitmap ORs/ANDs instead of per-row checks.
+
+Postings follow the roaring-bitmap container idea: values that cover many rows
+are stored as packed bitsets, rare values as sorted uint32 row-id arrays.
+Other columns of the metadata table (e.g. section) can still be filtered on;
+they are evaluated with a column scan.
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from filters import MULTI_SELECT_FIELDS, BINARY_FIELDS, NUMERIC_FIELDS
+
+
+def rows_to_bitset(rows: np.ndarray, num_rows: int) -> np.ndarray:
+    """Pack row ids into a little-endian bitset of `num_rows` bits."""
+    dense = np.zeros(num_rows, dtype=bool)
+    dense[rows] = True
+    return np.packbits(dense, bitorder="little")
+
+
+def bitset_to_mask(bits: np.ndarray, num_rows: int) -> np.ndarray:
+    """Unpack a bitset into a boolean row mask."""
+    return np.unpackbits(bits, count=num_rows, bitorder="little").astype(bool)
+
+
+class MetadataIndex:
+    """Bitmap postings for categorical fields and sorted arrays for numeric fields."""
+
+    def __init__(
+        self,
+        metadata: pd.DataFrame,
+        categorical_fields: Optional[List[str]] = None,
+        numeric_fields: Optional[List[str]] = None
+    ):
+        """
+        Build the index from a metadata table.
+
+        Args:
+            metadata: DataFrame with one row per chunk
+            categorical_fields: Fields to index by exact value (defaults to the
+                multi-select and Y/N fields from filters.py that are present)
+            numeric_fields: Fields to index for range queries (defaults to the
+                numeric fields from filters.py that are present)
+        """
+        if categorical_fields is None:
+            categorical_fields = [f for f in MULTI_SELECT_FIELDS + BINARY_FIELDS if f in metadata.columns]
+        if numeric_fields is None:
+            numeric_fields = [f for f in NUMERIC_FIELDS if f in metadata.columns]
+
+        self.metadata = metadata
+        self.num_rows = len(metadata)
+        # A bitset costs num_rows / 8 bytes; a uint32 array costs 4 bytes per row.
+        self._bitset_threshold = max(1, self.num_rows // 32)
+
+        self.postings: Dict[str, Dict[Any, np.ndarray]] = {}
+        for field in categorical_fields:
+            self.postings[field] = self._build_postings(metadata[field])
+
+        self.sorted_values: Dict[str, np.ndarray] = {}
+        self.sorted_rows: Dict[str, np.ndarray] = {}
+        for field in numeric_fields:
+            values = pd.to_numeric(metadata[field], errors="coerce").to_numpy(dtype=np.float64)
+            valid = np.flatnonzero(~np.isnan(values))  # NaN never satisfies a range
+            order = valid[np.argsort(values[valid], kind="stable")]
+            self.sorted_values[field] = values[order]
+            self.sorted_rows[field] = order.astype(np.uint32)
+
+    def _build_postings(self, column: pd.Series) -> Dict[Any, np.ndarray]:
+        """Group row ids by value with one sort instead of one scan per value."""
+        codes, uniques = pd.factorize(column, use_na_sentinel=True)
+        order = np.argsort(codes, kind="stable").astype(np.uint32)
+        boundaries = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+
+        postings = {}
+        for code, value in enumerate(uniques):
+            rows = order[boundaries[code]:boundaries[code + 1]]
+            if len(rows) >= self._bitset_threshold:
+                postings[value] = rows_to_bitset(rows, self.num_rows)
+            else:
+                postings[value] = rows
+        return postings
+
+    def _as_bitset(self, posting: np.ndarray) -> np.ndarray:
+        if posting.dtype == np.uint8:
+            return posting
+        return rows_to_bitset(posting, self.num_rows)
+
+    def all_rows(self) -> np.ndarray:
+        """Bitset with every row set."""
+        return rows_to_bitset(np.arange(self.num_rows), self.num_rows)
+
+    def no_rows(self) -> np.ndarray:
+        """Bitset with no rows set."""
+        return np.zeros((self.num_rows + 7) // 8, dtype=np.uint8)
+
+    def value_bitset(self, field: str, values: List[Any]) -> np.ndarray:
+        """Bitset of rows whose `field` equals any of `values`."""
+        if field not in self.postings:
+            if field not in self.metadata.columns:
+                return self.no_rows()  # A field no chunk has matches nothing
+            rows = np.flatnonzero(self.metadata[field].isin(values).to_numpy())
+            return rows_to_bitset(rows, self.num_rows)
+        postings = [self.postings[field][v] for v in values if v in self.postings[field]]
+        if not postings:
+            return self.no_rows()
+        if len(postings) == 1:
+            return self._as_bitset(postings[0])
+        # Array postings are merged first so only one bitset is materialized for them.
+        arrays = [p for p in postings if p.dtype != np.uint8]
+        bitsets = [p for p in postings if p.dtype == np.uint8]
+        if arrays:
+            bitsets.append(rows_to_bitset(np.concatenate(arrays), self.num_rows))
+        return np.bitwise_or.reduce(bitsets)
+
+    def range_bitset(self, field: str, low: Optional[float] = None, high: Optional[float] = None) -> np.ndarray:
+        """Bitset of rows with low <= field <= high (either bound may be omitted)."""
+        if field not in self.sorted_values:
+            if field not in self.metadata.columns:
+                return self.no_rows()
+            values = pd.to_numeric(self.metadata[field], errors="coerce").to_numpy(dtype=np.float64)
+            mask = ~np.isnan(values)
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+            return rows_to_bitset(np.flatnonzero(mask), self.num_rows)
+        values = self.sorted_values[field]
+        start = 0 if low is None else np.searchsorted(values, low, side="left")
+        end = len(values) if high is None else np.searchsorted(values, high, side="right")
+        return rows_to_bitset(self.sorted_rows[field][start:end], self.num_rows)
+
+    def compile(self, pinecone_filter: Optional[dict]) -> List[np.ndarray]:
+        """
+        Compile a Pinecone filter ($in/$eq/$gte/$lte) into bitsets to AND together.
+
+        Args:
+            pinecone_filter: Filter as produced by build_pinecone_filter
+
+        Returns:
+            List of bitsets, one per field condition
+        """
+        bitsets = []
+        for field, condition in (pinecone_filter or {}).items():
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+
+            if field in self.sorted_values and set(condition) <= {"$gte", "$lte"}:
+                bitsets.append(self.range_bitset(field, condition.get("$gte"), condition.get("$lte")))
+                continue
+
+            for op, operand in condition.items():
+                if op == "$in":
+                    bitsets.append(self.value_bitset(field, list(operand)))
+                elif op == "$eq":
+                    bitsets.append(self.value_bitset(field, [operand]))
+                elif op in ("$gte", "$lte"):
+                    bounds = {"low": operand} if op == "$gte" else {"high": operand}
+                    bitsets.append(self.range_bitset(field, **bounds))
+                else:
+                    raise ValueError(f"Unsupported filter operator for metadata index: {op}")
+        return bitsets
+
+    def evaluate(self, pinecone_filter: Optional[dict]) -> np.ndarray:
+        """Evaluate a Pinecone filter into a bitset of matching rows."""
+        bitsets = self.compile(pinecone_filter)
+        if not bitsets:
+            return self.all_rows()
+        return np.bitwise_and.reduce(bitsets)
+
+    def mask(self, pinecone_filter: Optional[dict]) -> np.ndarray:
+        """Evaluate a Pinecone filter into a boolean row mask."""
+        return bitset_to_mask(self.evaluate(pinecone_filter), self.num_rows)
+
+    def rows(self, pinecone_filter: Optional[dict]) -> np.ndarray:
+        """Evaluate a Pinecone filter into sorted matching row ids."""
+        return np.flatnonzero(self.mask(pinecone_filter))
+
+    def count(self, pinecone_filter: Optional[dict]) -> int:
+        """Number of rows matching a Pinecone filter."""
+        return int(self.mask(pinecone_filter).sum())
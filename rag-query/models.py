@@ -5,7 +5,7 @@ import torch
 from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
 from sentence_transformers.cross_encoder import CrossEncoder
 from huggingface_hub import login
-from typing import Tuple
+from typing import Any, Tuple
 
 from config import Config
 
@@ -44,14 +44,53 @@ def initialize_llm() -> Tuple[AutoTokenizer, AutoModelForCausalLM]:
     return tokenizer, model
 
 
-def initialize_reranker() -> CrossEncoder:
+def initialize_draft_model() -> AutoModelForCausalLM:
     """
-    Initialize and load the reranker model.
+    Load the small draft model used for assisted generation.
+    
+    The draft model must share the LLM's tokenizer. It is small enough to keep
+    in half precision; 4-bit kernels would slow down the many short forward
+    passes it runs.
+    
+    Returns:
+        Draft model
+    """
+    login(token=Config.HF_TOKEN)
+    print(f"Loading draft model: {Config.DRAFT_MODEL_ID}")
+    draft_model = AutoModelForCausalLM.from_pretrained(
+        Config.DRAFT_MODEL_ID,
+        torch_dtype=torch.bfloat16,
+        device_map="auto"
+    )
+    draft_model.generation_config.num_assistant_tokens = Config.NUM_ASSISTANT_TOKENS
+    print("Draft model loaded successfully.")
+    return draft_model
+
+
+def initialize_tokenizer() -> AutoTokenizer:
+    """
+    Load only the LLM tokenizer (remote generation backends still count tokens locally).
+    
+    Returns:
+        Tokenizer
+    """
+    login(token=Config.HF_TOKEN)
+    print(f"Loading LLM tokenizer: {Config.LLM_MODEL_ID}")
+    return AutoTokenizer.from_pretrained(Config.LLM_MODEL_ID)
+
+
+def initialize_reranker() -> Any:
+    """
+    Initialize and load the reranker model for Config.RERANKER_BACKEND.
     
     Returns:
-        CrossEncoder model for reranking
+        CrossEncoder (pytorch) or OnnxCrossEncoder (onnx); both expose predict(pairs, batch_size)
     """
-    print(f"Loading reranker model: {Config.RERANKER_MODEL_ID}")
-    reranker_model = CrossEncoder(Config.RERANKER_MODEL_ID)
+    print(f"Loading reranker model: {Config.RERANKER_MODEL_ID} ({Config.RERANKER_BACKEND} backend)")
+    if Config.RERANKER_BACKEND == "onnx":
+        from onnx_reranker import load_onnx_reranker
+        reranker_model = load_onnx_reranker()
+    else:
+        reranker_model = CrossEncoder(Config.RERANKER_MODEL_ID, max_length=Config.RERANKER_MAX_LENGTH)
     print("Reranker model loaded successfully.")
     return reranker_model
@@ -0,0 +1,218 @@
+"""
+ONNX Runtime backend for the cross-encoder reranker.
+
+The Hugging Face cross-encoder is exported once to ONNX and, optionally,
+dynamically quantized to int8 weights. OnnxCrossEncoder exposes the same
+predict(pairs, batch_size=...) interface and applies the same activation as
+sentence-transformers' CrossEncoder, so scores are interchangeable with the
+PyTorch backend.
+
+Export a model ahead of time with:
+    python onnx_reranker.py --model cross-encoder/ms-marco-MiniLM-L-6-v2 --out onnx_reranker
+"""
+import argparse
+import inspect
+import json
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import Config
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model.int8.onnx"
+
+
+def export_onnx_reranker(model_id: str, out_dir: str, quantize: bool = True, opset: int = 17) -> str:
+    """
+    Export a Hugging Face cross-encoder to ONNX, with optional int8 quantization.
+
+    Args:
+        model_id: Hugging Face model ID or local path
+        out_dir: Output directory (receives the ONNX model, config and tokenizer)
+        quantize: Also write a dynamically quantized int8 model
+        opset: ONNX opset version
+
+    Returns:
+        Path of the model file the backend should load
+    """
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    print(f"Exporting reranker {model_id} to ONNX in {out_dir}")
+
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    model = AutoModelForSequenceClassification.from_pretrained(model_id, attn_implementation="eager").eval()
+
+    sample = tokenizer([("query", "passage text")], padding=True, truncation=True, return_tensors="pt")
+    # Exported inputs are positional, so follow the order of forward()'s parameters.
+    input_names = [name for name in inspect.signature(model.forward).parameters if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+
+    # Newer torch defaults to the dynamo exporter; keep the TorchScript one where the flag exists.
+    export_kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        export_kwargs["dynamo"] = False
+
+    model_path = os.path.join(out_dir, MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            **export_kwargs
+        )
+    tokenizer.save_pretrained(out_dir)
+    model.config.save_pretrained(out_dir)
+
+    if not quantize:
+        return model_path
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized_path = os.path.join(out_dir, QUANTIZED_MODEL_FILE)
+    quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+    print(f"Wrote int8 model to {quantized_path}")
+    return quantized_path
+
+
+def resolve_activation(config: dict) -> str:
+    """
+    Activation CrossEncoder.predict applies on top of the logits.
+
+    Mirrors sentence-transformers: an activation stored in the model config
+    wins, otherwise single-label models use a sigmoid.
+
+    Args:
+        config: The model's config.json contents
+
+    Returns:
+        'sigmoid' or 'identity'
+    """
+    activation_path = (config.get("sentence_transformers") or {}).get("activation_fn") \
+        or config.get("sbert_ce_default_activation_function")
+    if activation_path:
+        return "sigmoid" if activation_path.endswith("Sigmoid") else "identity"
+
+    num_labels = len(config.get("id2label") or {}) or config.get("num_labels", 1)
+    return "sigmoid" if num_labels == 1 else "identity"
+
+
+class OnnxCrossEncoder:
+    """Cross-encoder scored with ONNX Runtime on CPU."""
+
+    def __init__(self, model_dir: str, quantized: bool = True, max_length: Optional[int] = None):
+        """
+        Load an exported reranker.
+
+        Args:
+            model_dir: Directory written by export_onnx_reranker
+            quantized: Load the int8 model instead of the fp32 one
+            max_length: Maximum tokens per (query, passage) pair (defaults to
+                Config.RERANKER_MAX_LENGTH)
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_dir = model_dir
+        self.max_length = max_length or Config.RERANKER_MAX_LENGTH
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        with open(os.path.join(model_dir, "config.json")) as f:
+            self.activation = resolve_activation(json.load(f))
+
+        model_file = QUANTIZED_MODEL_FILE if quantized else MODEL_FILE
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, model_file),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def predict(self, pairs: Sequence[Tuple[str, str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """
+        Score (query, passage) pairs.
+
+        Args:
+            pairs: (query, passage) tuples
+            batch_size: Pairs per ONNX Runtime call
+
+        Returns:
+            float32 array with one score per pair
+        """
+        scores: List[np.ndarray] = []
+        for start in range(0, len(pairs), batch_size):
+            batch = pairs[start:start + batch_size]
+            encoded = self.tokenizer(
+                [query for query, _ in batch],
+                [passage for _, passage in batch],
+                padding=True,
+                truncation="longest_first",
+                max_length=self.max_length,
+                return_tensors="np"
+            )
+            scores.append(self.score_features(dict(encoded)))
+
+        if not scores:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(scores)
+
+    def score_features(self, features: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        Score already-tokenized pairs.
+
+        Args:
+            features: Tokenizer-style arrays ('input_ids', 'attention_mask', ...)
+
+        Returns:
+            float32 array with one score per row
+        """
+        feeds = {name: array.astype(np.int64) for name, array in features.items() if name in self.input_names}
+        logits = self.session.run(["logits"], feeds)[0]
+        scores = (logits[:, 0] if logits.shape[1] == 1 else logits).astype(np.float32)
+        if self.activation == "sigmoid":
+            scores = 1.0 / (1.0 + np.exp(-scores))
+        return scores
+
+
+def load_onnx_reranker(model_dir: Optional[str] = None, quantized: Optional[bool] = None) -> OnnxCrossEncoder:
+    """
+    Load the ONNX reranker, exporting Config.RERANKER_MODEL_ID first if needed.
+
+    Args:
+        model_dir: Export directory (defaults to Config.RERANKER_ONNX_DIR)
+        quantized: Use the int8 model (defaults to Config.RERANKER_ONNX_QUANTIZE)
+
+    Returns:
+        OnnxCrossEncoder
+    """
+    model_dir = model_dir or Config.RERANKER_ONNX_DIR
+    quantized = Config.RERANKER_ONNX_QUANTIZE if quantized is None else quantized
+
+    model_file = QUANTIZED_MODEL_FILE if quantized else MODEL_FILE
+    if not os.path.exists(os.path.join(model_dir, model_file)):
+        export_onnx_reranker(Config.RERANKER_MODEL_ID, model_dir, quantize=quantized)
+    return OnnxCrossEncoder(model_dir, quantized=quantized)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the cross-encoder reranker to ONNX")
+    parser.add_argument("--model", default=Config.RERANKER_MODEL_ID, help="Hugging Face model ID")
+    parser.add_argument("--out", default=Config.RERANKER_ONNX_DIR, help="Output directory")
+    parser.add_argument("--no-quantize", action="store_true", help="Skip the int8 model")
+    args = parser.parse_args()
+
+    export_onnx_reranker(args.model, args.out, quantize=not args.no_quantize)
+
+
+if __name__ == "__main__":
+    main()
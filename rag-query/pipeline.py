@@ -1,21 +1,27 @@
 """
 Main RAG pipeline orchestration.
 """
-from typing import Dict, Any, Tuple, Optional
+import time
+from typing import Callable, Dict, Any, Iterator, Tuple, Optional
 
 from config import Config
-from models import initialize_llm, initialize_reranker
+from registry import ModelRegistry, get_model_registry
 from retrieval import (
-    initialize_pinecone,
     run_query_for_each_location,
     run_query_for_each_location_reranking
 )
+from context_packer import pack_context
 from llm_generation import (
-    build_context_string,
     generate_llm_response,
-    generate_llm_response_filter_only_search
+    generate_llm_response_filter_only_search,
+    stream_llm_response,
+    stream_llm_response_filter_only_search
 )
+from encoding import encode_query_dense, encode_query_hybrid
 from filters import flatten_locations_payload
+from filter_search import get_filter_catalog, match_cursor
+from retrieval_cache import get_retrieval_cache
+from semantic_cache import get_semantic_cache
 from utils import (
     print_chunks,
     print_chunks_reranking,
@@ -27,30 +33,37 @@ from utils import (
 class RAGPipeline:
     """Main RAG Pipeline class."""
     
-    def __init__(self, use_reranking: bool = False):
+    def __init__(self, use_reranking: bool = False, registry: Optional[ModelRegistry] = None):
         """
         Initialize RAG Pipeline.
         
         Args:
             use_reranking: Whether to use hybrid search with reranking
+            registry: Source of shared models (defaults to the process-wide registry)
         """
         Config.validate()
         
         self.use_reranking = use_reranking
+        registry = registry or get_model_registry()
         
-        # Initialize Pinecone
-        self.pc, self.pinecone_index = initialize_pinecone()
+        # Initialize Pinecone (one client per process, shared through the registry)
+        self.pc, self.pinecone_index = registry.pinecone()
+        
+        # Retrieval results are cached process-wide, shared with the other pipeline
+        self.retrieval_cache = get_retrieval_cache() if Config.RETRIEVAL_CACHE_ENABLED else None
+        self.semantic_cache = get_semantic_cache() if Config.SEMANTIC_CACHE_ENABLED else None
         
         # Initialize models
         print("\n" + "="*50)
         print("Initializing Models...")
         print("="*50)
-        self.tokenizer, self.model = initialize_llm()
+        # In-process model or a remote OpenAI-compatible server (Config.GENERATION_BACKEND);
+        # the tokenizer is local either way, for context token budgets
+        self.generation = registry.generation()
+        self.tokenizer, self.model = self.generation.tokenizer, self.generation.model
         
-        if use_reranking:
-            self.reranker_model = initialize_reranker()
-        else:
-            self.reranker_model = None
+        # The reranker is only loaded once a pipeline that needs it asks for it
+        self.reranker_model = registry.reranker() if use_reranking else None
         
         print("\n" + "="*50)
         print("Pipeline Initialization Complete")
@@ -78,17 +91,8 @@ class RAGPipeline:
         # Flatten locations
         normalized_filters = flatten_locations_payload(filters)
         
-        # Determine if this is a filter-only search
-        filter_only_search = not bool(query)
-        
-        # Run retrieval
-        retrieved_chunks = run_query_for_each_location(
-            self.pc,
-            self.pinecone_index,
-            query,
-            normalized_filters,
-            filter_only_search
-        )
+        # Run retrieval (served from the retrieval cache when possible)
+        query_vector, retrieved_chunks = self.retrieve_baseline(query, normalized_filters)
         
         # Print results
         print("\n\n--- BASELINE RESULTS ---")
@@ -96,16 +100,16 @@ class RAGPipeline:
         
         # Generate output
         if query:  # Standard search
-            context_string = build_context_string(retrieved_chunks)
             # csv_filename = Config.BASELINE_CSV_FILENAME
             # generate_csv(csv_filename, retrieved_chunks)
-            llm_output = generate_llm_response(query, context_string, self.tokenizer, self.model)
+            llm_output = self.generate_answer('baseline', query, query_vector, normalized_filters, retrieved_chunks)
         else:  # Filter-only search
-            context_string = build_context_string(retrieved_chunks, 10)
+            context_string = pack_context(retrieved_chunks, self.tokenizer, max_chunks=10)['text']
             # csv_filename = Config.BASELINE_FILTER_CSV_FILENAME
             # generate_csv(csv_filename, retrieved_chunks)
             llm_output = generate_llm_response_filter_only_search(
-                query, context_string, self.tokenizer, self.model, len(retrieved_chunks)
+                query, context_string, self.generation,
+                self.count_filter_only_matches(normalized_filters, retrieved_chunks)
             )
         
         print("\n--- FINAL LLM OUTPUT ---")
@@ -138,18 +142,8 @@ class RAGPipeline:
         # Flatten locations
         normalized_filters = flatten_locations_payload(filters)
         
-        # Determine if this is a filter-only search
-        filter_only_search = not bool(query)
-        
-        # Run retrieval with reranking
-        retrieved_chunks = run_query_for_each_location_reranking(
-            self.pc,
-            self.pinecone_index,
-            self.reranker_model,
-            query,
-            normalized_filters,
-            filter_only_search
-        )
+        # Run retrieval with reranking (served from the retrieval cache when possible)
+        query_embedding, retrieved_chunks = self.retrieve_hybrid(query, normalized_filters)
         
         # Print results
         print("\n\n--- HYBRID + RERANKING RESULTS ---")
@@ -157,16 +151,16 @@ class RAGPipeline:
         
         # Generate output
         if query:  # Standard search
-            context_string = build_context_string(retrieved_chunks)
             # csv_filename = Config.HYBRID_CSV_FILENAME
             # generate_csv_reranking(csv_filename, retrieved_chunks)
-            llm_output = generate_llm_response(query, context_string, self.tokenizer, self.model)
+            llm_output = self.generate_answer('hybrid', query, query_embedding, normalized_filters, retrieved_chunks)
         else:  # Filter-only search
-            context_string = build_context_string(retrieved_chunks, 10)
+            context_string = pack_context(retrieved_chunks, self.tokenizer, max_chunks=10)['text']
             # csv_filename = Config.HYBRID_FILTER_CSV_FILENAME
             # generate_csv_reranking(csv_filename, retrieved_chunks)
             llm_output = generate_llm_response_filter_only_search(
-                query, context_string, self.tokenizer, self.model, len(retrieved_chunks)
+                query, context_string, self.generation,
+                self.count_filter_only_matches(normalized_filters, retrieved_chunks)
             )
         
         print("\n--- FINAL LLM OUTPUT ---")
@@ -174,6 +168,199 @@ class RAGPipeline:
         
         return llm_output, retrieved_chunks
     
+    def retrieve_baseline(self, query: str, normalized_filters: Dict[str, Any]) -> Tuple[Optional[list], list]:
+        """
+        Dense retrieval for every location, through the retrieval cache.
+
+        Args:
+            query: Query string (empty for filter-only search)
+            normalized_filters: Flattened filter dictionary
+
+        Returns:
+            Tuple of (dense query embedding or None, retrieved_chunks)
+        """
+        filter_only_search = not bool(query)
+        query_vector = encode_query_dense(self.pc, query) if query else None
+        retrieved_chunks = self.cached_retrieval(
+            'baseline',
+            query_vector,
+            normalized_filters,
+            lambda failed_locations: run_query_for_each_location(
+                self.pc,
+                self.pinecone_index,
+                query,
+                normalized_filters,
+                filter_only_search,
+                failed_locations
+            )
+        )
+        return query_vector, retrieved_chunks
+    
+    def retrieve_hybrid(self, query: str, normalized_filters: Dict[str, Any]) -> Tuple[Optional[list], list]:
+        """
+        Hybrid retrieval with reranking for every location, through the retrieval cache.
+
+        Args:
+            query: Query string (empty for filter-only search)
+            normalized_filters: Flattened filter dictionary
+
+        Returns:
+            Tuple of (dense query embedding or None, retrieved_chunks)
+        """
+        filter_only_search = not bool(query)
+        query_vectors = encode_query_hybrid(self.pc, query) if query else None
+        retrieved_chunks = self.cached_retrieval(
+            'hybrid',
+            query_vectors,
+            normalized_filters,
+            lambda failed_locations: run_query_for_each_location_reranking(
+                self.pc,
+                self.pinecone_index,
+                self.reranker_model,
+                query,
+                normalized_filters,
+                filter_only_search,
+                failed_locations
+            )
+        )
+        return (query_vectors[0] if query_vectors is not None else None), retrieved_chunks
+    
+    def generate_answer(
+        self,
+        mode: str,
+        query: str,
+        query_embedding: list,
+        filters: Dict[str, Any],
+        retrieved_chunks: list
+    ) -> str:
+        """
+        Generate the LLM answer for a standard search, reusing a cached answer
+        for a near-duplicate question over the same retrieved chunks.
+
+        Args:
+            mode: Search mode ('baseline' or 'hybrid')
+            query: Query string
+            query_embedding: Dense query embedding
+            filters: Normalized filter dictionary
+            retrieved_chunks: Retrieved chunks
+
+        Returns:
+            LLM output
+        """
+        chunk_ids = [chunk.get('id') for chunk in retrieved_chunks]
+        if self.semantic_cache is not None:
+            cached_output = self.semantic_cache.lookup(query_embedding, mode, filters, chunk_ids)
+            if cached_output is not None:
+                return cached_output
+
+        context_string = pack_context(retrieved_chunks, self.tokenizer)['text']
+        llm_output = generate_llm_response(query, context_string, self.generation)
+
+        if self.semantic_cache is not None:
+            self.semantic_cache.store(query_embedding, mode, filters, chunk_ids, llm_output)
+        return llm_output
+    
+    def stream_answer(
+        self,
+        mode: str,
+        query: str,
+        query_embedding: list,
+        filters: Dict[str, Any],
+        retrieved_chunks: list
+    ) -> Iterator[str]:
+        """
+        Streaming counterpart of generate_answer.
+
+        A semantic cache hit is yielded as a single piece; otherwise the answer
+        streams from the LLM and is cached once it is complete.
+
+        Yields:
+            Answer text pieces
+        """
+        chunk_ids = [chunk.get('id') for chunk in retrieved_chunks]
+        if self.semantic_cache is not None:
+            cached_output = self.semantic_cache.lookup(query_embedding, mode, filters, chunk_ids)
+            if cached_output is not None:
+                yield cached_output
+                return
+
+        context_string = pack_context(retrieved_chunks, self.tokenizer)['text']
+        pieces = []
+        for text in stream_llm_response(query, context_string, self.generation):
+            pieces.append(text)
+            yield text
+
+        if self.semantic_cache is not None:
+            self.semantic_cache.store(query_embedding, mode, filters, chunk_ids, "".join(pieces))
+    
+    def cached_retrieval(
+        self,
+        mode: str,
+        query_vectors: Any,
+        filters: Dict[str, Any],
+        retrieve: Callable[[list], list]
+    ) -> list:
+        """
+        Run `retrieve` through the retrieval cache (or directly if it is disabled).
+
+        Args:
+            mode: Search mode ('baseline' or 'hybrid')
+            query_vectors: Query embedding(s), None for filter-only search
+            filters: Normalized filter dictionary
+            retrieve: Callable running the per-location retrieval; it appends
+                failed locations to the list it is given
+
+        Returns:
+            Retrieved chunks
+        """
+        if self.retrieval_cache is None:
+            return retrieve([])
+        return self.retrieval_cache.get_or_retrieve(self.pinecone_index, mode, query_vectors, filters, retrieve)
+    
+    def count_filter_only_matches(self, filters: Dict[str, Any], retrieved_chunks: list) -> int:
+        """
+        Total number of chunks matching a filter-only search.
+
+        Args:
+            filters: Normalized filter dictionary
+            retrieved_chunks: Chunks returned by retrieval
+
+        Returns:
+            Exact count from the metadata catalog when configured, otherwise
+            the number of retrieved chunks (Pinecone caps them at FILTER_ONLY_TOP_K)
+        """
+        filter_catalog = get_filter_catalog()
+        if filter_catalog is not None:
+            return filter_catalog.count(filters)
+        return len(retrieved_chunks)
+    
+    def filter_only_page(self, filters: Dict[str, Any], retrieved_chunks: list) -> Dict[str, Any]:
+        """
+        Paging details for a filter-only search's first page.
+
+        Retrieval from the metadata catalog returns only the first page; the
+        cursor resumes after its last chunk (pass it to POST /filter).
+
+        Args:
+            filters: Filter dictionary as sent by the frontend
+            retrieved_chunks: First page returned by retrieval
+
+        Returns:
+            Dictionary with 'total', 'next_cursor' (None when nothing is left)
+            and 'facets' (None without a metadata catalog)
+        """
+        filter_catalog = get_filter_catalog()
+        if filter_catalog is None:
+            return {"total": len(retrieved_chunks), "next_cursor": None, "facets": None}
+
+        facets = filter_catalog.facets(filters)
+        has_more = bool(retrieved_chunks) and facets['total'] > len(retrieved_chunks)
+        return {
+            "total": facets['total'],
+            "next_cursor": match_cursor(retrieved_chunks[-1]) if has_more else None,
+            "facets": facets
+        }
+    
     def run(
         self,
         query: str,
@@ -193,3 +380,57 @@ class RAGPipeline:
             return self.run_hybrid_search(query, filters)
         else:
             return self.run_baseline_search(query, filters)
+    
+    def run_stream(
+        self,
+        query: str,
+        filters: Dict[str, Any]
+    ) -> Iterator[Tuple[str, Any]]:
+        """
+        Run the search, yielding results as soon as each stage produces them.
+
+        Args:
+            query: Query string (empty for filter-only search)
+            filters: Filter dictionary with locations and other criteria
+
+        Yields:
+            ('chunks', retrieved_chunks) once retrieval is done, then
+            ('token', text) for each decoded piece of the LLM output, then
+            ('done', timing stats in seconds)
+        """
+        start_time = time.time()
+        mode = 'hybrid' if self.use_reranking else 'baseline'
+        normalized_filters = flatten_locations_payload(filters)
+
+        retrieve = self.retrieve_hybrid if self.use_reranking else self.retrieve_baseline
+        query_embedding, retrieved_chunks = retrieve(query, normalized_filters)
+        retrieval_seconds = time.time() - start_time
+        yield 'chunks', retrieved_chunks
+
+        if query:  # Standard search
+            pieces = self.stream_answer(mode, query, query_embedding, normalized_filters, retrieved_chunks)
+        else:  # Filter-only search
+            pieces = stream_llm_response_filter_only_search(
+                pack_context(retrieved_chunks, self.tokenizer, max_chunks=10)['text'], self.generation,
+                self.count_filter_only_matches(normalized_filters, retrieved_chunks)
+            )
+
+        first_token_time = None
+        num_pieces = 0
+        try:
+            for text in pieces:
+                if first_token_time is None:
+                    first_token_time = time.time()
+                num_pieces += 1
+                yield 'token', text
+        finally:
+            pieces.close()  # A consumer that stops early stops generation too
+
+        end_time = time.time()
+        yield 'done', {
+            'retrieval_seconds': retrieval_seconds,
+            'time_to_first_token_seconds': (first_token_time or end_time) - start_time,
+            'generation_seconds': end_time - start_time - retrieval_seconds,
+            'total_seconds': end_time - start_time,
+            'pieces': num_pieces
+        }
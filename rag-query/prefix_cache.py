@@ -0,0 +1,142 @@
+"""
+Reusable KV cache for static prompt prefixes.
+
+Every answer prompt starts with the same long system prompt, yet each
+generate call used to prefill it again. The prefix cache runs the model over
+each registered prefix once (at startup) and keeps its past_key_values. A
+prompt that starts with a registered prefix then gets a copy of that cache, so
+generate only prefills the rest of the prompt. Prompts that do not start with
+the exact prefix tokens are prefilled in full as before.
+"""
+import copy
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import torch
+
+
+class PrefixKVCache:
+    """Precomputed past_key_values for registered token prefixes of one model."""
+
+    def __init__(self, model: Any):
+        """
+        Initialize an empty cache.
+
+        Args:
+            model: Causal LM the cached keys and values belong to
+        """
+        self.model = model
+        self._entries: Dict[Tuple[int, ...], Any] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+
+    def register(self, prefix_ids: Sequence[int]) -> None:
+        """
+        Prefill a prefix and keep its past_key_values.
+
+        Args:
+            prefix_ids: Token IDs every matching prompt starts with
+        """
+        key = tuple(prefix_ids)
+        if not key or key in self._entries:
+            return
+        with torch.inference_mode():
+            input_ids = torch.tensor([key], dtype=torch.long, device=self.model.device)
+            past_key_values = self.model(input_ids, use_cache=True).past_key_values
+        with self._lock:
+            self._entries[key] = past_key_values
+
+    def match(self, prompt_ids: Sequence[int]) -> Optional[Tuple[int, ...]]:
+        """
+        Longest registered prefix of a prompt.
+
+        Args:
+            prompt_ids: Full prompt token IDs
+
+        Returns:
+            The prefix, or None; at least one prompt token is always left to prefill
+        """
+        best = None
+        for prefix in self._entries:
+            if len(prefix) < len(prompt_ids) and tuple(prompt_ids[:len(prefix)]) == prefix:
+                if best is None or len(prefix) > len(best):
+                    best = prefix
+        return best
+
+    def expand(self, prefix: Tuple[int, ...], batch_size: int) -> Any:
+        """
+        A fresh copy of a prefix's cache for one generate call.
+
+        generate appends to the cache it is given, so the stored entry is never
+        handed out directly.
+
+        Args:
+            prefix: A registered prefix (from match)
+            batch_size: Number of prompts in the generate call
+
+        Returns:
+            past_key_values with batch dimension batch_size
+        """
+        past_key_values = copy.deepcopy(self._entries[prefix])
+        if batch_size > 1:
+            past_key_values.batch_repeat_interleave(batch_size)
+        with self._lock:
+            self.hits += batch_size
+            self.tokens_saved += len(prefix) * batch_size
+        return past_key_values
+
+    def record_miss(self, count: int = 1) -> None:
+        with self._lock:
+            self.misses += count
+
+    def prefixes(self) -> List[Tuple[int, ...]]:
+        return list(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit-rate metrics and the prefill tokens skipped so far."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "prefixes": len(self._entries),
+                "prefix_tokens": [len(prefix) for prefix in self._entries],
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "prefill_tokens_saved": self.tokens_saved,
+            }
+
+
+_prefix_cache: Optional[PrefixKVCache] = None
+_prefix_cache_lock = threading.Lock()
+
+
+def start_prefix_cache(model: Any) -> PrefixKVCache:
+    """
+    Return the process-wide prefix cache, creating it for `model` on first use.
+
+    Args:
+        model: Loaded causal LM
+
+    Returns:
+        PrefixKVCache
+    """
+    global _prefix_cache
+    with _prefix_cache_lock:
+        if _prefix_cache is None:
+            _prefix_cache = PrefixKVCache(model)
+        return _prefix_cache
+
+
+def get_prefix_cache(model: Any = None) -> Optional[PrefixKVCache]:
+    """
+    Return the process-wide prefix cache, or None if it was never started.
+
+    Args:
+        model: If given, only return the cache when it belongs to this model
+    """
+    if _prefix_cache is not None and model is not None and _prefix_cache.model is not model:
+        return None
+    return _prefix_cache
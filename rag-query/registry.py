@@ -0,0 +1,119 @@
+"""
+Process-wide model registry.
+
+The API runs a baseline and a hybrid pipeline side by side. Each component
+(Pinecone client and index, LLM and tokenizer, draft model, generation
+backend, reranker) is loaded once, on first request, and every pipeline
+receives the same shared reference. A component no pipeline asks for, such as
+the reranker in a baseline-only process or the LLM behind a remote generation
+backend, is never loaded.
+"""
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import Config
+from generation_scheduler import start_generation_scheduler
+from llm_generation import create_generation_backend, warm_prefix_cache
+from models import initialize_draft_model, initialize_llm, initialize_reranker, initialize_tokenizer
+from rerank_service import start_rerank_service
+from retrieval import initialize_pinecone
+from token_cache import TokenCachingReranker
+
+
+class ModelRegistry:
+    """Lazily loads each shared component exactly once."""
+
+    def __init__(
+        self,
+        pinecone_loader: Callable[[], Tuple[Any, Any]] = initialize_pinecone,
+        llm_loader: Callable[[], Tuple[Any, Any]] = initialize_llm,
+        reranker_loader: Callable[[], Any] = initialize_reranker,
+        tokenizer_loader: Callable[[], Any] = initialize_tokenizer,
+        draft_loader: Callable[[], Any] = initialize_draft_model
+    ):
+        """
+        Initialize the registry (nothing is loaded yet).
+
+        Args:
+            pinecone_loader: Returns (pinecone client, index)
+            llm_loader: Returns (tokenizer, model)
+            reranker_loader: Returns the raw reranker model
+            tokenizer_loader: Returns the LLM tokenizer alone (remote generation backend)
+            draft_loader: Returns the draft model (assisted generation)
+        """
+        self._loaders: Dict[str, Callable[[], Any]] = {
+            "pinecone": pinecone_loader,
+            "llm": lambda: self._start_generation(*llm_loader()),
+            "draft": draft_loader,
+            "generation": lambda: self._create_generation(tokenizer_loader),
+            "reranker": lambda: self._wrap_reranker(reranker_loader()),
+        }
+        self._components: Dict[str, Any] = {}
+        self._locks = {name: threading.Lock() for name in self._loaders}
+
+    @staticmethod
+    def _wrap_reranker(reranker_model: Any) -> Any:
+        if Config.TOKEN_CACHE_ENABLED:
+            reranker_model = TokenCachingReranker(reranker_model)
+        if Config.RERANK_SERVICE_ENABLED:
+            # Concurrent requests share one worker thread that batches their pairs
+            reranker_model = start_rerank_service(reranker_model)
+        return reranker_model
+
+    def _start_generation(self, tokenizer: Any, model: Any) -> Tuple[Any, Any]:
+        # The static system prompts are prefilled once, here, instead of on every request
+        prefix_cache = warm_prefix_cache(tokenizer, model) if Config.PREFIX_CACHE_ENABLED else None
+        if Config.GENERATION_BATCHING_ENABLED:
+            # Concurrent requests' prompts are batched by one worker thread (see llm_generation.py)
+            start_generation_scheduler(tokenizer, model, prefix_cache, self.draft_model())
+        return tokenizer, model
+
+    def _create_generation(self, tokenizer_loader: Callable[[], Any]) -> Any:
+        if Config.GENERATION_BACKEND == "openai":
+            # Generation runs on shared GPU servers; only the tokenizer is loaded here
+            return create_generation_backend(tokenizer_loader())
+        return create_generation_backend(*self.llm(), self.draft_model())
+
+    def _get(self, name: str) -> Any:
+        # Per-component locks: loading the LLM does not block a Pinecone lookup.
+        with self._locks[name]:
+            if name not in self._components:
+                self._components[name] = self._loaders[name]()
+            return self._components[name]
+
+    def pinecone(self) -> Tuple[Any, Any]:
+        """Return the shared (pinecone client, index)."""
+        return self._get("pinecone")
+
+    def llm(self) -> Tuple[Any, Any]:
+        """Return the shared (tokenizer, model)."""
+        return self._get("llm")
+
+    def draft_model(self) -> Optional[Any]:
+        """Return the shared draft model, or None when assisted generation is disabled."""
+        return self._get("draft") if Config.ASSISTED_GENERATION_ENABLED else None
+
+    def generation(self) -> Any:
+        """Return the shared generation backend (in-process or remote, per Config.GENERATION_BACKEND)."""
+        return self._get("generation")
+
+    def reranker(self) -> Any:
+        """Return the shared reranker (wrapped with the token cache / rerank service when enabled)."""
+        return self._get("reranker")
+
+    def loaded(self) -> Dict[str, bool]:
+        """Which components have been loaded so far."""
+        return {name: name in self._components for name in self._loaders}
+
+
+_model_registry: Optional[ModelRegistry] = None
+_model_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Return the process-wide model registry."""
+    global _model_registry
+    with _model_registry_lock:
+        if _model_registry is None:
+            _model_registry = ModelRegistry()
+        return _model_registry
@@ -0,0 +1,148 @@
+"""
+Cross-encoder score cache keyed by (normalized query, chunk ID, reranker model).
+
+A (query, chunk) score never changes for a given model, so repeated queries
+(evaluator reruns, UI refreshes) only send the pairs that were never scored
+to the reranker. Scores live in an in-memory LRU tier, optionally backed by
+SQLite so they survive restarts.
+"""
+import hashlib
+import struct
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+from config import Config
+from encoding import normalize_query_text
+from kv_store import SQLiteStore
+
+_SCORE_FORMAT = "<d"
+
+
+def reranker_cache_id() -> str:
+    """Model ID plus backend, since quantized backends produce slightly different scores."""
+    backend = Config.RERANKER_BACKEND
+    if backend == "onnx" and Config.RERANKER_ONNX_QUANTIZE:
+        backend = "onnx-int8"
+    return f"{Config.RERANKER_MODEL_ID}@{backend}"
+
+
+class RerankScoreCache:
+    """Two-tier (memory LRU + optional SQLite) cache of rerank scores."""
+
+    def __init__(self, max_entries: int, persist_path: Optional[str] = None, model_id: Optional[str] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum cached scores (memory and disk)
+            persist_path: SQLite file for the on-disk tier (None keeps the cache in memory)
+            model_id: Reranker model ID baked into every key (defaults to reranker_cache_id())
+        """
+        self.max_entries = max_entries
+        self.model_id = model_id or reranker_cache_id()
+        self.store = SQLiteStore(persist_path, max_entries) if persist_path else None
+
+        self._scores: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def query_prefix(self, query: str) -> str:
+        """Key prefix shared by every chunk scored against this query and model."""
+        raw = f"{self.model_id}\x00{normalize_query_text(query)}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get_many(self, query: str, chunk_ids: Iterable[str]) -> Dict[str, float]:
+        """
+        Look up cached scores for one query.
+
+        Args:
+            query: Query text
+            chunk_ids: Pinecone chunk IDs
+
+        Returns:
+            {chunk_id: score} for the IDs that were cached
+        """
+        prefix = self.query_prefix(query)
+        keys = {f"{prefix}:{chunk_id}": chunk_id for chunk_id in chunk_ids}
+
+        found: Dict[str, float] = {}
+        with self._lock:
+            for key, chunk_id in keys.items():
+                score = self._scores.get(key)
+                if score is not None:
+                    self._scores.move_to_end(key)
+                    found[chunk_id] = score
+
+        missing = [key for key, chunk_id in keys.items() if chunk_id not in found]
+        if missing and self.store is not None:
+            from_disk = {key: struct.unpack(_SCORE_FORMAT, raw)[0] for key, raw in self.store.get_many(missing).items()}
+            self._remember(from_disk)
+            for key, score in from_disk.items():
+                found[keys[key]] = score
+
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, query: str, scores: Dict[str, float]) -> None:
+        """
+        Cache scores for one query.
+
+        Args:
+            query: Query text
+            scores: {chunk_id: score}
+        """
+        prefix = self.query_prefix(query)
+        entries = {f"{prefix}:{chunk_id}": float(score) for chunk_id, score in scores.items()}
+        self._remember(entries)
+        if self.store is not None:
+            self.store.put_many({key: struct.pack(_SCORE_FORMAT, score) for key, score in entries.items()})
+
+    def _remember(self, entries: Dict[str, float]) -> None:
+        with self._lock:
+            for key, score in entries.items():
+                self._scores[key] = score
+                self._scores.move_to_end(key)
+            while len(self._scores) > self.max_entries:
+                self._scores.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every cached score."""
+        with self._lock:
+            self._scores.clear()
+        if self.store is not None:
+            self.store.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters (per pair) and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._scores),
+                "max_size": self.max_entries,
+                "persisted": len(self.store) if self.store is not None else 0,
+                "model_id": self.model_id,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_rerank_cache: Optional[RerankScoreCache] = None
+_rerank_cache_lock = threading.Lock()
+
+
+def get_rerank_cache() -> RerankScoreCache:
+    """Return the process-wide rerank score cache."""
+    global _rerank_cache
+    with _rerank_cache_lock:
+        if _rerank_cache is None:
+            _rerank_cache = RerankScoreCache(
+                Config.RERANK_CACHE_SIZE,
+                persist_path=Config.RERANK_CACHE_PATH or None
+            )
+        return _rerank_cache
@@ -0,0 +1,236 @@
+"""
+Cross-request micro-batching service for the reranker.
+
+Concurrent Flask requests would otherwise call predict on the same model
+independently, contending for it with small batches. The service gives the
+model to a single worker thread: callers enqueue their pairs and wait on a
+future, and the worker collects pairs from every waiting request (until the
+batch is full or a short window expires), scores them in one predict call and
+resolves each request's future with its slice of the scores. The collected
+pairs are length-sorted and go through the model in forward batches of
+RERANK_BATCH_SIZE, so a large collected batch does not become one oversized,
+heavily padded forward pass.
+
+RerankService exposes predict(pairs, batch_size=...) and predict_items(...),
+so it can stand in for the model anywhere in the pipeline.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import Config
+
+_STOP = object()
+
+
+class Histogram:
+    """Thread-safe counts over power-of-two buckets."""
+
+    def __init__(self, max_bucket: int = 1024):
+        self.bounds = [1]
+        while self.bounds[-1] < max_bucket:
+            self.bounds.append(self.bounds[-1] * 2)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self._lock = threading.Lock()
+
+    def record(self, value: int) -> None:
+        bucket = int(np.searchsorted(self.bounds, value))
+        with self._lock:
+            self.counts[bucket] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        """{'<=N': count} per bucket, plus '>max' for the overflow bucket."""
+        with self._lock:
+            labels = [f"<={b}" for b in self.bounds] + [f">{self.bounds[-1]}"]
+            return dict(zip(labels, self.counts))
+
+
+class RerankService:
+    """Single worker thread that owns the reranker and batches requests across callers."""
+
+    def __init__(
+        self,
+        model: Any,
+        max_batch_pairs: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+        forward_batch_size: Optional[int] = None
+    ):
+        """
+        Start the service.
+
+        Args:
+            model: Reranker with predict(pairs, batch_size=...) (CrossEncoder or OnnxCrossEncoder)
+            max_batch_pairs: Stop collecting once a batch has this many pairs
+                (defaults to Config.RERANK_SERVICE_MAX_BATCH_PAIRS)
+            max_wait_ms: How long the first request in a batch waits for others
+                (defaults to Config.RERANK_SERVICE_MAX_WAIT_MS)
+            forward_batch_size: Pairs per model forward pass within a collected batch
+                (defaults to Config.RERANK_BATCH_SIZE)
+        """
+        self.model = model
+        self.max_batch_pairs = max_batch_pairs or Config.RERANK_SERVICE_MAX_BATCH_PAIRS
+        self.max_wait = (Config.RERANK_SERVICE_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000.0
+        self.forward_batch_size = forward_batch_size or Config.RERANK_BATCH_SIZE
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.pairs = 0
+        self.busy_seconds = 0.0
+        self.queue_depth = Histogram()
+        self.batch_pairs = Histogram()
+        self.batch_requests = Histogram(max_bucket=64)
+
+        self._worker = threading.Thread(target=self._run, name="rerank-service", daemon=True)
+        self._worker.start()
+
+    def predict(self, pairs: Sequence[Tuple[str, str]], batch_size: Optional[int] = None, **kwargs) -> np.ndarray:
+        """
+        Score pairs through the shared worker, blocking until they are done.
+
+        Args:
+            pairs: (query, passage) tuples
+            batch_size: Ignored; batching is decided by the service
+
+        Returns:
+            One score per pair
+        """
+        return self.predict_items([(query, None, passage) for query, passage in pairs])
+
+    def predict_items(
+        self,
+        items: Sequence[Tuple[str, Optional[str], str]],
+        batch_size: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Score (query, chunk_id, passage) items through the shared worker.
+
+        Chunk IDs are passed on to models that can use them (see token_cache.py).
+
+        Args:
+            items: (query, chunk_id, passage) triples
+            batch_size: Ignored; batching is decided by the service
+
+        Returns:
+            One score per item
+        """
+        if not items:
+            return np.zeros(0, dtype=np.float32)
+        future: Future = Future()
+        self._queue.put((list(items), future))
+        return future.result()
+
+    def close(self) -> None:
+        """Stop the worker after the queued requests are served."""
+        self._queue.put(_STOP)
+        self._worker.join()
+
+    def _collect(self) -> Optional[List[tuple]]:
+        """Block for one request, then gather more until the batch is full or the window closes."""
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        self.queue_depth.record(self._queue.qsize() + 1)
+
+        batch = [first]
+        pairs = len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while pairs < self.max_batch_pairs:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)  # Stop after serving this batch
+                break
+            batch.append(item)
+            pairs += len(item[0])
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            all_items = [item for items, _ in batch for item in items]
+            # Length-sort the combined pairs so each forward batch pads to similar lengths.
+            order = sorted(range(len(all_items)), key=lambda i: len(all_items[i][2]))
+            sorted_items = [all_items[i] for i in order]
+            try:
+                start_time = time.time()
+                if hasattr(self.model, 'predict_items'):
+                    sorted_scores = self.model.predict_items(sorted_items, batch_size=self.forward_batch_size)
+                else:
+                    sorted_scores = self.model.predict(
+                        [(query, passage) for query, _, passage in sorted_items], batch_size=self.forward_batch_size
+                    )
+                elapsed = time.time() - start_time
+                scores = np.empty(len(all_items), dtype=np.float32)
+                scores[order] = np.asarray(sorted_scores, dtype=np.float32)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for items, future in batch:
+                future.set_result(scores[offset:offset + len(items)])
+                offset += len(items)
+
+            self.batch_pairs.record(len(all_items))
+            self.batch_requests.record(len(batch))
+            with self._stats_lock:
+                self.requests += len(batch)
+                self.batches += 1
+                self.pairs += len(all_items)
+                self.busy_seconds += elapsed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return throughput counters and queue-depth / batch-size histograms."""
+        with self._stats_lock:
+            counters = {
+                "requests": self.requests,
+                "batches": self.batches,
+                "pairs": self.pairs,
+                "busy_seconds": self.busy_seconds,
+                "mean_batch_pairs": self.pairs / self.batches if self.batches else 0.0,
+                "mean_batch_requests": self.requests / self.batches if self.batches else 0.0,
+            }
+        counters["queue_size"] = self._queue.qsize()
+        counters["queue_depth_histogram"] = self.queue_depth.snapshot()
+        counters["batch_pairs_histogram"] = self.batch_pairs.snapshot()
+        counters["batch_requests_histogram"] = self.batch_requests.snapshot()
+        return counters
+
+
+_rerank_service: Optional[RerankService] = None
+_rerank_service_lock = threading.Lock()
+
+
+def start_rerank_service(model: Any) -> RerankService:
+    """
+    Return the process-wide rerank service, starting it around `model` on first use.
+
+    Args:
+        model: Loaded reranker
+
+    Returns:
+        RerankService
+    """
+    global _rerank_service
+    with _rerank_service_lock:
+        if _rerank_service is None:
+            _rerank_service = RerankService(model)
+        return _rerank_service
+
+
+def get_rerank_service() -> Optional[RerankService]:
+    """Return the process-wide rerank service, or None if it was never started."""
+    return _rerank_service
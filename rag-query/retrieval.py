@@ -1,23 +1,45 @@
 """
 Retrieval functions for querying Pinecone index.
 """
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Tuple
 from pinecone import Pinecone
+import math
 import time
 
+from candidate_depth import select_candidates
 from config import Config
+from dedup import collapse_near_duplicates
+from encoding import encode_query_dense, encode_query_hybrid
+from fanout import fan_out
+from lexical import shortlist_candidates
+from filter_search import get_filter_catalog
 from filters import build_pinecone_filter
+from local_index import LocalIndex
+from rerank_cache import get_rerank_cache
+from streaming import RerankStream
 
 
 def initialize_pinecone() -> tuple:
     """
     Initialize Pinecone client and index.
+
+    With Config.INDEX_BACKEND == "local" the index is a LocalIndex loaded
+    from Config.LOCAL_INDEX_DIR instead of the remote Pinecone index.
     
     Returns:
         Tuple of (Pinecone client, Pinecone index)
     """
     print("Initializing Pinecone...")
-    pc = Pinecone(api_key=Config.PINECONE_API_KEY)
+    # Size the client's connection pool for concurrent per-location queries
+    pc = Pinecone(api_key=Config.PINECONE_API_KEY, pool_threads=Config.MAX_CONCURRENT_QUERIES)
+
+    if Config.INDEX_BACKEND == "local":
+        # Query embeddings still come from Pinecone inference; only search is local.
+        pinecone_index = LocalIndex(Config.LOCAL_INDEX_DIR)
+        print(f"Loaded local index from: {Config.LOCAL_INDEX_DIR}")
+        print(pinecone_index.describe_index_stats())
+        return pc, pinecone_index
+
     pinecone_index = pc.Index(Config.PINECONE_INDEX_NAME)
     
     # Display index details
@@ -28,7 +50,14 @@ def initialize_pinecone() -> tuple:
     return pc, pinecone_index
 
 
-def retrieve_chunks(pc: Pinecone, pinecone_index: Any, query: str, filter_object: dict) -> dict:
+def retrieve_chunks(
+    pc: Pinecone,
+    pinecone_index: Any,
+    query: str,
+    filter_object: dict,
+    query_vector: Optional[list] = None,
+    top_k: Optional[int] = None
+) -> dict:
     """
     Baseline retrieval: Dense embedding only.
     
@@ -37,19 +66,17 @@ def retrieve_chunks(pc: Pinecone, pinecone_index: Any, query: str, filter_object
         pinecone_index: Pinecone index object
         query: Query string (empty string for filter-only search)
         filter_object: Pinecone filter dictionary
+        query_vector: Pre-computed dense query vector (encoded here if omitted)
+        top_k: Number of matches to return (defaults to Config.BASELINE_TOP_K)
         
     Returns:
         Pinecone query response
     """
     if query:
         print("Querying Pinecone...Standard Semantic Search")
-        dense_query_embedding = pc.inference.embed(
-            model=Config.EMBEDDING_MODEL_DENSE,
-            inputs=query,
-            parameters={"input_type": "query", "truncate": "END"}
-        )
-        query_vector = dense_query_embedding[0]['values']
-        results_k = Config.BASELINE_TOP_K
+        if query_vector is None:
+            query_vector = encode_query_dense(pc, query)
+        results_k = top_k or Config.BASELINE_TOP_K
     else:
         print("Querying Pinecone...Filter-Only Search")
         query_vector = [0.0] * Config.VECTOR_DIMENSION
@@ -66,7 +93,14 @@ def retrieve_chunks(pc: Pinecone, pinecone_index: Any, query: str, filter_object
     return query_response
 
 
-def retrieve_chunks_hybrid_reranking(pc: Pinecone, pinecone_index: Any, query: str, filter_object: dict) -> dict:
+def retrieve_chunks_hybrid_reranking(
+    pc: Pinecone,
+    pinecone_index: Any,
+    query: str,
+    filter_object: dict,
+    query_vectors: Optional[Tuple[list, dict]] = None,
+    top_k: Optional[int] = None
+) -> dict:
     """
     Hybrid retrieval: Dense + Sparse embeddings.
     
@@ -75,39 +109,25 @@ def retrieve_chunks_hybrid_reranking(pc: Pinecone, pinecone_index: Any, query: s
         pinecone_index: Pinecone index object
         query: Query string (empty string for filter-only search)
         filter_object: Pinecone filter dictionary
+        query_vectors: Pre-computed (dense vector, sparse vector) pair (encoded here if omitted)
+        top_k: Number of matches to return (defaults to Config.HYBRID_TOP_K)
         
     Returns:
         Pinecone query response
     """
     if query:
         print("Querying Pinecone...Hybrid Search (Dense + Sparse)")
-        
-        # Get dense embedding
-        dense_query_embedding = pc.inference.embed(
-            model=Config.EMBEDDING_MODEL_DENSE,
-            inputs=query,
-            parameters={"input_type": "query", "truncate": "END"}
-        )
-        
-        # Get sparse embedding
-        sparse_query_embedding = pc.inference.embed(
-            model=Config.EMBEDDING_MODEL_SPARSE,
-            inputs=query,
-            parameters={"input_type": "query", "truncate": "END"}
-        )
 
-        dense_vector = dense_query_embedding[0]['values']
-        sparse_data = sparse_query_embedding[0]  # Contains 'sparse_indices' and 'sparse_values'
-        results_k = Config.HYBRID_TOP_K
+        if query_vectors is None:
+            query_vectors = encode_query_hybrid(pc, query)
+        dense_vector, sparse_vector = query_vectors  # sparse_vector has 'indices' and 'values'
+        results_k = top_k or Config.HYBRID_TOP_K
 
         query_response = pinecone_index.query(
             namespace=Config.PINECONE_NAMESPACE,
             top_k=results_k,
             vector=dense_vector,
-            sparse_vector={
-                'indices': sparse_data['sparse_indices'], 
-                'values': sparse_data['sparse_values']
-            },
+            sparse_vector=sparse_vector,
             include_values=False,
             include_metadata=True,
             filter=filter_object
@@ -129,12 +149,261 @@ def retrieve_chunks_hybrid_reranking(pc: Pinecone, pinecone_index: Any, query: s
     return query_response
 
 
+def build_location_filter(base_filters: dict, loc: dict) -> dict:
+    """
+    Build the Pinecone filter for a single (state, county) location.
+
+    Args:
+        base_filters: Normalized filters without the 'locations' key
+        loc: Location dictionary with 'state' and 'county'
+
+    Returns:
+        Pinecone-compatible filter dictionary
+    """
+    loop_filter = base_filters.copy()
+    loop_filter['state'] = [loc['state']]
+    loop_filter['county'] = [loc['county']]
+    return build_pinecone_filter(loop_filter)
+
+
+def merge_location_results(
+    locations: List[dict],
+    results: List[tuple],
+    failed_locations: Optional[List[dict]] = None
+) -> List[dict]:
+    """
+    Merge per-location fan-out results in location order.
+
+    Failed locations are logged and skipped so one bad county does not
+    fail the whole search.
+
+    Args:
+        locations: Locations in the order they were searched
+        results: (matches, error) tuples returned by fan_out
+        failed_locations: If given, failed locations are appended to it
+
+    Returns:
+        Flat list of matches
+    """
+    merged = []
+    for loc, (matches, error) in zip(locations, results):
+        if error is not None:
+            print(f"Query failed for location: {loc['state']}, county: {loc['county']}: {error}")
+            if failed_locations is not None:
+                failed_locations.append(loc)
+            continue
+        merged.extend(matches)
+    return merged
+
+
+def plan_location_groups(locations: List[dict], quota: int) -> List[List[int]]:
+    """
+    Split locations into groups that can share a single Pinecone query.
+
+    Counties are grouped per state, and each group is sized so that the
+    oversampled top_k stays under Pinecone's top_k limit.
+
+    Args:
+        locations: Flat list of {state, county} dictionaries
+        quota: Matches wanted per county
+
+    Returns:
+        List of groups, each a list of indices into `locations`
+    """
+    group_size = max(1, int(Config.PINECONE_MAX_TOP_K // (quota * Config.GROUPED_QUERY_OVERSAMPLE)))
+
+    indices_by_state: Dict[str, List[int]] = {}
+    for i, loc in enumerate(locations):
+        indices_by_state.setdefault(loc['state'], []).append(i)
+
+    groups = []
+    for indices in indices_by_state.values():
+        for start in range(0, len(indices), group_size):
+            groups.append(indices[start:start + group_size])
+    return groups
+
+
+def query_locations_grouped(
+    locations: List[dict],
+    base_filters: dict,
+    retrieve_fn: Callable[[dict, int], dict],
+    quota: int,
+    on_ready: Optional[Callable[[int, List[dict]], None]] = None
+) -> List[Tuple[Optional[List[dict]], Optional[Exception]]]:
+    """
+    Retrieve the top `quota` matches for every location with one query per
+    group of counties (`county: {"$in": [...]}`), split client-side.
+
+    A group's oversampled results hold the exact per-county top-k for every
+    county that reaches its quota. Counties that fall short are re-queried
+    individually, unless the group query came back incomplete, in which
+    case the group already returned every match there is.
+
+    Args:
+        locations: Flat list of {state, county} dictionaries
+        base_filters: Normalized filters without the 'locations' key
+        retrieve_fn: Callable (pinecone_filter_object, top_k) -> Pinecone response
+        quota: Matches wanted per county
+        on_ready: Optional callback (location index, matches), called from the
+            worker thread as soon as a location's final matches are known
+
+    Returns:
+        List of (matches, error) tuples in the same order as `locations`
+    """
+    groups = plan_location_groups(locations, quota)
+    print(f"Grouped {len(locations)} locations into {len(groups)} Pinecone queries")
+
+    def query_group(group: List[int]) -> Tuple[Dict[int, List[dict]], List[int]]:
+        group_filter = base_filters.copy()
+        group_filter['state'] = [locations[group[0]]['state']]
+        group_filter['county'] = [locations[i]['county'] for i in group]
+        group_top_k = min(Config.PINECONE_MAX_TOP_K, math.ceil(quota * len(group) * Config.GROUPED_QUERY_OVERSAMPLE))
+        matches = retrieve_fn(build_pinecone_filter(group_filter), group_top_k).get('matches', [])
+        exhausted = len(matches) < group_top_k
+
+        # Matches arrive sorted by score, so each county's list stays sorted.
+        by_county: Dict[str, List[dict]] = {}
+        for match in matches:
+            county = match.get('metadata', {}).get('county')
+            by_county.setdefault(county, []).append(match)
+
+        complete: Dict[int, List[dict]] = {}
+        under_quota: List[int] = []
+        for i in group:
+            county_matches = by_county.get(locations[i]['county'], [])[:quota]
+            if len(county_matches) < quota and not exhausted:
+                under_quota.append(i)
+            else:
+                complete[i] = county_matches
+                if on_ready is not None:
+                    on_ready(i, county_matches)
+        return complete, under_quota
+
+    per_location: List[Optional[List[dict]]] = [None] * len(locations)
+    needs_fallback: List[int] = []
+
+    for group, (result, error) in zip(groups, fan_out(groups, query_group)):
+        if error is not None:
+            print(f"Grouped query failed for {len(group)} counties, falling back to per-county queries: {error}")
+            needs_fallback.extend(group)
+            continue
+
+        complete, under_quota = result
+        for i, county_matches in complete.items():
+            per_location[i] = county_matches
+        needs_fallback.extend(under_quota)
+
+    results: List[Tuple[Optional[List[dict]], Optional[Exception]]] = [(m, None) for m in per_location]
+
+    if needs_fallback:
+        print(f"Falling back to per-county queries for {len(needs_fallback)} counties under quota")
+
+        def query_fallback(i: int) -> List[dict]:
+            matches = retrieve_fn(build_location_filter(base_filters, locations[i]), quota).get('matches', [])
+            if on_ready is not None:
+                on_ready(i, matches)
+            return matches
+
+        for i, result in zip(needs_fallback, fan_out(needs_fallback, query_fallback)):
+            results[i] = result
+
+    return results
+
+
+def query_locations(
+    locations: List[dict],
+    base_filters: dict,
+    retrieve_fn: Callable[[dict, int], dict],
+    quota: int,
+    on_ready: Optional[Callable[[int, List[dict]], None]] = None
+) -> List[Tuple[Optional[List[dict]], Optional[Exception]]]:
+    """
+    Retrieve the top `quota` matches for every location, either with one
+    query per county or grouped multi-county queries (Config.GROUPED_COUNTY_QUERIES).
+
+    Args:
+        locations: Flat list of {state, county} dictionaries
+        base_filters: Normalized filters without the 'locations' key
+        retrieve_fn: Callable (pinecone_filter_object, top_k) -> Pinecone response
+        quota: Matches wanted per county
+        on_ready: Optional callback (location index, matches), called from the
+            worker thread as soon as a location's matches arrive
+
+    Returns:
+        List of (matches, error) tuples in the same order as `locations`
+    """
+    if Config.GROUPED_COUNTY_QUERIES and len(locations) > 1:
+        return query_locations_grouped(locations, base_filters, retrieve_fn, quota, on_ready)
+
+    def query_location(i: int) -> List[dict]:
+        loc = locations[i]
+        print(f"\nQuerying for location: {loc['state']}, county: {loc['county']}")
+        matches = retrieve_fn(build_location_filter(base_filters, loc), quota).get('matches', [])
+        if on_ready is not None:
+            on_ready(i, matches)
+        return matches
+
+    return fan_out(range(len(locations)), query_location)
+
+
+def collapse_location_duplicates(results: List[tuple]) -> List[tuple]:
+    """
+    Collapse near-duplicate matches within each location's results (see dedup.py).
+
+    Args:
+        results: (matches, error) tuples per location
+
+    Returns:
+        (matches, error) tuples with near-duplicates removed
+    """
+    candidate_lists = [matches if error is None else [] for matches, error in results]
+    collapsed = collapse_near_duplicates(candidate_lists)
+    return [
+        (matches if error is None else None, error)
+        for matches, (_, error) in zip(collapsed, results)
+    ]
+
+
+def collapse_and_shortlist(query: str, candidate_lists: List[List[dict]]) -> List[List[dict]]:
+    """
+    Near-duplicate collapse in one pass over every location's candidates, then
+    each location's BM25 shortlist.
+
+    Args:
+        query: The user's original query
+        candidate_lists: Per-location matches, each sorted by retrieval score
+
+    Returns:
+        Per-location candidates to send to the cross-encoder
+    """
+    candidate_lists = collapse_near_duplicates(candidate_lists)
+    if Config.CASCADE_ENABLED:
+        candidate_lists = [shortlist_candidates(query, matches) for matches in candidate_lists]
+    return candidate_lists
+
+
+def prepare_rerank_candidates(query: str, candidate_lists: List[List[dict]]) -> List[List[dict]]:
+    """
+    Narrow the locations' retrieved matches down to the pairs worth reranking:
+    adaptive depth per location, then collapse_and_shortlist over all of them.
+
+    Args:
+        query: The user's original query
+        candidate_lists: Per-location matches, each sorted by retrieval score
+
+    Returns:
+        Per-location candidates to send to the cross-encoder
+    """
+    return collapse_and_shortlist(query, [select_candidates(matches) for matches in candidate_lists])
+
+
 def run_query_for_each_location(
     pc: Pinecone, 
     pinecone_index: Any, 
     query: str, 
     filters: dict, 
-    filter_only_search: bool
+    filter_only_search: bool,
+    failed_locations: Optional[List[dict]] = None
 ) -> List[dict]:
     """
     Query Pinecone for each location (state, county) pair using baseline retrieval.
@@ -145,6 +414,7 @@ def run_query_for_each_location(
         query: Query text
         filters: Normalized filter dictionary
         filter_only_search: Whether this is a filter-only search
+        failed_locations: If given, locations whose queries failed are appended to it
         
     Returns:
         List of retrieved chunks
@@ -155,28 +425,33 @@ def run_query_for_each_location(
 
     if filter_only_search:  # Filter-Only Search. Query with all filters.
         print("\n--- Filter-Only Search. ---")
-        pinecone_filter_object = build_pinecone_filter(all_filters)
-        response = retrieve_chunks(pc, pinecone_index, query_text, pinecone_filter_object)
-        retrieved_chunks.extend(response.get('matches', []))
+        filter_catalog = get_filter_catalog()
+        if filter_catalog is not None:
+            # Metadata-only scan of the local catalog; no vector query needed. Only the
+            # first page is loaded; the rest is paged through /filter from its cursor.
+            print("Querying metadata catalog...Filter-Only Search")
+            retrieved_chunks.extend(filter_catalog.search(all_filters)['matches'])
+        else:
+            pinecone_filter_object = build_pinecone_filter(all_filters)
+            response = retrieve_chunks(pc, pinecone_index, query_text, pinecone_filter_object)
+            retrieved_chunks.extend(response.get('matches', []))
     else:  # Otherwise, query for each location.
         locations_to_search = all_filters.pop("locations", [])
         base_filters = all_filters
 
-        print(f"\n--- Starting baseline query loop for {len(locations_to_search)} locations ---")
+        print(f"\n--- Starting baseline query fan-out for {len(locations_to_search)} locations ---")
 
-        for loc in locations_to_search:
-            print(f"\nQuerying for location: {loc['state']}, county: {loc['county']}")
+        # Encode once per request; every location reuses the same vector.
+        query_vector = encode_query_dense(pc, query_text) if locations_to_search else None
 
-            # Build a Pinecone filter object for each location.
-            loop_filter = base_filters.copy()
-            loop_filter['state'] = [loc['state']]
-            loop_filter['county'] = [loc['county']]
-            pinecone_filter_object = build_pinecone_filter(loop_filter)
+        def retrieve_fn(pinecone_filter_object: dict, top_k: int) -> dict:
+            return retrieve_chunks(pc, pinecone_index, query_text, pinecone_filter_object, query_vector, top_k)
 
-            response = retrieve_chunks(pc, pinecone_index, query_text, pinecone_filter_object)
-            retrieved_chunks.extend(response.get('matches', []))
+        results = query_locations(locations_to_search, base_filters, retrieve_fn, Config.BASELINE_TOP_K)
+        results = collapse_location_duplicates(results)
+        retrieved_chunks.extend(merge_location_results(locations_to_search, results, failed_locations))
 
-        print(f"\n--- Loop finished. Total chunks retrieved: {len(retrieved_chunks)} ---")
+        print(f"\n--- Fan-out finished. Total chunks retrieved: {len(retrieved_chunks)} ---")
 
     return retrieved_chunks
 
@@ -187,7 +462,8 @@ def run_query_for_each_location_reranking(
     reranker_model: Any,
     query: str, 
     filters: dict, 
-    filter_only_search: bool
+    filter_only_search: bool,
+    failed_locations: Optional[List[dict]] = None
 ) -> List[dict]:
     """
     Query Pinecone for each location (state, county) pair using hybrid + reranking.
@@ -199,6 +475,7 @@ def run_query_for_each_location_reranking(
         query: Query text
         filters: Normalized filter dictionary
         filter_only_search: Whether this is a filter-only search
+        failed_locations: If given, locations whose queries failed are appended to it
         
     Returns:
         List of retrieved and reranked chunks
@@ -209,67 +486,173 @@ def run_query_for_each_location_reranking(
 
     if filter_only_search:  # Filter-Only Search. Query with all filters without reranking.
         print("\n--- Filter-Only Search. ---")
-        pinecone_filter_object = build_pinecone_filter(all_filters)
-        response = retrieve_chunks_hybrid_reranking(pc, pinecone_index, query_text, pinecone_filter_object)
-        retrieved_chunks.extend(response.get('matches', []))
+        filter_catalog = get_filter_catalog()
+        if filter_catalog is not None:
+            # Metadata-only scan of the local catalog; no vector query needed. Only the
+            # first page is loaded; the rest is paged through /filter from its cursor.
+            print("Querying metadata catalog...Filter-Only Search")
+            retrieved_chunks.extend(filter_catalog.search(all_filters)['matches'])
+        else:
+            pinecone_filter_object = build_pinecone_filter(all_filters)
+            response = retrieve_chunks_hybrid_reranking(pc, pinecone_index, query_text, pinecone_filter_object)
+            retrieved_chunks.extend(response.get('matches', []))
     else:  # Otherwise, query for each location.
         locations_to_search = all_filters.pop("locations", [])
         base_filters = all_filters
 
-        print(f"\n--- Starting Hybrid + Reranking query loop for {len(locations_to_search)} locations ---")
+        print(f"\n--- Starting Hybrid + Reranking query fan-out for {len(locations_to_search)} locations ---")
+
+        # Encode once per request; every location reuses the same vectors.
+        query_vectors = encode_query_hybrid(pc, query_text) if locations_to_search else None
+
+        def retrieve_fn(pinecone_filter_object: dict, top_k: int) -> dict:
+            return retrieve_chunks_hybrid_reranking(
+                pc, pinecone_index, query_text, pinecone_filter_object, query_vectors, top_k
+            )
+
+        if Config.STREAMING_RERANK:
+            # Rerank each location's candidates while the other queries are still in flight.
+            # The worker collapses and shortlists each drained micro-batch's locations together.
+            stream = RerankStream(reranker_model, query, score_candidates, prepare_fn=collapse_and_shortlist).start()
+            candidates = query_locations(
+                locations_to_search, base_filters, retrieve_fn, Config.HYBRID_TOP_K,
+                on_ready=lambda i, matches: stream.submit(i, select_candidates(matches))
+            )
+            scored = stream.finish()
+            results = [
+                (top_by_rerank_score(scored.get(i, [])), None) if e is None else (None, e)
+                for i, (_, e) in enumerate(candidates)
+            ]
+        else:
+            candidates = query_locations(locations_to_search, base_filters, retrieve_fn, Config.HYBRID_TOP_K)
+            prepared = iter(prepare_rerank_candidates(query, [m for m, e in candidates if e is None]))
+            candidates = [(next(prepared), None) if e is None else (None, e) for m, e in candidates]
+
+            # One reranking pass over the union of all locations' candidates.
+            reranked = rerank_locations(reranker_model, query, [m if e is None else [] for m, e in candidates])
+            results = [(r if e is None else None, e) for r, (_, e) in zip(reranked, candidates)]
+        retrieved_chunks.extend(merge_location_results(locations_to_search, results, failed_locations))
+
+        print(f"\n--- Fan-out finished. Total chunks retrieved: {len(retrieved_chunks)} ---")
 
-        for loc in locations_to_search:
-            print(f"\nQuerying for location: {loc['state']}, county: {loc['county']}")
+    return retrieved_chunks
 
-            # Build a filter object for each location.
-            loop_filter = base_filters.copy()
-            loop_filter['state'] = [loc['state']]
-            loop_filter['county'] = [loc['county']]
-            pinecone_filter_object = build_pinecone_filter(loop_filter)
 
-            response = retrieve_chunks_hybrid_reranking(pc, pinecone_index, query_text, pinecone_filter_object)
-            reranked_chunks = rerank_chunks(reranker_model, query, response.get('matches', []))
-            retrieved_chunks.extend(reranked_chunks)
+def score_candidates(reranker_model: Any, query: str, matches: List[dict]) -> List[float]:
+    """
+    Cross-encoder scores for (query, chunk_text) pairs, computed in length buckets.
 
-        print(f"\n--- Loop finished. Total chunks retrieved: {len(retrieved_chunks)} ---")
-
-    return retrieved_chunks
+    Scores already in the rerank cache are reused; the remaining pairs are
+    sorted by chunk length before batching so each batch pads to similar
+    lengths, then the scores are put back in input order.
 
+    Args:
+        reranker_model: CrossEncoder model
+        query: The user's original query
+        matches: Matches to score
 
-def rerank_chunks(reranker_model: Any, query: str, pinecone_matches: List[dict], top_n: Optional[int] = None) -> List[dict]:
+    Returns:
+        One score per match, in the order of `matches`
     """
-    Reranks the retrieved chunks using a Cross-Encoder model.
+    if not matches:
+        return []
+
+    scores: List[Optional[float]] = [None] * len(matches)
+    cache = get_rerank_cache() if Config.RERANK_CACHE_ENABLED else None
+    if cache is not None:
+        cached = cache.get_many(query, {match.get('id') for match in matches if match.get('id') is not None})
+        for i, match in enumerate(matches):
+            scores[i] = cached.get(match.get('id'))
+
+    # Only pairs missing from the cache go to the cross-encoder.
+    pending = [i for i, score in enumerate(scores) if score is None]
+    if pending:
+        texts = {i: matches[i].get('metadata', {}).get('chunk_text', '') for i in pending}
+        order = sorted(pending, key=lambda i: len(texts[i]))
+
+        if hasattr(reranker_model, 'predict_items'):
+            # Chunk IDs let the reranker reuse pre-tokenized passages (see token_cache.py).
+            items = [(query, matches[i].get('id'), texts[i]) for i in order]
+            sorted_scores = reranker_model.predict_items(items, batch_size=Config.RERANK_BATCH_SIZE)
+        else:
+            pairs = [(query, texts[i]) for i in order]
+            sorted_scores = reranker_model.predict(pairs, batch_size=Config.RERANK_BATCH_SIZE)
+
+        for position, i in enumerate(order):
+            scores[i] = float(sorted_scores[position])
+        if cache is not None:
+            cache.put_many(query, {
+                matches[i]['id']: scores[i] for i in pending if matches[i].get('id') is not None
+            })
+
+    if len(pending) < len(matches):
+        print(f"Rerank cache: {len(matches) - len(pending)} of {len(matches)} pairs cached")
+    return scores
+
+
+def rerank_locations(
+    reranker_model: Any,
+    query: str,
+    candidate_lists: List[List[dict]],
+    top_n: Optional[int] = None
+) -> List[List[dict]]:
+    """
+    Rerank every location's candidates in one batched pass, then split the
+    scores back into per-location top_n lists.
 
     Args:
         reranker_model: CrossEncoder model
         query: The user's original query
-        pinecone_matches: The list of 'matches' from Pinecone's response
-        top_n: The final number of chunks to return (defaults to Config.RERANK_TOP_N)
+        candidate_lists: Per-location candidate match lists
+        top_n: Chunks to keep per location (defaults to Config.RERANK_TOP_N)
 
     Returns:
-        A new, sorted list of the top_n 'matches' objects
+        Per-location lists of the top_n matches by rerank_score
     """
     if top_n is None:
         top_n = Config.RERANK_TOP_N
-        
-    print(f"Reranking {len(pinecone_matches)} chunks... ")
 
-    # Create pairs of [query, chunk_text] for the model
-    pairs = []
-    for match in pinecone_matches:
-        chunk_text = match.get('metadata', {}).get('chunk_text', '')
-        pairs.append((query, chunk_text))
+    all_matches = [match for matches in candidate_lists for match in matches]
+    print(f"Reranking {len(all_matches)} chunks across {len(candidate_lists)} locations... ")
 
     start_time = time.time()
-    scores = reranker_model.predict(pairs)
+    scores = score_candidates(reranker_model, query, all_matches)
     end_time = time.time()
     print(f"Reranking took {end_time - start_time:.4f} seconds")
 
-    # Add rerank_score to original matches
-    for i in range(len(scores)):
-        pinecone_matches[i]['rerank_score'] = float(scores[i])
+    for match, score in zip(all_matches, scores):
+        match['rerank_score'] = score
+
+    return [top_by_rerank_score(matches, top_n) for matches in candidate_lists]
+
+
+def top_by_rerank_score(matches: List[dict], top_n: Optional[int] = None) -> List[dict]:
+    """
+    The top_n matches by 'rerank_score'.
+
+    Args:
+        matches: Scored matches
+        top_n: Chunks to keep (defaults to Config.RERANK_TOP_N)
+
+    Returns:
+        Matches sorted by rerank_score, highest first
+    """
+    if top_n is None:
+        top_n = Config.RERANK_TOP_N
+    return sorted(matches, key=lambda x: x['rerank_score'], reverse=True)[:top_n]
+
 
-    # Sort by rerank_score
-    reranked_matches = sorted(pinecone_matches, key=lambda x: x['rerank_score'], reverse=True)
+def rerank_chunks(reranker_model: Any, query: str, pinecone_matches: List[dict], top_n: Optional[int] = None) -> List[dict]:
+    """
+    Reranks the retrieved chunks using a Cross-Encoder model.
 
-    return reranked_matches[:top_n]
+    Args:
+        reranker_model: CrossEncoder model
+        query: The user's original query
+        pinecone_matches: The list of 'matches' from Pinecone's response
+        top_n: The final number of chunks to return (defaults to Config.RERANK_TOP_N)
+
+    Returns:
+        A new, sorted list of the top_n 'matches' objects
+    """
+    return rerank_locations(reranker_model, query, [pinecone_matches], top_n)[0]
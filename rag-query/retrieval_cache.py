@@ -0,0 +1,300 @@
+"""
+Retrieval result cache in front of the per-location query loops.
+
+Entries are keyed by search mode, a hash of the query embedding, a canonical
+form of the filters, the index version and every setting that changes the
+results, so neither a re-ingested index nor a config change serves stale
+results. A retrieval in which any location failed is returned but not cached.
+"""
+import copy
+import hashlib
+import json
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from config import Config
+from filters import build_pinecone_filter
+from kv_store import SQLiteStore
+
+
+def hash_query_vectors(query_vectors: Any) -> str:
+    """
+    Hash a dense vector, a (dense, sparse) pair, or None (filter-only search).
+
+    Args:
+        query_vectors: Query embedding(s) as returned by encoding.py
+
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha256()
+    if query_vectors is None:
+        return ""
+    if isinstance(query_vectors, tuple):
+        dense, sparse = query_vectors
+        digest.update(np.asarray(dense, dtype=np.float32).tobytes())
+        digest.update(np.asarray(sparse['indices'], dtype=np.uint32).tobytes())
+        digest.update(np.asarray(sparse['values'], dtype=np.float32).tobytes())
+    else:
+        digest.update(np.asarray(query_vectors, dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+
+def canonicalize_filters(filters: dict) -> str:
+    """
+    Canonical string form of normalized filters.
+
+    Locations are de-duplicated and sorted, and the other fields go through
+    build_pinecone_filter so that empty or unset values disappear, ranges
+    become floats and multi-select lists are sorted.
+
+    Args:
+        filters: Normalized filters (flattened 'locations')
+
+    Returns:
+        Deterministic JSON string
+    """
+    filters = dict(filters)
+    locations = sorted({(loc['state'], loc['county']) for loc in filters.pop('locations', [])})
+
+    canonical_fields = {}
+    for field, condition in build_pinecone_filter(filters).items():
+        normalized = {}
+        for op, operand in condition.items():
+            if op == '$in':
+                normalized[op] = sorted(operand)
+            elif op in ('$gte', '$lte'):
+                normalized[op] = float(operand)
+            else:
+                normalized[op] = operand
+        canonical_fields[field] = normalized
+
+    return json.dumps({'locations': locations, 'fields': canonical_fields}, sort_keys=True)
+
+
+def index_version_from_stats(stats: Any) -> str:
+    """
+    Derive an index version stamp from describe_index_stats output.
+
+    Args:
+        stats: Pinecone describe_index_stats response (or LocalIndex equivalent)
+
+    Returns:
+        Hex digest of the vector counts per namespace
+    """
+    if hasattr(stats, 'to_dict'):
+        stats = stats.to_dict()
+    namespaces = {
+        name: (summary.get('vector_count') if isinstance(summary, dict) else getattr(summary, 'vector_count', None))
+        for name, summary in (stats.get('namespaces') or {}).items()
+    }
+    stamp = {'total_vector_count': stats.get('total_vector_count'), 'namespaces': namespaces}
+    return hashlib.sha256(json.dumps(stamp, sort_keys=True).encode()).hexdigest()[:16]
+
+
+# Config settings that change which chunks come back, or their order and scores.
+RESULT_SETTINGS = (
+    'BASELINE_TOP_K', 'HYBRID_TOP_K', 'RERANK_TOP_N', 'FILTER_ONLY_TOP_K', 'PINECONE_MAX_TOP_K',
+    'PINECONE_NAMESPACE', 'INDEX_BACKEND', 'LOCAL_INDEX_DIR', 'METADATA_CATALOG_PATH',
+    'EMBEDDING_MODEL_DENSE', 'EMBEDDING_MODEL_SPARSE',
+    'RERANKER_MODEL_ID', 'RERANKER_BACKEND', 'RERANKER_ONNX_QUANTIZE', 'RERANKER_MAX_LENGTH',
+)
+RESULT_SETTING_PREFIXES = ('ADAPTIVE_DEPTH_', 'CASCADE_', 'BM25_', 'DEDUP_', 'GROUPED_')
+
+
+def result_settings() -> Dict[str, Any]:
+    """The current values of every result-changing Config setting."""
+    names = set(RESULT_SETTINGS)
+    names.update(name for name in vars(Config) if name.startswith(RESULT_SETTING_PREFIXES))
+    return {name: getattr(Config, name) for name in sorted(names)}
+
+
+def to_plain_match(match: Any) -> dict:
+    """Convert a Pinecone match object into a plain dictionary."""
+    if hasattr(match, 'to_dict'):
+        return match.to_dict()
+    return copy.deepcopy(dict(match))
+
+
+class RetrievalCache:
+    """LRU cache of retrieval results with optional on-disk persistence."""
+
+    def __init__(
+        self,
+        max_entries: int,
+        persist_path: Optional[str] = None,
+        version_check_seconds: float = 60.0
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum cached results (memory and disk)
+            persist_path: SQLite file for the on-disk tier (None keeps the cache in memory)
+            version_check_seconds: Minimum seconds between describe_index_stats calls
+        """
+        self.max_entries = max_entries
+        self.version_check_seconds = version_check_seconds
+        self.store = SQLiteStore(persist_path, max_entries) if persist_path else None
+
+        self._entries: "OrderedDict[str, List[dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._index_version: Optional[str] = None
+        self._version_checked_at = float('-inf')
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def index_version(self, pinecone_index: Any) -> str:
+        """
+        Return the current index version, refreshing it at most every
+        version_check_seconds. A changed version drops every cached result.
+
+        Args:
+            pinecone_index: Pinecone index (or LocalIndex)
+
+        Returns:
+            Index version stamp
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._index_version is not None and now - self._version_checked_at < self.version_check_seconds:
+                return self._index_version
+
+        version = index_version_from_stats(pinecone_index.describe_index_stats())
+
+        with self._lock:
+            if self._index_version is not None and version != self._index_version:
+                print(f"Index version changed ({self._index_version} -> {version}), clearing retrieval cache")
+                self._entries.clear()
+                if self.store is not None:
+                    self.store.clear()
+                self.invalidations += 1
+            self._index_version = version
+            self._version_checked_at = now
+        return version
+
+    def make_key(self, mode: str, query_vectors: Any, filters: dict, index_version: str) -> str:
+        """Build the cache key for one retrieval request."""
+        raw = json.dumps(
+            [mode, hash_query_vectors(query_vectors), canonicalize_filters(filters), index_version, result_settings()],
+            sort_keys=True
+        )
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[List[dict]]:
+        """Return a copy of the cached result for `key`, or None."""
+        with self._lock:
+            chunks = self._entries.get(key)
+            if chunks is not None:
+                self._entries.move_to_end(key)
+
+        if chunks is None and self.store is not None:
+            raw = self.store.get(key)
+            if raw is not None:
+                chunks = pickle.loads(raw)
+                self._remember(key, chunks)
+
+        with self._lock:
+            if chunks is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        # Callers annotate matches in place (e.g. rerank_score), so never hand out cached objects.
+        return copy.deepcopy(chunks)
+
+    def put(self, key: str, chunks: List[Any]) -> None:
+        """Cache a retrieval result."""
+        plain = [to_plain_match(match) for match in chunks]
+        self._remember(key, plain)
+        if self.store is not None:
+            self.store.put(key, pickle.dumps(plain))
+
+    def _remember(self, key: str, chunks: List[dict]) -> None:
+        with self._lock:
+            self._entries[key] = chunks
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_retrieve(
+        self,
+        pinecone_index: Any,
+        mode: str,
+        query_vectors: Any,
+        filters: dict,
+        retrieve: Callable[[List[dict]], List[Any]]
+    ) -> List[Any]:
+        """
+        Return cached chunks for this request, or run `retrieve` and cache its result.
+
+        Args:
+            pinecone_index: Pinecone index (used for the version stamp)
+            mode: Search mode ('baseline' or 'hybrid')
+            query_vectors: Query embedding(s), None for filter-only search
+            filters: Normalized filters
+            retrieve: Callable running the actual retrieval; it appends the
+                locations whose queries failed to the list it is given
+
+        Returns:
+            Retrieved chunks
+        """
+        key = self.make_key(mode, query_vectors, filters, self.index_version(pinecone_index))
+        cached = self.get(key)
+        if cached is not None:
+            print(f"Retrieval cache hit ({len(cached)} chunks)")
+            return cached
+
+        failed_locations: List[dict] = []
+        chunks = retrieve(failed_locations)
+        if failed_locations:
+            # A partial result would keep being served after the failure clears
+            print(f"Not caching retrieval: {len(failed_locations)} location(s) failed")
+        else:
+            self.put(key, chunks)
+        return chunks
+
+    def clear(self) -> None:
+        """Drop every cached result."""
+        with self._lock:
+            self._entries.clear()
+        if self.store is not None:
+            self.store.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_entries,
+                "persisted": len(self.store) if self.store is not None else 0,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "index_version": self._index_version,
+            }
+
+
+_retrieval_cache: Optional[RetrievalCache] = None
+_retrieval_cache_lock = threading.Lock()
+
+
+def get_retrieval_cache() -> RetrievalCache:
+    """Return the process-wide retrieval cache."""
+    global _retrieval_cache
+    with _retrieval_cache_lock:
+        if _retrieval_cache is None:
+            _retrieval_cache = RetrievalCache(
+                Config.RETRIEVAL_CACHE_SIZE,
+                persist_path=Config.RETRIEVAL_CACHE_PATH or None,
+                version_check_seconds=Config.INDEX_VERSION_CHECK_SECONDS
+            )
+        return _retrieval_cache
@@ -0,0 +1,163 @@
+"""
+Semantic answer cache that skips LLM generation for near-duplicate questions.
+
+A stored answer is reused when a new question's embedding is close enough
+(cosine similarity) to a cached one *and* retrieval produced exactly the same
+chunk IDs for the same filters, so the LLM would have seen the same context.
+"""
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+from retrieval_cache import canonicalize_filters
+
+
+def context_key(mode: str, filters: dict, chunk_ids: List[str]) -> Tuple[int, str]:
+    """
+    Key identifying the generation context: mode, canonical filters and chunk-ID set.
+
+    Args:
+        mode: Search mode ('baseline' or 'hybrid')
+        filters: Normalized filters
+        chunk_ids: IDs of the retrieved chunks
+
+    Returns:
+        Tuple of (int64 hash for vectorized comparison, full key string)
+    """
+    full_key = "|".join([mode, canonicalize_filters(filters), ",".join(sorted(str(c) for c in chunk_ids))])
+    digest = hashlib.sha256(full_key.encode()).digest()
+    return int.from_bytes(digest[:8], "little", signed=True), full_key
+
+
+class SemanticAnswerCache:
+    """Bounded cache of LLM answers with vectorized cosine-similarity lookup."""
+
+    def __init__(self, max_entries: int, threshold: float):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum stored answers (least recently used evicted first)
+            threshold: Minimum cosine similarity between query embeddings for a hit
+        """
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._lock = threading.Lock()
+
+        self._embeddings: Optional[np.ndarray] = None  # (max_entries, dim), allocated on first store
+        self._key_hashes = np.zeros(max_entries, dtype=np.int64)
+        self._last_used = np.zeros(max_entries, dtype=np.int64)
+        self._keys: List[Optional[str]] = [None] * max_entries
+        self._answers: List[Optional[str]] = [None] * max_entries
+        self._size = 0
+        self._clock = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.context_mismatches = 0  # Similar question, but retrieval returned different chunks
+
+    @staticmethod
+    def _normalize(embedding: Any) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(self, embedding: Any, mode: str, filters: dict, chunk_ids: List[str]) -> Optional[str]:
+        """
+        Return a cached answer for a near-duplicate question with the same context.
+
+        Args:
+            embedding: Dense query embedding
+            mode: Search mode
+            filters: Normalized filters
+            chunk_ids: IDs of the retrieved chunks
+
+        Returns:
+            Cached LLM output, or None
+        """
+        query = self._normalize(embedding)
+        key_hash, full_key = context_key(mode, filters, chunk_ids)
+
+        with self._lock:
+            if self._size == 0 or self._embeddings is None or self._embeddings.shape[1] != len(query):
+                self.misses += 1
+                return None
+
+            similarities = self._embeddings[:self._size] @ query
+            similar = similarities >= self.threshold
+            candidates = similar & (self._key_hashes[:self._size] == key_hash)
+
+            if not candidates.any():
+                if similar.any():
+                    self.context_mismatches += 1
+                self.misses += 1
+                return None
+
+            best = int(np.argmax(np.where(candidates, similarities, -np.inf)))
+            if self._keys[best] != full_key:  # 64-bit hash collision
+                self.misses += 1
+                return None
+
+            self._clock += 1
+            self._last_used[best] = self._clock
+            self.hits += 1
+            print(f"Semantic cache hit (cosine similarity {similarities[best]:.4f})")
+            return self._answers[best]
+
+    def store(self, embedding: Any, mode: str, filters: dict, chunk_ids: List[str], answer: str) -> None:
+        """
+        Store an answer, evicting the least recently used entry when full.
+
+        Args:
+            embedding: Dense query embedding
+            mode: Search mode
+            filters: Normalized filters
+            chunk_ids: IDs of the retrieved chunks
+            answer: LLM output
+        """
+        query = self._normalize(embedding)
+        key_hash, full_key = context_key(mode, filters, chunk_ids)
+
+        with self._lock:
+            if self._embeddings is None or self._embeddings.shape[1] != len(query):
+                self._embeddings = np.zeros((self.max_entries, len(query)), dtype=np.float32)
+                self._size = 0
+
+            if self._size < self.max_entries:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+
+            self._clock += 1
+            self._embeddings[slot] = query
+            self._key_hashes[slot] = key_hash
+            self._last_used[slot] = self._clock
+            self._keys[slot] = full_key
+            self._answers[slot] = answer
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit-rate metrics and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": self._size,
+                "max_size": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "context_mismatches": self.context_mismatches,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Shared by every RAGPipeline in the process.
+_semantic_cache = SemanticAnswerCache(Config.SEMANTIC_CACHE_SIZE, Config.SEMANTIC_CACHE_THRESHOLD)
+
+
+def get_semantic_cache() -> SemanticAnswerCache:
+    """Return the process-wide semantic answer cache."""
+    return _semantic_cache
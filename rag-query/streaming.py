@@ -0,0 +1,143 @@
+"""
+Streaming rerank stage that overlaps Pinecone I/O with cross-encoder compute.
+
+Location queries hand their candidates to a RerankStream as soon as they
+return; a dedicated worker thread drains whatever has queued up into a
+micro-batch and scores it while the remaining queries are still in flight.
+An optional prepare step (near-duplicate collapse, BM25 shortlist) runs once
+over each micro-batch's locations together, just before scoring.
+"""
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from config import Config
+
+_DONE = object()
+
+
+class RerankStream:
+    """Producer/consumer reranker for one request's location candidates."""
+
+    def __init__(
+        self,
+        reranker_model: Any,
+        query: str,
+        score_fn: Any,
+        micro_batch_pairs: Optional[int] = None,
+        prepare_fn: Any = None
+    ):
+        """
+        Initialize the stream.
+
+        Args:
+            reranker_model: Cross-encoder passed to score_fn
+            query: The user's original query
+            score_fn: Callable (reranker_model, query, matches) -> scores (retrieval.score_candidates)
+            micro_batch_pairs: Stop draining the queue once a micro-batch has this
+                many pairs (defaults to Config.STREAM_MICRO_BATCH_PAIRS)
+            prepare_fn: Optional callable (query, per-location match lists) -> narrowed
+                lists (retrieval.collapse_and_shortlist), applied to each micro-batch
+        """
+        self.reranker_model = reranker_model
+        self.query = query
+        self.score_fn = score_fn
+        self.prepare_fn = prepare_fn
+        self.micro_batch_pairs = micro_batch_pairs or Config.STREAM_MICRO_BATCH_PAIRS
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._results: Dict[int, List[dict]] = {}
+        self._submitted = set()
+        self._lock = threading.Lock()
+        self._error: Optional[Exception] = None
+        self._worker = threading.Thread(target=self._run, name="rerank-stream", daemon=True)
+
+        self.batches = 0
+        self.pairs = 0
+        self.busy_seconds = 0.0
+
+    def start(self) -> "RerankStream":
+        """Start the rerank worker."""
+        self._worker.start()
+        return self
+
+    def submit(self, index: int, matches: List[dict]) -> None:
+        """
+        Queue one location's candidates for scoring (safe to call from any thread).
+
+        Args:
+            index: Location index
+            matches: Candidates to score; a location submitted twice keeps its first list
+        """
+        with self._lock:
+            if index in self._submitted:
+                return
+            self._submitted.add(index)
+        self._queue.put((index, matches))
+
+    def finish(self, timeout: Optional[float] = None) -> Dict[int, List[dict]]:
+        """
+        Wait for every queued location to be scored.
+
+        Args:
+            timeout: Maximum seconds to wait for the worker
+
+        Returns:
+            {location index: matches with 'rerank_score' set}
+        """
+        self._queue.put(_DONE)
+        self._worker.join(timeout)
+        if self._worker.is_alive():
+            raise TimeoutError("Rerank stream did not finish in time")
+        if self._error is not None:
+            raise self._error
+        print(f"Streamed rerank: {self.pairs} pairs in {self.batches} micro-batches "
+              f"({self.busy_seconds:.4f}s of compute)")
+        return self._results
+
+    def _next_batch(self) -> Optional[List[tuple]]:
+        """Block for one location, then drain what else is queued up to the micro-batch size."""
+        item = self._queue.get()
+        if item is _DONE:
+            return None
+        batch = [item]
+        pairs = len(item[1])
+        while pairs < self.micro_batch_pairs:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _DONE:
+                self._queue.put(_DONE)  # Handled on the next call, after this batch is scored
+                break
+            batch.append(item)
+            pairs += len(item[1])
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            if self._error is not None:
+                continue  # Keep draining so finish() can return
+
+            try:
+                start_time = time.time()
+                if self.prepare_fn is not None:
+                    prepared = self.prepare_fn(self.query, [location_matches for _, location_matches in batch])
+                    batch = [(index, location_matches) for (index, _), location_matches in zip(batch, prepared)]
+                matches = [match for _, location_matches in batch for match in location_matches]
+                scores = self.score_fn(self.reranker_model, self.query, matches)
+                self.busy_seconds += time.time() - start_time
+            except Exception as e:
+                self._error = e
+                continue
+
+            for match, score in zip(matches, scores):
+                match['rerank_score'] = score
+            for index, location_matches in batch:
+                self._results[index] = location_matches
+            self.batches += 1
+            self.pairs += len(matches)
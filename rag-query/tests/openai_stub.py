@@ -0,0 +1,114 @@
+"""
+Stub OpenAI-compatible chat completions server for tests and local development.
+
+Replies deterministically ("stub answer: <last user message words>") without a
+model, in both the plain JSON and the server-sent events (stream=True) forms,
+and records every request body and client connection it sees.
+
+Run standalone to point the API at it:
+    python -m tests.openai_stub --port 8001
+    GENERATION_BACKEND=openai GENERATION_API_BASE=http://localhost:8001/v1 python api.py
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+
+def stub_reply(messages: List[dict], max_tokens: int) -> List[str]:
+    """The stub's answer as word pieces: 'stub answer:' plus the user's words, up to max_tokens."""
+    words = ["stub", " answer:"] + [f" {word}" for word in messages[-1]["content"].split()]
+    return words[:max_tokens]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so client connection pooling is observable
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        with server.lock:
+            server.requests.append(body)
+            server.connections.add(self.client_address)
+            if server.fail_next:
+                server.fail_next = False
+                self.send_error(500, "stub failure")
+                return
+
+        pieces = stub_reply(body["messages"], body.get("max_tokens", 1024))
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for piece in pieces:
+                self._chunk(f"data: {json.dumps({'choices': [{'index': 0, 'delta': {'content': piece}}]})}\n\n")
+            self._chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            payload = json.dumps({
+                "object": "chat.completion",
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(pieces)},
+                             "finish_reason": "stop"}],
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    def _chunk(self, text: str) -> None:
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+class StubCompletionServer(ThreadingHTTPServer):
+    """Threaded stub server; `base_url` ends in /v1 like a real deployment."""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.lock = threading.Lock()
+        self.requests: List[dict] = []
+        self.connections = set()
+        self.fail_next = False
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "StubCompletionServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="openai-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub OpenAI-compatible completion server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+
+    server = StubCompletionServer(args.host, args.port)
+    print(f"Stub completion server on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
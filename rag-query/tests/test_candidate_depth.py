@@ -0,0 +1,52 @@
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from candidate_depth import adaptive_depth, get_candidate_depth_stats, select_candidates
+from config import Config
+
+
+class TestAdaptiveDepth(unittest.TestCase):
+
+    def test_cuts_at_cliff(self):
+        """Scores that fall off a cliff after 12 candidates keep only 12"""
+        scores = np.concatenate([np.linspace(0.9, 0.8, 12), np.linspace(0.3, 0.25, 88)])
+        self.assertEqual(adaptive_depth(scores, min_depth=10, gap_ratio=0.25), 12)
+
+    def test_smooth_decay_keeps_everything(self):
+        scores = np.linspace(0.9, 0.1, 100)
+        self.assertEqual(adaptive_depth(scores, min_depth=10, gap_ratio=0.25), 100)
+
+    def test_cliff_before_min_depth_is_ignored(self):
+        scores = np.concatenate([np.linspace(0.9, 0.85, 3), np.linspace(0.3, 0.25, 97)])
+        self.assertEqual(adaptive_depth(scores, min_depth=10, gap_ratio=0.25), 100)
+
+    def test_score_floor(self):
+        scores = np.linspace(0.9, 0.0, 91)  # step 0.01
+        self.assertEqual(adaptive_depth(scores, min_depth=10, gap_ratio=0.25, score_floor=0.5), 41)
+        self.assertEqual(adaptive_depth(scores, min_depth=10, gap_ratio=0.25, score_floor=0.95), 10)
+
+
+class TestSelectCandidates(unittest.TestCase):
+
+    @patch.object(Config, "ADAPTIVE_DEPTH_ENABLED", True)
+    def test_records_saved_pairs(self):
+        stats = get_candidate_depth_stats()
+        before = stats.stats()["rerank_pairs_saved"]
+        scores = [0.9 - i * 0.01 for i in range(12)] + [0.2] * 88
+        matches = [{"id": str(i), "score": s} for i, s in enumerate(scores)]
+
+        selected = select_candidates(matches, min_depth=10)
+
+        self.assertEqual([m["id"] for m in selected], [str(i) for i in range(12)])
+        self.assertEqual(stats.stats()["rerank_pairs_saved"] - before, 88)
+
+    @patch.object(Config, "ADAPTIVE_DEPTH_ENABLED", False)
+    def test_disabled(self):
+        matches = [{"score": 0.9}] + [{"score": 0.0}] * 50
+        self.assertEqual(len(select_candidates(matches)), 51)
+
+
+if __name__ == "__main__":
+    unittest.main()
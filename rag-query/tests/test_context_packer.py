@@ -0,0 +1,139 @@
+import unittest
+
+from context_packer import NOTHING_FIT, ChunkTokenCounter, pack_context, split_sentences
+from llm_generation import build_context_string
+
+
+class WhitespaceTokenizer:
+    """One token per whitespace-separated word; counts how many strings it tokenizes."""
+
+    def __init__(self):
+        self.strings = 0
+
+    def __call__(self, text, add_special_tokens=False):
+        texts = [text] if isinstance(text, str) else text
+        self.strings += len(texts)
+        ids = [list(range(len(t.split()))) for t in texts]
+        return {'input_ids': ids[0] if isinstance(text, str) else ids}
+
+
+def sentences(label, count, words=9):
+    return " ".join(f"{label} sentence {n} " + "word " * (words - 3) + "end." for n in range(count))
+
+
+def chunk(chunk_id, county, score, text):
+    return {
+        'id': chunk_id,
+        'score': score,
+        'rerank_score': score,
+        'metadata': {'chunk_text': text, 'state': 'ca', 'county': county, 'section': 's'},
+    }
+
+
+class TestPackContext(unittest.TestCase):
+
+    def setUp(self):
+        self.tokenizer = WhitespaceTokenizer()
+        self.counter = ChunkTokenCounter(self.tokenizer, max_entries=100)
+
+    def pack(self, chunks, budget, **kwargs):
+        return pack_context(chunks, self.tokenizer, budget=budget, counter=self.counter, **kwargs)
+
+    def test_everything_fits_unchanged(self):
+        """Under budget the context matches the unbudgeted build_context_string"""
+        chunks = [chunk("a", "alameda", 0.9, sentences("a", 2)), chunk("b", "kern", 0.5, sentences("b", 1))]
+        packed = self.pack(chunks, budget=10_000)
+
+        self.assertEqual(packed['text'], build_context_string(chunks))
+        self.assertEqual((packed['dropped_tokens'], packed['truncated_chunks'], packed['dropped_chunks']), (0, 0, 0))
+
+    def test_truncates_at_sentence_boundary_within_budget(self):
+        text = sentences("a", 10)
+        chunks = [chunk("a", "alameda", 0.9, text)]
+        full_tokens = self.pack(chunks, budget=10_000)['tokens']
+
+        packed = self.pack(chunks, budget=full_tokens - 15)
+
+        self.assertLessEqual(packed['tokens'], full_tokens - 15)
+        self.assertEqual(packed['truncated_chunks'], 1)
+        self.assertEqual(packed['dropped_tokens'], full_tokens - packed['tokens'])
+        kept = packed['text'].split('Text: "')[1].rsplit('"', 1)[0]
+        self.assertTrue(kept.endswith("end."))
+        self.assertTrue(text.startswith(kept))
+        self.assertEqual(len(split_sentences(kept)), 8)  # Two 9-token sentences cut
+
+    def test_each_location_gets_its_share(self):
+        """A county with long, high-scoring chunks cannot crowd out another county"""
+        chunks = [chunk(f"a{i}", "alameda", 0.9 - i * 0.01, sentences(f"a{i}", 20)) for i in range(3)]
+        chunks.append(chunk("b0", "kern", 0.1, sentences("b0", 2)))
+
+        packed = self.pack(chunks, budget=200)
+
+        self.assertIn("[Chunk 4]", packed['text'])
+        self.assertIn("b0 sentence 1", packed['text'])  # Kern's chunk is complete
+        self.assertLessEqual(packed['tokens'], 200)
+
+    def test_unused_share_goes_to_other_locations(self):
+        chunks = [chunk(f"a{i}", "alameda", 0.9 - i * 0.01, sentences(f"a{i}", 5)) for i in range(4)]
+        chunks.append(chunk("b0", "kern", 0.95, sentences("b0", 1)))
+
+        packed = self.pack(chunks, budget=200)
+
+        # Kern needs far less than half the budget; Alameda uses the rest.
+        self.assertGreater(packed['tokens'], 180)
+        self.assertLessEqual(packed['tokens'], 200)
+
+    def test_dropped_chunks_keep_citation_numbers(self):
+        """Included chunks keep their [Chunk N] number from the returned chunk list"""
+        chunks = [
+            chunk("a", "alameda", 0.9, sentences("a", 3)),
+            chunk("b", "alameda", 0.1, sentences("b", 3)),
+            chunk("c", "alameda", 0.5, sentences("c", 3)),
+        ]
+        one_chunk = self.pack(chunks[:1], budget=10_000)['tokens']
+
+        packed = self.pack(chunks, budget=2 * one_chunk + 5)
+
+        self.assertIn("[Chunk 1]", packed['text'])
+        self.assertIn("[Chunk 3]", packed['text'])
+        self.assertNotIn("[Chunk 2]", packed['text'])
+        self.assertEqual(packed['dropped_chunks'], 1)
+
+    def test_oversized_sentence_does_not_block_lower_ranks(self):
+        """A top chunk that is one long sentence is cut at a word and the next chunk still fits"""
+        long_sentence = " ".join(f"w{n}" for n in range(300)) + "."
+        chunks = [chunk("a", "alameda", 0.9, long_sentence), chunk("b", "alameda", 0.1, "Short one here.")]
+
+        packed = self.pack(chunks, budget=100)
+
+        self.assertEqual((packed['chunks'], packed['truncated_chunks'], packed['dropped_chunks']), (2, 1, 0))
+        self.assertIn("[Chunk 2]", packed['text'])
+        self.assertIn('Text: "w0 w1', packed['text'])
+        self.assertLessEqual(packed['tokens'], 100)
+        self.assertGreater(packed['tokens'], 90)
+
+    def test_nothing_fits(self):
+        chunks = [chunk("a", "alameda", 0.9, sentences("a", 2))]
+        packed = self.pack(chunks, budget=3)
+
+        self.assertEqual(packed['text'], NOTHING_FIT)
+        self.assertEqual((packed['chunks'], packed['dropped_chunks']), (0, 1))
+
+    def test_token_counts_memoized_by_chunk_id(self):
+        chunks = [chunk("a", "alameda", 0.9, sentences("a", 4)), chunk("b", "kern", 0.5, sentences("b", 4))]
+        self.pack(chunks, budget=100)
+        tokenized = self.tokenizer.strings
+
+        self.pack(list(reversed(chunks)), budget=60)
+
+        self.assertEqual(self.tokenizer.strings, tokenized)
+        self.assertEqual(self.counter.stats()["hits"], 2)
+
+    def test_max_chunks_and_empty_input(self):
+        chunks = [chunk(str(i), "alameda", 0.5, sentences(str(i), 1)) for i in range(12)]
+        self.assertEqual(self.pack(chunks, budget=10_000, max_chunks=10)['chunks'], 10)
+        self.assertEqual(self.pack([], budget=100)['text'], "No documents were retrieved.")
+
+
+if __name__ == "__main__":
+    unittest.main()
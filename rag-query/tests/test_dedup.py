@@ -0,0 +1,60 @@
+import unittest
+
+import numpy as np
+
+from dedup import collapse_near_duplicates, minhash_signatures
+
+ORDINANCE = (
+    "No person owning or having charge of any dog shall permit the dog to run at large "
+    "upon any street, sidewalk, park or other public place within the unincorporated area "
+    "of the county unless the dog is restrained by a leash not exceeding six feet in length"
+)
+
+
+def make_match(match_id, score, text, section="Sec. 6.04.010", county="alameda-county"):
+    return {
+        "id": match_id,
+        "score": score,
+        "metadata": {"state": "ca", "county": county, "section": section, "chunk_text": text},
+    }
+
+
+class TestMinHash(unittest.TestCase):
+
+    def test_signature_agreement_tracks_jaccard(self):
+        overlapping = ORDINANCE + " and under the control of a competent person"
+        unrelated = "The board of supervisors shall meet on the first Tuesday of each month at ten o'clock"
+        signatures = minhash_signatures([ORDINANCE, overlapping, unrelated], num_perm=128, shingle_size=5)
+
+        self.assertEqual(signatures.shape, (3, 128))
+        self.assertGreater(np.mean(signatures[0] == signatures[1]), 0.6)
+        self.assertLess(np.mean(signatures[0] == signatures[2]), 0.1)
+
+
+class TestCollapseNearDuplicates(unittest.TestCase):
+
+    def test_overlapping_chunks_collapse_into_best(self):
+        candidates = [[
+            make_match("a1", 0.9, ORDINANCE),
+            make_match("other", 0.8, "Every dog over four months of age shall be licensed annually"),
+            make_match("a2", 0.7, ORDINANCE + "."),
+        ]]
+
+        collapsed = collapse_near_duplicates(candidates)
+
+        self.assertEqual([m["id"] for m in collapsed[0]], ["a1", "other"])
+        self.assertEqual(collapsed[0][0]["duplicate_ids"], ["a2"])
+
+    def test_same_text_in_other_section_or_location_is_kept(self):
+        candidates = [
+            [make_match("a1", 0.9, ORDINANCE), make_match("a2", 0.8, ORDINANCE, section="Sec. 9.01")],
+            [make_match("b1", 0.9, ORDINANCE, county="butte-county")],
+        ]
+
+        collapsed = collapse_near_duplicates(candidates)
+
+        self.assertEqual([[m["id"] for m in ms] for ms in collapsed], [["a1", "a2"], ["b1"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from config import Config
+from encoding import EmbeddingCache, embed_query, encode_query_hybrid, get_embedding_cache
+
+
+def make_mock_pc():
+    """Pinecone client whose embed() returns a dense or sparse result based on the model."""
+    mock_pc = MagicMock()
+
+    def embed(model, inputs, parameters):
+        if model == Config.EMBEDDING_MODEL_SPARSE:
+            return [{"sparse_indices": [1, 7], "sparse_values": [0.5, 0.2]}]
+        return [{"values": [0.1, 0.2, 0.3]}]
+
+    mock_pc.inference.embed.side_effect = embed
+    return mock_pc
+
+
+class TestEmbeddingCache(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        """Least recently used entry should be evicted first"""
+        cache = EmbeddingCache(max_size=2, ttl_seconds=60)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")  # "b" becomes least recently used
+        cache.put("c", 3)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_ttl_expiry(self):
+        """Entries older than the TTL should be treated as misses"""
+        cache = EmbeddingCache(max_size=10, ttl_seconds=0.01)
+        cache.put("a", 1)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["size"], 0)
+
+
+class TestQueryEncoding(unittest.TestCase):
+
+    def setUp(self):
+        get_embedding_cache().clear()
+
+    def test_normalized_query_hits_cache(self):
+        """Case/whitespace variants of a query should reuse one embedding call"""
+        mock_pc = make_mock_pc()
+        first = embed_query(mock_pc, Config.EMBEDDING_MODEL_DENSE, "Can my dog run loose?")
+        second = embed_query(mock_pc, Config.EMBEDDING_MODEL_DENSE, "  can my DOG run   loose? ")
+
+        self.assertEqual(first, second)
+        self.assertEqual(mock_pc.inference.embed.call_count, 1)
+        stats = get_embedding_cache().stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_hybrid_encoding_returns_dense_and_sparse(self):
+        mock_pc = make_mock_pc()
+        dense, sparse = encode_query_hybrid(mock_pc, "dogs")
+
+        self.assertEqual(dense, [0.1, 0.2, 0.3])
+        self.assertEqual(sparse, {"indices": [1, 7], "values": [0.5, 0.2]})
+        self.assertEqual(mock_pc.inference.embed.call_count, 2)
+
+    def test_hybrid_encoding_propagates_errors(self):
+        mock_pc = MagicMock()
+        mock_pc.inference.embed.side_effect = RuntimeError("inference down")
+        with self.assertRaises(RuntimeError):
+            encode_query_hybrid(mock_pc, "dogs")
+
+
+if __name__ == "__main__":
+    unittest.main()
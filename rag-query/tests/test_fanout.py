@@ -0,0 +1,90 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from config import Config
+
+from encoding import get_embedding_cache
+from fanout import fan_out
+from retrieval import run_query_for_each_location
+
+
+class TestFanOut(unittest.TestCase):
+
+    def test_results_keep_input_order(self):
+        """Results should come back in submission order, not completion order"""
+        def worker(n):
+            time.sleep(0.01 * (5 - n))  # later items finish first
+            return n * 10
+
+        results = fan_out(list(range(5)), worker, max_workers=5)
+        self.assertEqual([r for r, _ in results], [0, 10, 20, 30, 40])
+
+    def test_failures_are_isolated(self):
+        """A failing item should not cancel the other items"""
+        def worker(n):
+            if n == 2:
+                raise RuntimeError("boom")
+            return n
+
+        results = fan_out([1, 2, 3], worker, max_workers=3)
+        self.assertEqual(results[0], (1, None))
+        self.assertIsNone(results[1][0])
+        self.assertIsInstance(results[1][1], RuntimeError)
+        self.assertEqual(results[2], (3, None))
+
+    def test_max_in_flight_is_bounded(self):
+        """No more than max_workers calls should run at once"""
+        lock = threading.Lock()
+        state = {"running": 0, "peak": 0}
+
+        def worker(n):
+            with lock:
+                state["running"] += 1
+                state["peak"] = max(state["peak"], state["running"])
+            time.sleep(0.01)
+            with lock:
+                state["running"] -= 1
+            return n
+
+        fan_out(list(range(20)), worker, max_workers=3)
+        self.assertLessEqual(state["peak"], 3)
+
+    def test_empty_input(self):
+        self.assertEqual(fan_out([], lambda x: x), [])
+
+
+class TestRunQueryForEachLocation(unittest.TestCase):
+
+    def setUp(self):
+        get_embedding_cache().clear()
+
+    @patch.object(Config, "GROUPED_COUNTY_QUERIES", False)
+    def test_failed_location_is_skipped(self):
+        """One failing county should not drop the other counties' matches"""
+        mock_pc = MagicMock()
+        mock_pc.inference.embed.return_value = [{"values": [0.1] * 4}]
+        mock_index = MagicMock()
+
+        def query(**kwargs):
+            county = kwargs["filter"]["county"]["$in"][0]
+            if county == "bad-county":
+                raise RuntimeError("timeout")
+            return {"matches": [{"id": county}]}
+
+        mock_index.query.side_effect = query
+        filters = {
+            "locations": [
+                {"state": "ca", "county": "alameda-county"},
+                {"state": "ca", "county": "bad-county"},
+                {"state": "ca", "county": "butte-county"},
+            ]
+        }
+
+        chunks = run_query_for_each_location(mock_pc, mock_index, "dogs", filters, False)
+        self.assertEqual([c["id"] for c in chunks], ["alameda-county", "butte-county"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from filter_search import FilterCatalog, build_catalog, match_cursor
+
+
+class TestFilterCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        source = os.path.join(self.tmp.name, "chunks.parquet")
+        catalog = os.path.join(self.tmp.name, "catalog.parquet")
+        table = pa.table({
+            "state": ["ga", "ca", "ca", "ca", "ca", "nv"],
+            "county": ["fulton-county", "alameda-county", "butte-county", "alameda-county", "alameda-county",
+                       "washoe-county"],
+            "penalty": ["Y", "Y", "N", "N", "Y", "N"],
+            "wc": [50, 120, 300, 450, 90, 70],
+            "chunk_text": ["f", "a0", "b0", "a1", "a2", "w"],
+        })
+        pq.write_table(table, source)
+        build_catalog(source, catalog)
+        self.catalog = FilterCatalog(catalog)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_location_pairs_and_flags(self):
+        filters = {"locations": [{"state": "ca", "county": ["alameda-county"]}], "penalty": "Y"}
+        page = self.catalog.search(filters, page_size=10)
+
+        self.assertEqual([m["metadata"]["chunk_text"] for m in page["matches"]], ["a0", "a2"])
+        self.assertEqual(page["matches"][0]["id"], "alameda-county#chunk1")
+        self.assertIsNone(page["next_cursor"])
+
+    def test_numeric_range(self):
+        filters = {"wc": {"min": 100, "max": 400}}
+        self.assertEqual(self.catalog.count(filters), 2)
+
+    def test_cursor_pagination_covers_all_matches(self):
+        seen = []
+        cursor = None
+        while True:
+            page = self.catalog.search({}, cursor=cursor, page_size=2)
+            seen.extend(m["id"] for m in page["matches"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(len(set(seen)), 6)
+
+    def test_cursor_resumes_after_the_last_key(self):
+        first = self.catalog.search({}, page_size=2)
+        self.assertEqual([m["id"] for m in first["matches"]], ["alameda-county#chunk1", "alameda-county#chunk3"])
+
+        # Keyset cursors skip by sort key, so a row sorting before the cursor does not shift the next page
+        rest = self.catalog.search({}, cursor=first["next_cursor"], page_size=10)
+        self.assertEqual(
+            [m["id"] for m in rest["matches"]],
+            ["alameda-county#chunk4", "butte-county#chunk2", "fulton-county#chunk0", "washoe-county#chunk5"]
+        )
+
+    def test_without_text(self):
+        page = self.catalog.search({"penalty": "N"}, page_size=10, with_text=False)
+
+        self.assertEqual(len(page["matches"]), 3)
+        self.assertTrue(all("chunk_text" not in m["metadata"] for m in page["matches"]))
+        self.assertEqual(page["matches"][0]["metadata"]["county"], "alameda-county")
+
+    def test_facets(self):
+        facets = self.catalog.facets({"locations": [{"state": "ca", "county": ["alameda-county", "butte-county"]}]})
+
+        self.assertEqual(facets["total"], 4)
+        self.assertEqual(facets["county"], {"ca": {"alameda-county": 3, "butte-county": 1}})
+        self.assertEqual(facets["penalty"], {"Y": 2, "N": 2})
+
+    def test_county_facets_are_per_state(self):
+        source = os.path.join(self.tmp.name, "twins.parquet")
+        catalog = os.path.join(self.tmp.name, "twins_catalog.parquet")
+        pq.write_table(pa.table({
+            "state": ["ca", "nv", "nv"],
+            "county": ["lake-county", "lake-county", "lake-county"],
+            "chunk_text": ["c", "n0", "n1"],
+        }), source)
+        build_catalog(source, catalog)
+
+        facets = FilterCatalog(catalog).facets({})
+
+        self.assertEqual(facets["state"], {"ca": 1, "nv": 2})
+        self.assertEqual(facets["county"], {"ca": {"lake-county": 1}, "nv": {"lake-county": 2}})
+
+    def test_match_cursor_continues_after_a_match(self):
+        first = self.catalog.search({}, page_size=2)
+
+        self.assertEqual(match_cursor(first["matches"][-1]), first["next_cursor"])
+
+    def test_directory_catalog_is_rejected(self):
+        """Keyset cursors need the single sorted file build_catalog writes"""
+        with self.assertRaises(ValueError):
+            FilterCatalog(self.tmp.name)
+
+
+if __name__ == "__main__":
+    unittest.main()
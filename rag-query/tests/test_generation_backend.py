@@ -0,0 +1,100 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from config import Config
+from fanout import fan_out
+from llm_generation import (
+    InProcessBackend,
+    OpenAICompatibleBackend,
+    build_answer_messages,
+    create_generation_backend,
+    generate_llm_response,
+    generate_llm_response_filter_only_search,
+    stream_llm_response
+)
+from tests.openai_stub import StubCompletionServer
+
+
+@patch.object(Config, "MAX_NEW_TOKENS", 64)
+@patch.object(Config, "DO_SAMPLE", False)
+class TestOpenAICompatibleBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubCompletionServer().start()
+        self.backend = OpenAICompatibleBackend(
+            tokenizer=None, base_url=self.server.base_url, model_name="llama-8b", api_key="", pool_size=4
+        )
+        self.messages = build_answer_messages("Do dogs need a leash?", "[Chunk 1] Dogs must be leashed.")
+
+    def tearDown(self):
+        self.backend.close()
+        self.server.stop()
+
+    def test_generate_sends_chat_request(self):
+        reply = generate_llm_response("Do dogs need a leash?", "[Chunk 1] Dogs must be leashed.", self.backend)
+
+        self.assertTrue(reply.startswith("stub answer:"))
+        body = self.server.requests[-1]
+        self.assertEqual(body["model"], "llama-8b")
+        self.assertEqual(body["messages"], self.messages)
+        self.assertEqual((body["max_tokens"], body["temperature"], body["stream"]), (64, 0.0, False))
+
+    def test_stream_matches_generate(self):
+        """Streamed pieces arrive one by one and join to the non-streamed reply"""
+        pieces = list(stream_llm_response("Do dogs need a leash?", "[Chunk 1] Dogs must be leashed.", self.backend))
+
+        self.assertGreater(len(pieces), 3)
+        self.assertEqual("".join(pieces), self.backend.generate(self.messages))
+        self.assertTrue(self.server.requests[0]["stream"])
+
+    def test_sequential_requests_reuse_one_connection(self):
+        for _ in range(3):
+            self.backend.generate(self.messages)
+            list(self.backend.stream(self.messages))
+
+        self.assertEqual(len(self.server.requests), 6)
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_concurrent_requests_stay_within_the_pool(self):
+        results = fan_out([self.messages] * 16, self.backend.generate, max_workers=4)
+
+        self.assertTrue(all(error is None for _, error in results))
+        self.assertLessEqual(len(self.server.connections), 4)
+
+    def test_server_error_is_raised(self):
+        self.server.fail_next = True
+        with self.assertRaises(requests.HTTPError):
+            self.backend.generate(self.messages)
+
+    def test_filter_only_response_keeps_preamble(self):
+        reply = generate_llm_response_filter_only_search("", "[Chunk 1] permit", self.backend, 7)
+        self.assertTrue(reply.startswith("Found 7 laws matching your filters."))
+        self.assertIn("stub answer:", reply)
+
+
+class TestCreateGenerationBackend(unittest.TestCase):
+
+    @patch.object(Config, "GENERATION_BACKEND", "local")
+    def test_local(self):
+        backend = create_generation_backend("tokenizer", "model")
+        self.assertIsInstance(backend, InProcessBackend)
+        self.assertEqual((backend.tokenizer, backend.model), ("tokenizer", "model"))
+
+    @patch.object(Config, "GENERATION_BACKEND", "openai")
+    @patch.object(Config, "GENERATION_API_KEY", "secret")
+    def test_openai(self):
+        backend = create_generation_backend("tokenizer")
+        self.assertIsInstance(backend, OpenAICompatibleBackend)
+        self.assertIsNone(backend.model)
+        self.assertEqual(backend.session.headers["Authorization"], "Bearer secret")
+
+    @patch.object(Config, "GENERATION_BACKEND", "tgi")
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            create_generation_backend(MagicMock())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from config import Config
+from generation_cache import GenerationCache
+from llm_generation import build_answer_messages, generate_from_messages
+from tests.test_llm_generation import tiny_chat_lm
+
+PARAMS = {'max_new_tokens': 16, 'do_sample': False, 'terminators': [2]}
+
+
+class TestGenerationCache(unittest.TestCase):
+
+    def test_key_covers_prompt_and_params(self):
+        cache = GenerationCache(max_entries=10, model_id="m")
+        cache.put([1, 2, 3], PARAMS, [7, 8])
+
+        self.assertEqual(cache.get([1, 2, 3], PARAMS), [7, 8])
+        self.assertIsNone(cache.get([1, 2, 4], PARAMS))
+        self.assertIsNone(cache.get([1, 2, 3], {**PARAMS, 'max_new_tokens': 32}))
+        self.assertIsNone(GenerationCache(max_entries=10, model_id="other").get([1, 2, 3], PARAMS))
+
+    def test_bypassed_when_sampling(self):
+        cache = GenerationCache(max_entries=10, model_id="m")
+        sampling = {**PARAMS, 'do_sample': True}
+        cache.put([1, 2, 3], sampling, [7, 8])
+
+        self.assertIsNone(cache.get([1, 2, 3], sampling))
+        self.assertEqual(cache.stats()["size"], 0)
+        self.assertEqual((cache.stats()["bypassed"], cache.stats()["misses"]), (1, 0))
+
+    def test_persists_across_instances_with_lru_limit(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "generations.sqlite")
+            cache = GenerationCache(max_entries=2, persist_path=path, model_id="m")
+            cache.put([1], PARAMS, [10, 11])
+            cache.put([2], PARAMS, [20])
+            cache.get([1], PARAMS)  # [2] is now least recently used on disk too
+            cache.put([3], PARAMS, [30])
+
+            reopened = GenerationCache(max_entries=2, persist_path=path, model_id="m")
+            self.assertEqual(reopened.get([1], PARAMS), [10, 11])
+            self.assertIsNone(reopened.get([2], PARAMS))
+            self.assertEqual(reopened.get([3], PARAMS), [30])
+            cache.store.close()
+            reopened.store.close()
+
+    def test_persisted_entries_miss_after_a_quantization_change(self):
+        """A persistent cache does not serve answers from the previous load settings"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "generations.sqlite")
+            cache = GenerationCache(max_entries=10, persist_path=path, model_id="m")
+            cache.put([1], PARAMS, [10])
+
+            with patch.object(Config, "BNB_4BIT_QUANT_TYPE", "fp4"):
+                requantized = GenerationCache(max_entries=10, persist_path=path, model_id="m")
+            with patch.object(Config, "ASSISTED_GENERATION_ENABLED", not Config.ASSISTED_GENERATION_ENABLED):
+                assisted = GenerationCache(max_entries=10, persist_path=path, model_id="m")
+
+            self.assertIsNone(requantized.get([1], PARAMS))
+            self.assertIsNone(assisted.get([1], PARAMS))
+            unchanged = GenerationCache(max_entries=10, persist_path=path, model_id="m")
+            self.assertEqual(unchanged.get([1], PARAMS), [10])
+            for opened in (cache, requantized, assisted, unchanged):
+                opened.store.close()
+
+
+@patch.object(Config, "MAX_NEW_TOKENS", 8)
+class TestCachedGeneration(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with tempfile.TemporaryDirectory() as tmp:
+            cls.tokenizer, cls.model = tiny_chat_lm(tmp)
+        cls.model.config.name_or_path = "tiny-llama"
+        cls.messages = build_answer_messages("dogs must be on a leash ?", "[Chunk 1] the law says dogs")
+
+    def generate_twice(self, cache):
+        with patch("generation_cache.get_generation_cache", return_value=cache), \
+                patch.object(self.model, "generate", wraps=self.model.generate) as generate:
+            first = generate_from_messages(self.messages, self.tokenizer, self.model)
+            second = generate_from_messages(self.messages, self.tokenizer, self.model)
+        return first, second, generate.call_count
+
+    @patch.object(Config, "DO_SAMPLE", False)
+    def test_repeated_prompt_skips_the_model(self):
+        cache = GenerationCache(max_entries=10, model_id="tiny-llama")
+        first, second, calls = self.generate_twice(cache)
+
+        self.assertEqual(first, second)
+        self.assertEqual(calls, 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    @patch.object(Config, "DO_SAMPLE", True)
+    def test_sampling_always_runs_the_model(self):
+        cache = GenerationCache(max_entries=10, model_id="tiny-llama")
+        _, _, calls = self.generate_twice(cache)
+
+        self.assertEqual(calls, 2)
+        self.assertEqual(cache.stats()["bypassed"], 2)
+
+    @patch.object(Config, "DO_SAMPLE", False)
+    def test_cache_of_another_model_is_not_used(self):
+        cache = GenerationCache(max_entries=10, model_id=Config.LLM_MODEL_ID)
+        _, _, calls = self.generate_twice(cache)
+        self.assertEqual(calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
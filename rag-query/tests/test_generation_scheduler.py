@@ -0,0 +1,196 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+import torch
+from transformers import LlamaConfig, LlamaForCausalLM
+
+from fanout import fan_out
+from generation_scheduler import GenerationScheduler, generate_batch
+
+PAD_ID = 0
+PROMPTS = [[5, 6, 7, 8, 9, 10], [11, 12, 13], [20, 21, 22, 23], [30]]
+
+
+def tiny_causal_lm():
+    """A randomly initialized two-layer Llama (CPU, no download)."""
+    torch.manual_seed(0)
+    config = LlamaConfig(
+        vocab_size=64, hidden_size=32, intermediate_size=64, num_hidden_layers=2,
+        num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=128
+    )
+    return LlamaForCausalLM(config).eval()
+
+
+def tiny_draft_lm():
+    """A smaller random Llama over the same vocabulary, standing in for the draft model."""
+    torch.manual_seed(1)
+    config = LlamaConfig(
+        vocab_size=64, hidden_size=16, intermediate_size=32, num_hidden_layers=1,
+        num_attention_heads=2, num_key_value_heads=1, max_position_embeddings=128
+    )
+    draft = LlamaForCausalLM(config).eval()
+    draft.generation_config.num_assistant_tokens = 3
+    return draft
+
+
+def stub_tokenizer(eos_token_id):
+    tokenizer = MagicMock()
+    tokenizer.eos_token_id = eos_token_id
+    tokenizer.pad_token_id = None
+    tokenizer.unk_token_id = None
+    tokenizer.convert_tokens_to_ids.return_value = None  # No <|eot_id|> in this vocabulary
+    return tokenizer
+
+
+class WordTokenizer:
+    """Decodes token N as 'tN ' so streamed text maps back to token IDs."""
+
+    pad_token_id = None
+    unk_token_id = None
+
+    def __init__(self, eos_token_id):
+        self.eos_token_id = eos_token_id
+
+    def convert_tokens_to_ids(self, token):
+        return None
+
+    def decode(self, ids, skip_special_tokens=False):
+        return "".join(f"t{token} " for token in ids)
+
+
+class TestGenerationScheduler(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.model = tiny_causal_lm()
+
+    def unbatched(self, prompt, terminators, max_new_tokens=8):
+        return generate_batch(self.model, [prompt], PAD_ID, terminators, max_new_tokens, False)[0]
+
+    def test_left_padded_batch_matches_single_prompts(self):
+        """Greedy outputs do not change when prompts of different lengths share a batch"""
+        expected = [self.unbatched(prompt, [PAD_ID]) for prompt in PROMPTS]
+        batched = generate_batch(self.model, PROMPTS, PAD_ID, [PAD_ID], 8, False)
+        self.assertEqual(batched, expected)
+
+    def test_sequences_stop_independently(self):
+        """A sequence that emits a terminator ends there while the others keep going"""
+        free_running = self.unbatched(PROMPTS[0], [PAD_ID])
+        terminator = free_running[2]
+
+        batched = generate_batch(self.model, PROMPTS[:2], PAD_ID, [terminator], 8, False)
+
+        self.assertEqual(batched[0], free_running[:free_running.index(terminator)])
+        self.assertEqual(batched[1], self.unbatched(PROMPTS[1], [terminator]))
+
+    def test_concurrent_requests_share_one_generate_call(self):
+        """Prompts arriving within the window are generated together and split back"""
+        scheduler = GenerationScheduler(stub_tokenizer(PAD_ID), self.model, max_batch_size=8, max_wait_ms=300)
+        expected = [self.unbatched(prompt, [PAD_ID], max_new_tokens=6) for prompt in PROMPTS]
+
+        results = fan_out(PROMPTS, lambda prompt: scheduler.generate(prompt, max_new_tokens=6, do_sample=False),
+                          max_workers=4)
+        scheduler.close()
+
+        self.assertEqual([response for response, _ in results], expected)
+        stats = scheduler.stats()
+        self.assertEqual((stats["requests"], stats["batches"]), (4, 1))
+        self.assertEqual(stats["generated_tokens"], sum(len(r) for r in expected))
+
+    def test_batch_stops_at_max_size(self):
+        scheduler = GenerationScheduler(stub_tokenizer(PAD_ID), self.model, max_batch_size=2, max_wait_ms=300)
+        futures = [scheduler.submit(prompt, max_new_tokens=4, do_sample=False) for prompt in PROMPTS]
+        for future in futures:
+            future.result(timeout=30)
+        scheduler.close()
+
+        self.assertEqual(scheduler.stats()["batches"], 2)
+
+    def test_streamed_and_plain_prompts_share_a_batch(self):
+        """Each streaming caller receives only its own row's text"""
+        tokenizer = WordTokenizer(PAD_ID)
+        scheduler = GenerationScheduler(tokenizer, self.model, max_batch_size=8, max_wait_ms=300)
+        expected = [self.unbatched(prompt, [PAD_ID], max_new_tokens=6) for prompt in PROMPTS[:3]]
+        streams = [[], [], None]
+
+        futures = [
+            scheduler.submit(prompt, max_new_tokens=6, do_sample=False,
+                             on_text=pieces.append if pieces is not None else None)
+            for prompt, pieces in zip(PROMPTS, streams)
+        ]
+        responses = [future.result(timeout=30) for future in futures]
+        scheduler.close()
+
+        self.assertEqual(responses, expected)
+        for pieces, response in zip(streams[:2], responses):
+            self.assertEqual("".join(pieces), tokenizer.decode(response))
+        stats = scheduler.stats()
+        self.assertEqual((stats["batches"], stats["streamed_requests"]), (1, 2))
+
+    def test_stop_event_ends_one_row_early(self):
+        """A caller that goes away stops its row; the rest of the batch decodes in full"""
+        tokenizer = WordTokenizer(63)  # Never generated here, so rows run to max_new_tokens
+        scheduler = GenerationScheduler(tokenizer, self.model, max_batch_size=8, max_wait_ms=300)
+        stop = threading.Event()
+
+        stopped = scheduler.submit(PROMPTS[0], max_new_tokens=40, do_sample=False,
+                                   on_text=lambda text: stop.set(), stop_event=stop)
+        full = scheduler.submit(PROMPTS[1], max_new_tokens=40, do_sample=False)
+        stopped_response, full_response = stopped.result(timeout=30), full.result(timeout=30)
+        scheduler.close()
+
+        self.assertLess(len(stopped_response), 5)
+        self.assertEqual(len(full_response), 40)
+        self.assertEqual(scheduler.stats()["stopped_requests"], 1)
+
+    def test_model_error_reaches_every_caller(self):
+        model = MagicMock(device="cpu")
+        model.generate.side_effect = RuntimeError("CUDA out of memory")
+        scheduler = GenerationScheduler(stub_tokenizer(PAD_ID), model, max_batch_size=4, max_wait_ms=300)
+
+        futures = [scheduler.submit(prompt) for prompt in PROMPTS[:2]]
+        scheduler.close()
+
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result(timeout=5)
+
+
+class TestAssistedGeneration(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.model = tiny_causal_lm()
+        cls.draft = tiny_draft_lm()
+
+    def test_greedy_output_unchanged_by_the_draft(self):
+        """The LLM verifies every draft token, so greedy decoding gives the same tokens"""
+        for prompt in PROMPTS:
+            plain = generate_batch(self.model, [prompt], PAD_ID, [PAD_ID], 12, False)
+            assisted = generate_batch(self.model, [prompt], PAD_ID, [PAD_ID], 12, False, assistant_model=self.draft)
+            self.assertEqual(assisted, plain)
+
+    def test_rejects_batches(self):
+        with self.assertRaises(ValueError):
+            generate_batch(self.model, PROMPTS[:2], PAD_ID, [PAD_ID], 4, False, assistant_model=self.draft)
+
+    def test_scheduler_uses_the_draft_for_lone_prompts_only(self):
+        scheduler = GenerationScheduler(
+            stub_tokenizer(PAD_ID), self.model, max_batch_size=8, max_wait_ms=300, assistant_model=self.draft
+        )
+        expected = [generate_batch(self.model, [prompt], PAD_ID, [PAD_ID], 6, False)[0] for prompt in PROMPTS]
+
+        lone = scheduler.generate(PROMPTS[0], max_new_tokens=6, do_sample=False)
+        results = fan_out(PROMPTS, lambda prompt: scheduler.generate(prompt, max_new_tokens=6, do_sample=False),
+                          max_workers=4)
+        scheduler.close()
+
+        self.assertEqual(lone, expected[0])
+        self.assertEqual([response for response, _ in results], expected)
+        stats = scheduler.stats()
+        self.assertEqual((stats["requests"], stats["batches"], stats["assisted_requests"]), (5, 2, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
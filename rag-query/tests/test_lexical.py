@@ -0,0 +1,82 @@
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from config import Config
+from lexical import bm25_scores, shortlist_candidates
+
+
+def make_match(chunk_id, text):
+    return {"id": chunk_id, "metadata": {"chunk_text": text}}
+
+
+class TestBM25Scores(unittest.TestCase):
+
+    def test_matches_reference_formula(self):
+        """Vectorized scores equal a direct per-term BM25 computation"""
+        texts = ["dogs must be leashed", "dogs dogs in parks", "fence height limits", ""]
+        query = "Dogs parks"
+        k1, b = 1.2, 0.75
+
+        docs = [t.split() for t in texts]
+        avg = sum(len(d) for d in docs) / len(docs)
+        expected = []
+        for doc in docs:
+            score = 0.0
+            for term in ["dogs", "parks"]:
+                df = sum(term in d for d in docs)
+                idf = np.log1p((len(docs) - df + 0.5) / (df + 0.5))
+                tf = doc.count(term)
+                score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(doc) / avg))
+            expected.append(score)
+
+        np.testing.assert_allclose(bm25_scores(query, texts, k1, b), expected)
+
+    def test_empty_inputs(self):
+        self.assertEqual(len(bm25_scores("dogs", [])), 0)
+        np.testing.assert_array_equal(bm25_scores("", ["dogs"]), [0.0])
+
+
+class TestShortlistCandidates(unittest.TestCase):
+
+    def test_keeps_lexical_best_in_retrieval_order(self):
+        """The shortlist holds the BM25 winners, ordered as retrieved"""
+        matches = [
+            make_match("a", "fence height limits"),
+            make_match("b", "dogs must be on a leash"),
+            make_match("c", "parking rules"),
+            make_match("d", "leash laws for dogs in parks"),
+        ]
+
+        shortlisted = shortlist_candidates("dogs leash parks", matches, size=2, retrieval_keep=0)
+
+        self.assertEqual([m["id"] for m in shortlisted], ["b", "d"])
+
+    def test_retrieval_leaders_are_always_kept(self):
+        """A paraphrase with no query terms survives when it leads on retrieval score"""
+        matches = [
+            make_match("a", "canines require a tether in public"),
+            make_match("b", "fence height limits"),
+            make_match("c", "dogs must be on a leash"),
+            make_match("d", "leash laws for dogs in parks"),
+        ]
+
+        shortlisted = shortlist_candidates("dogs leash parks", matches, size=2, retrieval_keep=1)
+
+        self.assertEqual([m["id"] for m in shortlisted], ["a", "d"])
+
+    @patch.object(Config, "CASCADE_SHORTLIST_SIZE", 5)
+    def test_short_lists_pass_through(self):
+        matches = [make_match("a", "x"), make_match("b", "y")]
+        self.assertIs(shortlist_candidates("dogs", matches), matches)
+
+    def test_no_overlap_falls_back_to_retrieval_order(self):
+        matches = [make_match(str(i), "unrelated text") for i in range(5)]
+        self.assertEqual(
+            [m["id"] for m in shortlist_candidates("dogs", matches, size=3, retrieval_keep=1)], ["0", "1", "2"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
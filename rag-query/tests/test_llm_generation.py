@@ -0,0 +1,118 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+import torch
+
+from config import Config
+from llm_generation import (
+    InProcessBackend,
+    build_answer_messages,
+    encode_chat,
+    generate_from_messages,
+    stream_from_messages,
+    stream_llm_response_filter_only_search
+)
+
+CHAT_TEMPLATE = (
+    "[CLS]{% for message in messages %} {{ message['role'] }} : {{ message['content'] }} [SEP]{% endfor %}"
+    "{% if add_generation_prompt %} assistant :{% endif %}"
+)
+
+
+def tiny_chat_lm(path):
+    """A toy-vocabulary tokenizer with a chat template and a random two-layer Llama (CPU, no download)."""
+    from transformers import BertTokenizerFast, LlamaConfig, LlamaForCausalLM
+
+    words = (
+        "system user assistant : dogs must be on a leash in public parks permit required for fences "
+        "taller than six feet question retrieved chunks the law says owners county state section"
+    ).split()
+    vocab_file = os.path.join(path, "vocab.txt")
+    with open(vocab_file, "w") as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + words))
+
+    tokenizer = BertTokenizerFast(vocab_file, eos_token="[SEP]")
+    tokenizer.chat_template = CHAT_TEMPLATE
+
+    torch.manual_seed(0)
+    config = LlamaConfig(
+        vocab_size=len(words) + 5, hidden_size=32, intermediate_size=64, num_hidden_layers=2,
+        num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=512
+    )
+    return tokenizer, LlamaForCausalLM(config).eval()
+
+
+@patch.object(Config, "MAX_NEW_TOKENS", 12)
+@patch.object(Config, "DO_SAMPLE", False)
+class TestStreaming(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with tempfile.TemporaryDirectory() as tmp:
+            cls.tokenizer, cls.model = tiny_chat_lm(tmp)
+        cls.messages = build_answer_messages("dogs must be on a leash ?", "[Chunk 1] the law says dogs")
+
+    def test_encode_chat_adds_no_extra_special_tokens(self):
+        prompt_ids = encode_chat(self.tokenizer, self.messages)
+        self.assertEqual(prompt_ids.count(self.tokenizer.cls_token_id), 1)
+        self.assertEqual(prompt_ids[0], self.tokenizer.cls_token_id)
+
+    def test_streamed_pieces_join_to_the_full_response(self):
+        """Streaming yields several pieces that add up to the non-streamed answer"""
+        expected = generate_from_messages(self.messages, self.tokenizer, self.model)
+        pieces = list(stream_from_messages(self.messages, self.tokenizer, self.model))
+
+        self.assertGreater(len(pieces), 1)
+        self.assertEqual("".join(pieces).strip(), expected.strip())
+
+    def test_assisted_stream_matches_plain_generation(self):
+        """A draft model changes the speed of greedy decoding, not the answer"""
+        from transformers import LlamaConfig, LlamaForCausalLM
+
+        torch.manual_seed(1)
+        draft = LlamaForCausalLM(LlamaConfig(
+            vocab_size=self.model.config.vocab_size, hidden_size=16, intermediate_size=32, num_hidden_layers=1,
+            num_attention_heads=2, num_key_value_heads=1, max_position_embeddings=512
+        )).eval()
+        backend = InProcessBackend(self.tokenizer, self.model, assistant_model=draft)
+
+        expected = generate_from_messages(self.messages, self.tokenizer, self.model)
+        self.assertEqual("".join(backend.stream(self.messages)).strip(), expected.strip())
+
+    def test_filter_only_stream_starts_with_the_preamble(self):
+        backend = InProcessBackend(self.tokenizer, self.model)
+        pieces = stream_llm_response_filter_only_search("[Chunk 1] permit", backend, 42)
+        self.assertTrue(next(pieces).startswith("Found 42 laws matching your filters."))
+        list(pieces)
+
+    @patch.object(Config, "MAX_NEW_TOKENS", 400)
+    def test_closing_the_stream_stops_decoding(self):
+        """A client that disconnects stops generate instead of leaving it to run to MAX_NEW_TOKENS"""
+        forward_calls = []
+        hook = self.model.register_forward_hook(lambda *args: forward_calls.append(1))
+        try:
+            pieces = stream_from_messages(self.messages, self.tokenizer, self.model)
+            next(pieces)
+            pieces.close()
+            for thread in threading.enumerate():
+                if thread.name == "llm-stream":
+                    thread.join(timeout=30)
+        finally:
+            hook.remove()
+
+        self.assertLess(len(forward_calls), 100)
+
+    def test_generation_error_reaches_the_consumer(self):
+        """A failure on the generate thread ends the stream and is re-raised"""
+        model = MagicMock(device="cpu")
+        model.generate.side_effect = RuntimeError("CUDA out of memory")
+
+        with self.assertRaises(RuntimeError):
+            list(stream_from_messages(self.messages, self.tokenizer, model))
+
+
+if __name__ == "__main__":
+    unittest.main()
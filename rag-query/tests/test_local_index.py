@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+from filters import build_pinecone_filter
+from local_index import LocalIndex, build_local_index_from_parquet
+
+
+class TestLocalIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        metadata = pd.DataFrame({
+            "state": ["ca", "ca", "ga", "ca"],
+            "county": ["alameda-county", "butte-county", "fulton-county", "alameda-county"],
+            "penalty": ["Y", "N", "Y", "N"],
+            "wc": [120, 300, 80, 450],
+            "chunk_text": ["a", "b", "c", "d"],
+        })
+        self.index = LocalIndex.build(
+            self.tmp.name,
+            ids=["a0", "b0", "f0", "a1"],
+            dense_embeddings=[[1.0, 0.0], [0.8, 0.2], [0.0, 1.0], [0.5, 0.5]],
+            sparse_embeddings=[
+                {"indices": [10], "values": [1.0]},
+                {"indices": [], "values": []},
+                {"indices": [10, 20], "values": [0.5, 2.0]},
+                {"indices": [20], "values": [3.0]},
+            ],
+            metadata=metadata,
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_dense_query_ranks_by_dot_product(self):
+        response = self.index.query(namespace="__default__", top_k=2, vector=[1.0, 0.0])
+        self.assertEqual([m["id"] for m in response["matches"]], ["a0", "b0"])
+        self.assertAlmostEqual(response["matches"][0]["score"], 1.0)
+
+    def test_hybrid_score_adds_sparse_dot_product(self):
+        response = self.index.query(
+            top_k=4, vector=[0.0, 0.0], sparse_vector={"indices": [20, 10], "values": [1.0, 2.0]}
+        )
+        scores = {m["id"]: m["score"] for m in response["matches"]}
+        self.assertAlmostEqual(scores["a0"], 2.0)
+        self.assertAlmostEqual(scores["f0"], 3.0)
+        self.assertAlmostEqual(scores["a1"], 3.0)
+        self.assertAlmostEqual(scores["b0"], 0.0)
+
+    def test_filter_subset_from_build_pinecone_filter(self):
+        """Filters produced by build_pinecone_filter should be honoured"""
+        pinecone_filter = build_pinecone_filter({
+            "state": ["ca"],
+            "county": ["alameda-county"],
+            "wc": {"min": 100, "max": 200},
+        })
+        response = self.index.query(top_k=10, vector=[1.0, 1.0], filter=pinecone_filter, include_metadata=True)
+
+        self.assertEqual([m["id"] for m in response["matches"]], ["a0"])
+        self.assertEqual(response["matches"][0]["metadata"]["county"], "alameda-county")
+
+    def test_reload_from_disk(self):
+        reloaded = LocalIndex(self.tmp.name)
+        self.assertEqual(reloaded.describe_index_stats()["total_vector_count"], 4)
+        response = reloaded.query(top_k=1, vector=[0.0, 1.0], filter={"penalty": {"$eq": "Y"}})
+        self.assertEqual(response["matches"][0]["id"], "f0")
+
+
+    def test_parquet_embeddings_and_ingestion_ids_and_metadata(self):
+        """Stored embeddings are reused, IDs count the full parquet and metadata is stringified"""
+        parquet = os.path.join(self.tmp.name, "chunks.parquet")
+        pd.DataFrame({
+            "state": ["ca", "ga", "ca"],
+            "county": ["alameda-county", "fulton-county", "butte-county"],
+            "wc": [120, 80, None],
+            "chunk_text": ["a", "f", "b"],
+            "dense_embedding": [[1.0, 0.0], [0.0, 1.0], [0.5, 0.5]],
+            "sparse_embedding": [{"indices": [3], "values": [1.0]}] * 3,
+        }).astype({"wc": "Int64"}).to_parquet(parquet)
+
+        with patch("local_index.embed_passages") as embed_passages:
+            index = build_local_index_from_parquet(parquet, os.path.join(self.tmp.name, "ga"), states=["ga"])
+        embed_passages.assert_not_called()
+
+        self.assertEqual(list(index.ids), ["fulton-county#chunk1"])
+        match = index.query(vector=[0.0, 1.0], top_k=1, include_metadata=True)["matches"][0]
+        self.assertEqual(match["metadata"], {"state": "ga", "county": "fulton-county", "wc": "80", "chunk_text": "f"})
+        self.assertEqual(index.metadata["wc"].tolist(), ["80"])
+
+    def test_missing_embeddings_need_opt_in(self):
+        parquet = os.path.join(self.tmp.name, "chunks.parquet")
+        pd.DataFrame({"state": ["ca"], "county": ["alameda-county"], "chunk_text": ["a"]}).to_parquet(parquet)
+
+        with self.assertRaises(ValueError):
+            build_local_index_from_parquet(parquet, os.path.join(self.tmp.name, "out"))
+
+    @patch("pinecone.Pinecone")
+    @patch("local_index.embed_passages")
+    def test_embed_missing_uses_pinecone_inference(self, embed_passages, _pinecone):
+        embed_passages.side_effect = lambda pc, model, texts: (
+            [[1.0, 0.0]] * len(texts) if "sparse" not in model else [{"indices": [], "values": []}] * len(texts)
+        )
+        parquet = os.path.join(self.tmp.name, "chunks.parquet")
+        pd.DataFrame({"state": ["ca"], "county": ["alameda-county"], "chunk_text": ["a"]}).to_parquet(parquet)
+
+        index = build_local_index_from_parquet(parquet, os.path.join(self.tmp.name, "out"), embed_missing=True)
+
+        self.assertEqual(embed_passages.call_count, 2)
+        self.assertEqual(list(index.ids), ["alameda-county#chunk0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
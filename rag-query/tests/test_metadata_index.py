@@ -0,0 +1,84 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from filters import build_pinecone_filter
+from metadata_index import MetadataIndex
+
+
+class TestMetadataIndex(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n = 500
+        self.df = pd.DataFrame({
+            "state": rng.choice(["ca", "ga", "fl"], n),
+            "county": rng.choice([f"county-{i}" for i in range(60)], n),
+            "penalty": rng.choice(["Y", "N"], n),
+            "prohibition": rng.choice(["Y", "N"], n),
+            "fk_grade": rng.uniform(0, 30, n).round(1),
+            "wc": rng.integers(10, 800, n),
+            "section": rng.choice(["1.01", "1.02", "2.10"], n),
+        })
+        self.index = MetadataIndex(self.df)
+
+    def brute_force(self, frontend_filters):
+        """Reference row-by-row evaluation of the frontend filters"""
+        mask = np.ones(len(self.df), dtype=bool)
+        for key, value in frontend_filters.items():
+            if isinstance(value, list):
+                mask &= self.df[key].isin(value).to_numpy()
+            elif isinstance(value, dict):
+                if value.get("min") is not None:
+                    mask &= (self.df[key] >= value["min"]).to_numpy()
+                if value.get("max") is not None:
+                    mask &= (self.df[key] <= value["max"]).to_numpy()
+            else:
+                mask &= (self.df[key] == value).to_numpy()
+        return np.flatnonzero(mask)
+
+    def test_matches_brute_force(self):
+        """Compiled bitmap evaluation should match row-by-row evaluation"""
+        cases = [
+            {},
+            {"state": ["ca"]},
+            {"state": ["ca", "fl"], "county": ["county-1", "county-7", "county-30"]},
+            {"penalty": "Y", "prohibition": "N"},
+            {"fk_grade": {"min": 5.0, "max": 12.5}},
+            {"wc": {"min": 100, "max": None}, "penalty": "N", "state": ["ga"]},
+        ]
+        for frontend_filters in cases:
+            with self.subTest(filters=frontend_filters):
+                rows = self.index.rows(build_pinecone_filter(frontend_filters))
+                np.testing.assert_array_equal(rows, self.brute_force(frontend_filters))
+
+    def test_rare_values_use_array_postings(self):
+        """Rare values are stored as row-id arrays, common values as bitsets"""
+        self.assertEqual(self.index.postings["penalty"]["Y"].dtype, np.uint8)
+        self.assertEqual(self.index.postings["county"]["county-1"].dtype, np.uint32)
+
+    def test_unknown_value_matches_nothing(self):
+        self.assertEqual(self.index.count({"county": {"$in": ["nowhere-county"]}}), 0)
+
+    def test_unindexed_column_is_scanned(self):
+        """Columns without postings (e.g. section) are filtered by a column scan"""
+        expected = np.flatnonzero((self.df["section"].isin(["1.02", "2.10"]) & (self.df["state"] == "ca")).to_numpy())
+        rows = self.index.rows({"section": {"$in": ["1.02", "2.10"]}, "state": {"$eq": "ca"}})
+        np.testing.assert_array_equal(rows, expected)
+
+        index = MetadataIndex(self.df, numeric_fields=[])
+        np.testing.assert_array_equal(
+            index.rows({"wc": {"$gte": 100, "$lte": 300}}), self.brute_force({"wc": {"min": 100, "max": 300}})
+        )
+
+    def test_missing_column_matches_nothing(self):
+        self.assertEqual(self.index.count({"no_such_field": {"$eq": "Y"}}), 0)
+
+    def test_unsupported_operator(self):
+        with self.assertRaises(ValueError):
+            self.index.compile({"state": {"$ne": "ca"}})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from onnx_reranker import OnnxCrossEncoder, export_onnx_reranker, resolve_activation
+
+HAS_ONNX = importlib.util.find_spec("onnxruntime") is not None and importlib.util.find_spec("onnx") is not None
+
+
+def save_tiny_cross_encoder(path):
+    """Save a randomly initialized single-label BERT cross-encoder with a toy vocabulary."""
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+    words = "dogs must be on a leash in public parks permit required for fences taller than six feet".split()
+    vocab_file = os.path.join(path, "vocab.txt")
+    os.makedirs(path, exist_ok=True)
+    with open(vocab_file, "w") as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + words))
+
+    BertTokenizerFast(vocab_file).save_pretrained(path)
+    config = BertConfig(
+        vocab_size=len(words) + 5, hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=64, max_position_embeddings=64, num_labels=1
+    )
+    BertForSequenceClassification(config).eval().save_pretrained(path)
+
+
+class TestResolveActivation(unittest.TestCase):
+
+    def test_matches_sentence_transformers_defaults(self):
+        """Stored activations win; otherwise single-label models use a sigmoid"""
+        self.assertEqual(resolve_activation({"num_labels": 1}), "sigmoid")
+        self.assertEqual(resolve_activation({"id2label": {"0": "a", "1": "b"}}), "identity")
+        self.assertEqual(
+            resolve_activation({"sentence_transformers": {"activation_fn": "torch.nn.modules.linear.Identity"}}),
+            "identity"
+        )
+        self.assertEqual(
+            resolve_activation({"sbert_ce_default_activation_function": "torch.nn.modules.activation.Sigmoid"}),
+            "sigmoid"
+        )
+
+
+@unittest.skipUnless(HAS_ONNX, "onnxruntime/onnx not installed")
+class TestOnnxCrossEncoder(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.source = os.path.join(cls.tmp.name, "source")
+        cls.exported = os.path.join(cls.tmp.name, "onnx")
+        save_tiny_cross_encoder(cls.source)
+        export_onnx_reranker(cls.source, cls.exported, quantize=True)
+
+        cls.pairs = [
+            ("dogs in parks", "dogs must be on a leash in public parks"),
+            ("fence permit", "permit required for fences taller than six feet"),
+            ("leash", "a leash"),
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_fp32_scores_match_pytorch_cross_encoder(self):
+        """The fp32 ONNX backend reproduces CrossEncoder.predict scores"""
+        from sentence_transformers.cross_encoder import CrossEncoder
+
+        reference = CrossEncoder(self.source, device="cpu").predict(self.pairs, batch_size=2)
+        scores = OnnxCrossEncoder(self.exported, quantized=False).predict(self.pairs, batch_size=2)
+
+        np.testing.assert_allclose(scores, reference, atol=1e-4)
+
+    def test_int8_model_scores_every_pair(self):
+        """The quantized model loads and returns one score per pair"""
+        scores = OnnxCrossEncoder(self.exported, quantized=True).predict(self.pairs, batch_size=2)
+
+        self.assertEqual(scores.shape, (3,))
+        self.assertTrue(np.all((scores >= 0) & (scores <= 1)))
+
+
+if __name__ == "__main__":
+    unittest.main()
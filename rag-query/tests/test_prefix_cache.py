@@ -0,0 +1,97 @@
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from config import Config
+from fanout import fan_out
+from generation_scheduler import GenerationScheduler, generate_batch
+from llm_generation import (
+    ANSWER_SYSTEM_PROMPT,
+    FILTER_ONLY_SYSTEM_PROMPT,
+    build_answer_messages,
+    build_filter_only_messages,
+    chat_prefix_ids,
+    encode_chat
+)
+from prefix_cache import PrefixKVCache
+from tests.test_llm_generation import tiny_chat_lm
+
+QUESTIONS = ["dogs must be on a leash ?", "permit required for fences taller than six feet ?", "owners ?"]
+CONTEXT = "[Chunk 1] the law says dogs must be on a leash in public parks"
+
+
+class TestPrefixKVCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with tempfile.TemporaryDirectory() as tmp:
+            cls.tokenizer, cls.model = tiny_chat_lm(tmp)
+        cls.terminators = [cls.tokenizer.eos_token_id]
+        cls.prompts = [
+            encode_chat(cls.tokenizer, build_answer_messages(question, CONTEXT)) for question in QUESTIONS
+        ]
+
+    def setUp(self):
+        self.cache = PrefixKVCache(self.model)
+        self.prefix = chat_prefix_ids(self.tokenizer, ANSWER_SYSTEM_PROMPT)
+        self.cache.register(self.prefix)
+
+    def generate(self, prompts, prefix_cache=None):
+        return generate_batch(
+            self.model, prompts, self.tokenizer.pad_token_id, self.terminators, 10, False,
+            prefix_cache=prefix_cache
+        )
+
+    def test_prefix_covers_the_system_turn(self):
+        """The prefix ends on a special token and every answer prompt starts with it"""
+        self.assertIn(self.prefix[-1], self.tokenizer.all_special_ids)
+        self.assertGreater(len(self.prefix), 20)
+        for prompt in self.prompts:
+            self.assertEqual(self.cache.match(prompt), tuple(self.prefix))
+
+    def test_outputs_identical_with_cached_prefix(self):
+        """Each prompt generates the same tokens with and without the prefix cache"""
+        for prompt in self.prompts:
+            self.assertEqual(self.generate([prompt], self.cache), self.generate([prompt]))
+
+        stats = self.cache.stats()
+        self.assertEqual(stats["hits"], len(self.prompts))
+        self.assertEqual(stats["prefill_tokens_saved"], len(self.prefix) * len(self.prompts))
+
+    def test_batched_outputs_identical_with_cached_prefix(self):
+        """Prompts of different lengths share one expanded prefix cache in a batch"""
+        expected = [self.generate([prompt])[0] for prompt in self.prompts]
+        self.assertEqual(self.generate(self.prompts, self.cache), expected)
+
+    def test_cached_entry_is_not_modified_by_generate(self):
+        first = self.generate([self.prompts[0]], self.cache)
+        self.generate([self.prompts[1]], self.cache)
+        self.assertEqual(self.generate([self.prompts[0]], self.cache), first)
+
+    def test_unmatched_prompt_is_prefilled_in_full(self):
+        other = encode_chat(self.tokenizer, build_filter_only_messages(CONTEXT))
+        self.assertIsNone(self.cache.match(other))
+
+        self.assertEqual(self.generate([other], self.cache), self.generate([other]))
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_scheduler_groups_prompts_by_prefix(self):
+        """Answer and filter-only prompts in one window run as two prefix-sharing batches"""
+        self.cache.register(chat_prefix_ids(self.tokenizer, FILTER_ONLY_SYSTEM_PROMPT))
+        prompts = self.prompts + [encode_chat(self.tokenizer, build_filter_only_messages(CONTEXT))]
+        expected = [self.generate([prompt])[0] for prompt in prompts]
+
+        scheduler = GenerationScheduler(
+            self.tokenizer, self.model, max_batch_size=8, max_wait_ms=300, prefix_cache=self.cache
+        )
+        with patch.object(Config, "MAX_NEW_TOKENS", 10), patch.object(Config, "DO_SAMPLE", False):
+            results = fan_out(prompts, scheduler.generate, max_workers=len(prompts))
+        scheduler.close()
+
+        self.assertEqual([response for response, _ in results], expected)
+        self.assertEqual(scheduler.stats()["batches"], 2)
+        self.assertEqual(self.cache.stats()["misses"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+import importlib
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import pipeline
+from config import Config
+from filter_search import FilterCatalog, build_catalog
+from pipeline import RAGPipeline
+
+CHUNKS = [{
+    'id': 'ca-1', 'score': 0.9,
+    'metadata': {'chunk_text': 'Dogs must be leashed.', 'state': 'ca', 'county': 'alameda-county', 'section': '1'},
+}]
+FILTERS = {'locations': [{'state': 'ca', 'county': ['alameda-county']}]}
+
+
+class WhitespaceTokenizer:
+    def __call__(self, text, add_special_tokens=False):
+        texts = [text] if isinstance(text, str) else text
+        ids = [list(range(len(t.split()))) for t in texts]
+        return {'input_ids': ids[0] if isinstance(text, str) else ids}
+
+
+class FakeBackend:
+    """Streams fixed pieces and records whether the consumer closed the stream early."""
+
+    name = "fake"
+    model = None
+
+    def __init__(self, pieces, error=None):
+        self.tokenizer = WhitespaceTokenizer()
+        self.pieces = pieces
+        self.error = error
+        self.closed_early = False
+
+    def generate(self, messages):
+        return "".join(self.pieces)
+
+    def stream(self, messages):
+        finished = False
+        try:
+            yield from self.pieces
+            if self.error is not None:
+                raise self.error
+            finished = True
+        finally:
+            self.closed_early = not finished and self.error is None
+
+
+def patch_config(test):
+    """Keys set, process-wide caches off, for the duration of the test."""
+    for name, value in (("PINECONE_API_KEY", "key"), ("HF_TOKEN", "token"),
+                        ("RETRIEVAL_CACHE_ENABLED", False), ("SEMANTIC_CACHE_ENABLED", False)):
+        patcher = patch.object(Config, name, value)
+        patcher.start()
+        test.addCleanup(patcher.stop)
+
+
+def make_pipeline(backend):
+    registry = MagicMock()
+    registry.pinecone.return_value = ("pc", "index")
+    registry.generation.return_value = backend
+    rag = RAGPipeline(use_reranking=False, registry=registry)
+    rag.retrieve_baseline = MagicMock(return_value=([0.1], CHUNKS))
+    return rag
+
+
+class TestRunStream(unittest.TestCase):
+
+    def setUp(self):
+        patch_config(self)
+
+    def test_event_order(self):
+        rag = make_pipeline(FakeBackend(["The law ", "says so."]))
+
+        events = list(rag.run_stream("do dogs need a leash?", FILTERS))
+
+        self.assertEqual([event for event, _ in events], ['chunks', 'token', 'token', 'done'])
+        self.assertEqual(events[0][1], CHUNKS)
+        self.assertEqual("".join(text for event, text in events if event == 'token'), "The law says so.")
+        self.assertEqual(events[-1][1]['pieces'], 2)
+
+    def test_closing_early_closes_the_llm_stream(self):
+        backend = FakeBackend(["one ", "two ", "three "])
+        stages = make_pipeline(backend).run_stream("do dogs need a leash?", FILTERS)
+
+        self.assertEqual(next(stages)[0], 'chunks')
+        self.assertEqual(next(stages), ('token', "one "))
+        stages.close()
+
+        self.assertTrue(backend.closed_early)
+
+
+class TestQueryStreamEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        patch_config(self)
+        # api.py builds its pipelines at import; give it pipelines over fake backends
+        self.backend = FakeBackend(["The law ", "says so."])
+        with patch.object(pipeline, "RAGPipeline", lambda use_reranking: make_pipeline(self.backend)):
+            sys.modules.pop("api", None)
+            self.api = importlib.import_module("api")
+        self.client = self.api.app.test_client()
+        self.body = {"query": "do dogs need a leash?", "filters": FILTERS, "mode": "baseline"}
+
+    def tearDown(self):
+        sys.modules.pop("api", None)
+
+    @staticmethod
+    def parse(raw):
+        events = []
+        for block in raw.strip().split("\n\n"):
+            event_line, data_line = block.split("\n")
+            events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+        return events
+
+    def test_chunks_then_tokens_then_done(self):
+        response = self.client.post("/query/stream", json=self.body)
+
+        self.assertEqual(response.mimetype, "text/event-stream")
+        events = self.parse(response.get_data(as_text=True))
+        self.assertEqual([event for event, _ in events], ['chunks', 'token', 'token', 'done'])
+        self.assertEqual(events[0][1]['chunks'][0]['id'], 'ca-1')
+        self.assertEqual(events[1][1], {"text": "The law "})
+
+    def test_failure_midway_ends_with_error(self):
+        self.backend.error = RuntimeError("CUDA out of memory")
+
+        events = self.parse(self.client.post("/query/stream", json=self.body).get_data(as_text=True))
+
+        self.assertEqual([event for event, _ in events], ['chunks', 'token', 'token', 'error'])
+        self.assertIn("CUDA out of memory", events[-1][1]['error'])
+
+    def test_client_disconnect_stops_generation(self):
+        response = self.client.post("/query/stream", json=self.body, buffered=False)
+        body = iter(response.response)
+        next(body)  # chunks
+        next(body)  # first token
+        response.close()
+
+        self.assertTrue(self.backend.closed_early)
+
+
+    def test_filter_only_query_returns_the_first_page_with_a_cursor(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        source, path = os.path.join(tmp.name, "chunks.parquet"), os.path.join(tmp.name, "catalog.parquet")
+        pq.write_table(pa.table({
+            "state": ["ca"] * 3, "county": ["alameda-county"] * 3, "chunk_text": ["a", "b", "c"],
+        }), source)
+        build_catalog(source, path)
+        catalog = FilterCatalog(path)
+        first_page = catalog.search({}, page_size=2)["matches"]
+        self.api.baseline_pipeline.retrieve_baseline.return_value = ([0.0], first_page)
+
+        with patch("pipeline.get_filter_catalog", return_value=catalog), \
+                patch("api.get_filter_catalog", return_value=catalog), \
+                patch.object(Config, "FILTER_ONLY_PAGE_SIZE", 2):
+            body = dict(self.body, query="")
+            result = self.client.post("/query", json=body).get_json()
+            rest = self.client.post("/filter", json={"filters": FILTERS, "cursor": result["next_cursor"]}).get_json()
+
+        self.assertEqual([chunk["id"] for chunk in result["chunks"]], [m["id"] for m in first_page])
+        self.assertEqual(result["total"], 3)
+        self.assertEqual(result["facets"]["county"], {"ca": {"alameda-county": 3}})
+        self.assertEqual([chunk["chunk_text"] for chunk in rest["chunks"]], ["c"])
+        self.assertIsNone(rest["next_cursor"])
+
+    def test_empty_query_without_filters_is_rejected(self):
+        response = self.client.post("/query", json={"query": " ", "filters": {}})
+
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
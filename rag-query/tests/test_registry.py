@@ -0,0 +1,79 @@
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from config import Config
+from pipeline import RAGPipeline
+from registry import ModelRegistry
+
+
+@patch.object(Config, "GENERATION_BATCHING_ENABLED", False)
+@patch.object(Config, "PREFIX_CACHE_ENABLED", False)
+class TestModelRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.pinecone_loader = MagicMock(return_value=("pc", "index"))
+        self.llm_loader = MagicMock(return_value=("tokenizer", "llm"))
+        self.reranker_loader = MagicMock(return_value="reranker")
+        self.tokenizer_loader = MagicMock(return_value="tokenizer")
+        self.draft_loader = MagicMock(return_value="draft")
+        self.registry = ModelRegistry(
+            self.pinecone_loader, self.llm_loader, self.reranker_loader, self.tokenizer_loader, self.draft_loader
+        )
+
+    @patch.object(Config, "TOKEN_CACHE_ENABLED", False)
+    @patch.object(Config, "RERANK_SERVICE_ENABLED", False)
+    @patch.object(Config, "PINECONE_API_KEY", "key")
+    @patch.object(Config, "HF_TOKEN", "token")
+    def test_pipelines_share_one_copy_of_each_model(self):
+        """Baseline and hybrid pipelines get the same LLM, client and reranker"""
+        baseline = RAGPipeline(use_reranking=False, registry=self.registry)
+        self.assertEqual(
+            self.registry.loaded(), {"pinecone": True, "llm": True, "draft": False, "generation": True, "reranker": False}
+        )
+
+        hybrid = RAGPipeline(use_reranking=True, registry=self.registry)
+
+        self.assertIs(baseline.model, hybrid.model)
+        self.assertIs(baseline.pc, hybrid.pc)
+        self.assertEqual(hybrid.reranker_model, "reranker")
+        self.assertIsNone(baseline.reranker_model)
+        self.llm_loader.assert_called_once()
+        self.pinecone_loader.assert_called_once()
+        self.reranker_loader.assert_called_once()
+
+    @patch.object(Config, "ASSISTED_GENERATION_ENABLED", True)
+    def test_draft_model_loaded_once_next_to_the_llm(self):
+        backend = self.registry.generation()
+
+        self.assertEqual((backend.model, backend.assistant_model), ("llm", "draft"))
+        self.assertIs(self.registry.draft_model(), backend.assistant_model)
+        self.draft_loader.assert_called_once()
+
+    @patch.object(Config, "GENERATION_BACKEND", "openai")
+    def test_remote_generation_skips_loading_the_llm(self):
+        backend = self.registry.generation()
+
+        self.assertEqual(backend.tokenizer, "tokenizer")
+        self.assertIsNone(backend.model)
+        self.llm_loader.assert_not_called()
+        backend.close()
+
+    def test_concurrent_first_access_loads_once(self):
+        barrier = threading.Barrier(4)
+
+        def load():
+            barrier.wait()
+            self.registry.llm()
+
+        threads = [threading.Thread(target=load) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.llm_loader.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import rerank_cache
+from config import Config
+from rerank_cache import RerankScoreCache
+from retrieval import score_candidates
+
+
+def make_match(chunk_id, text):
+    return {"id": chunk_id, "metadata": {"chunk_text": text}}
+
+
+class TestRerankScoreCache(unittest.TestCase):
+
+    def test_keys_normalize_query_and_include_model(self):
+        """Whitespace/case variants share scores; a different model does not"""
+        cache = RerankScoreCache(10, model_id="model-a")
+        cache.put_many("What  is a Permit?", {"c1": 0.7})
+
+        self.assertEqual(cache.get_many("what is a permit?", ["c1", "c2"]), {"c1": 0.7})
+        self.assertEqual(RerankScoreCache(10, model_id="model-b").get_many("what is a permit?", ["c1"]), {})
+
+    def test_lru_eviction(self):
+        """The least recently used score is evicted first"""
+        cache = RerankScoreCache(2, model_id="m")
+        cache.put_many("q", {"a": 1.0, "b": 2.0})
+        cache.get_many("q", ["a"])
+        cache.put_many("q", {"c": 3.0})
+
+        self.assertEqual(cache.get_many("q", ["a", "b", "c"]), {"a": 1.0, "c": 3.0})
+
+    def test_scores_survive_restart_on_disk(self):
+        """A new cache over the same SQLite file serves earlier scores"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rerank.sqlite")
+            RerankScoreCache(10, persist_path=path, model_id="m").put_many("q", {"c1": -1.25})
+
+            reopened = RerankScoreCache(10, persist_path=path, model_id="m")
+            self.assertEqual(reopened.get_many("q", ["c1"]), {"c1": -1.25})
+            reopened.store.close()
+
+
+class TestScoreCandidatesCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = RerankScoreCache(100, model_id="m")
+        patcher = patch.object(rerank_cache, "_rerank_cache", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch.object(Config, "RERANK_CACHE_ENABLED", True)
+    def test_only_misses_are_predicted(self):
+        """Cached pairs are skipped and fresh scores are written back"""
+        self.cache.put_many("q", {"c1": 0.9})
+        reranker = MagicMock(spec=["predict"])
+        reranker.predict.return_value = [0.1]
+
+        scores = score_candidates(reranker, "q", [make_match("c1", "cached"), make_match("c2", "fresh")])
+
+        self.assertEqual(scores, [0.9, 0.1])
+        self.assertEqual(reranker.predict.call_args[0][0], [("q", "fresh")])
+        self.assertEqual(self.cache.get_many("q", ["c2"]), {"c2": 0.1})
+
+        score_candidates(reranker, "q", [make_match("c1", "cached"), make_match("c2", "fresh")])
+        reranker.predict.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
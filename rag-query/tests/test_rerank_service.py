@@ -0,0 +1,92 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from fanout import fan_out
+from rerank_service import Histogram, RerankService
+
+
+class LengthModel:
+    """Scores a pair by its passage length and records each predict call."""
+
+    def __init__(self):
+        self.calls = []
+        self.batch_sizes = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def predict(self, pairs, batch_size=32):
+        self.release.wait(timeout=5)
+        self.calls.append(list(pairs))
+        self.batch_sizes.append(batch_size)
+        return np.array([float(len(passage)) for _, passage in pairs])
+
+
+class TestRerankService(unittest.TestCase):
+
+    def test_concurrent_requests_share_one_forward_pass(self):
+        """Requests arriving within the window are scored together and split back"""
+        model = LengthModel()
+        service = RerankService(model, max_batch_pairs=100, max_wait_ms=200)
+        requests = [[("q", "a" * n), ("q", "b" * (n + 10))] for n in range(1, 5)]
+
+        results = fan_out(requests, service.predict, max_workers=4)
+        service.close()
+
+        for pairs, (scores, error) in zip(requests, results):
+            self.assertIsNone(error)
+            np.testing.assert_array_equal(scores, [len(p) for _, p in pairs])
+        self.assertEqual(len(model.calls), 1)
+        stats = service.stats()
+        self.assertEqual((stats["requests"], stats["batches"], stats["pairs"]), (4, 1, 8))
+        self.assertEqual(stats["batch_pairs_histogram"]["<=8"], 1)
+
+    def test_collected_batch_is_forwarded_in_rerank_batch_size_chunks(self):
+        """Collection size and forward batch size are separate knobs"""
+        model = LengthModel()
+        service = RerankService(model, max_batch_pairs=256, max_wait_ms=0, forward_batch_size=16)
+
+        service.predict([("q", "x" * n) for n in range(1, 40)])
+        service.close()
+
+        self.assertEqual(model.batch_sizes, [16])
+
+    def test_batch_stops_at_max_pairs(self):
+        """A full batch is scored without waiting for the window to close"""
+        model = LengthModel()
+        model.release.clear()  # Hold the worker so requests queue up
+        service = RerankService(model, max_batch_pairs=2, max_wait_ms=10_000)
+
+        threads = [threading.Thread(target=service.predict, args=([("q", "x"), ("q", "yy")],)) for _ in range(3)]
+        for t in threads:
+            t.start()
+        model.release.set()
+        for t in threads:
+            t.join(timeout=5)
+        service.close()
+
+        self.assertEqual(service.stats()["batches"], 3)
+
+    def test_model_error_reaches_every_caller(self):
+        model = MagicMock(spec=["predict"])
+        model.predict.side_effect = RuntimeError("out of memory")
+        service = RerankService(model, max_wait_ms=0)
+
+        with self.assertRaises(RuntimeError):
+            service.predict([("q", "text")])
+        service.close()
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_power_of_two_buckets(self):
+        histogram = Histogram(max_bucket=4)
+        for value in [1, 2, 3, 4, 9]:
+            histogram.record(value)
+        self.assertEqual(histogram.snapshot(), {"<=1": 1, "<=2": 1, "<=4": 2, ">4": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from config import Config
+from retrieval import plan_location_groups, query_locations_grouped, rerank_locations
+
+
+def make_match(state, county, score):
+    return {"id": f"{county}#{score}", "score": score, "metadata": {"state": state, "county": county}}
+
+
+class TestPlanLocationGroups(unittest.TestCase):
+
+    @patch.object(Config, "PINECONE_MAX_TOP_K", 100)
+    @patch.object(Config, "GROUPED_QUERY_OVERSAMPLE", 2.0)
+    def test_groups_split_by_state_and_size(self):
+        """Groups never mix states and respect the top_k limit"""
+        locations = [{"state": "ca", "county": f"c{i}"} for i in range(12)]
+        locations.append({"state": "ga", "county": "fulton-county"})
+
+        groups = plan_location_groups(locations, quota=5)  # 100 // (5 * 2) = 10 per group
+
+        self.assertEqual(groups, [list(range(10)), [10, 11], [12]])
+
+
+class TestQueryLocationsGrouped(unittest.TestCase):
+
+    def setUp(self):
+        self.locations = [
+            {"state": "ca", "county": "alameda-county"},
+            {"state": "ca", "county": "butte-county"},
+        ]
+
+    def test_split_per_county_without_fallback(self):
+        """One grouped query should be split into per-county top-k lists"""
+        matches = [
+            make_match("ca", "alameda-county", 0.9),
+            make_match("ca", "butte-county", 0.8),
+            make_match("ca", "alameda-county", 0.7),
+            make_match("ca", "butte-county", 0.6),
+            make_match("ca", "alameda-county", 0.5),
+        ]
+        retrieve_fn = MagicMock(return_value={"matches": matches})
+
+        results = query_locations_grouped(self.locations, {}, retrieve_fn, quota=2)
+
+        self.assertEqual(retrieve_fn.call_count, 1)
+        group_filter, group_top_k = retrieve_fn.call_args.args
+        self.assertEqual(group_filter["county"], {"$in": ["alameda-county", "butte-county"]})
+        self.assertEqual(group_top_k, 8)
+        self.assertEqual([m["score"] for m in results[0][0]], [0.9, 0.7])
+        self.assertEqual([m["score"] for m in results[1][0]], [0.8, 0.6])
+
+    def test_under_quota_county_falls_back(self):
+        """A county crowded out of a full group result is queried on its own"""
+        group_matches = [make_match("ca", "alameda-county", 1.0 - i / 100) for i in range(8)]
+        butte_matches = [make_match("ca", "butte-county", 0.3), make_match("ca", "butte-county", 0.2)]
+
+        def retrieve_fn(pinecone_filter, top_k):
+            if len(pinecone_filter["county"]["$in"]) > 1:
+                return {"matches": group_matches}
+            return {"matches": butte_matches}
+
+        results = query_locations_grouped(self.locations, {}, retrieve_fn, quota=2)
+
+        self.assertEqual(len(results[0][0]), 2)
+        self.assertEqual(results[1][0], butte_matches)
+
+    def test_exhausted_group_skips_fallback(self):
+        """If the group returned fewer than top_k matches, short counties are complete"""
+        retrieve_fn = MagicMock(return_value={"matches": [make_match("ca", "alameda-county", 0.9)]})
+
+        results = query_locations_grouped(self.locations, {}, retrieve_fn, quota=2)
+
+        self.assertEqual(retrieve_fn.call_count, 1)
+        self.assertEqual(len(results[0][0]), 1)
+        self.assertEqual(results[1], ([], None))
+
+
+
+class TestRerankLocations(unittest.TestCase):
+
+    @patch.object(Config, "RERANK_CACHE_ENABLED", False)
+    @patch.object(Config, "RERANK_BATCH_SIZE", 8)
+    def test_single_length_sorted_pass_split_per_location(self):
+        """All locations are scored in one predict call over length-sorted pairs"""
+        texts = {"a1": "medium text", "a2": "a very long chunk of text", "b1": "tiny"}
+        scores = {"a1": 0.2, "a2": 0.9, "b1": 0.5}
+        lists = [
+            [{"id": "a1", "metadata": {"chunk_text": texts["a1"]}}, {"id": "a2", "metadata": {"chunk_text": texts["a2"]}}],
+            [{"id": "b1", "metadata": {"chunk_text": texts["b1"]}}],
+        ]
+        by_text = {text: scores[chunk_id] for chunk_id, text in texts.items()}
+        reranker = MagicMock(spec=["predict"])
+        reranker.predict.side_effect = lambda pairs, batch_size: [by_text[text] for _, text in pairs]
+
+        reranked = rerank_locations(reranker, "q", lists, top_n=1)
+
+        reranker.predict.assert_called_once()
+        pairs = reranker.predict.call_args[0][0]
+        self.assertEqual([text for _, text in pairs], [texts["b1"], texts["a1"], texts["a2"]])
+        self.assertEqual(reranker.predict.call_args[1]["batch_size"], 8)
+        self.assertEqual([[m["id"] for m in matches] for matches in reranked], [["a2"], ["b1"]])
+        self.assertEqual(reranked[1][0]["rerank_score"], 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
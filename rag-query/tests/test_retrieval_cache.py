@@ -0,0 +1,160 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from config import Config
+from kv_store import SQLiteStore
+from retrieval_cache import RetrievalCache, canonicalize_filters
+
+
+def make_index(total):
+    index = MagicMock()
+    index.describe_index_stats.return_value = {
+        "total_vector_count": total,
+        "namespaces": {"__default__": {"vector_count": total}},
+    }
+    return index
+
+
+class TestCanonicalizeFilters(unittest.TestCase):
+
+    def test_equivalent_filters_match(self):
+        """Location order, duplicates, unset ranges and int/float ranges don't change the key"""
+        a = {
+            "locations": [{"state": "ca", "county": "b"}, {"state": "ca", "county": "a"}],
+            "wc": {"min": 100, "max": None},
+            "penalty": "",
+        }
+        b = {
+            "locations": [{"state": "ca", "county": "a"}, {"state": "ca", "county": "b"}, {"state": "ca", "county": "a"}],
+            "wc": {"min": 100.0},
+        }
+        self.assertEqual(canonicalize_filters(a), canonicalize_filters(b))
+
+    def test_different_filters_differ(self):
+        self.assertNotEqual(
+            canonicalize_filters({"penalty": "Y"}),
+            canonicalize_filters({"penalty": "N"}),
+        )
+
+
+class TestRetrievalCache(unittest.TestCase):
+
+    def setUp(self):
+        self.filters = {"locations": [{"state": "ca", "county": "alameda-county"}]}
+
+    def test_hit_returns_copy(self):
+        cache = RetrievalCache(max_entries=4)
+        index = make_index(10)
+        retrieve = MagicMock(return_value=[{"id": "a", "score": 0.5, "metadata": {}}])
+
+        first = cache.get_or_retrieve(index, "baseline", [0.1, 0.2], self.filters, retrieve)
+        first[0]["rerank_score"] = 1.0  # callers mutate matches in place
+        second = cache.get_or_retrieve(index, "baseline", [0.1, 0.2], self.filters, retrieve)
+
+        self.assertEqual(retrieve.call_count, 1)
+        self.assertNotIn("rerank_score", second[0])
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_mode_and_embedding_are_part_of_the_key(self):
+        cache = RetrievalCache(max_entries=4)
+        index = make_index(10)
+        retrieve = MagicMock(return_value=[])
+
+        cache.get_or_retrieve(index, "baseline", [0.1, 0.2], self.filters, retrieve)
+        cache.get_or_retrieve(index, "hybrid", ([0.1, 0.2], {"indices": [1], "values": [0.3]}), self.filters, retrieve)
+        cache.get_or_retrieve(index, "baseline", [0.2, 0.1], self.filters, retrieve)
+
+        self.assertEqual(retrieve.call_count, 3)
+
+    def test_index_version_change_invalidates(self):
+        cache = RetrievalCache(max_entries=4, version_check_seconds=0)
+        index = make_index(10)
+        retrieve = MagicMock(return_value=[])
+
+        cache.get_or_retrieve(index, "baseline", [0.1], self.filters, retrieve)
+        index.describe_index_stats.return_value = {"total_vector_count": 11, "namespaces": {}}
+        cache.get_or_retrieve(index, "baseline", [0.1], self.filters, retrieve)
+
+        self.assertEqual(retrieve.call_count, 2)
+        self.assertEqual(cache.stats()["invalidations"], 1)
+
+    def test_partial_result_is_not_cached(self):
+        """A retrieval with a failed location is returned but retried next time"""
+        cache = RetrievalCache(max_entries=4)
+        index = make_index(10)
+
+        def retrieve(failed_locations):
+            failed_locations.append({"state": "ca", "county": "kern-county"})
+            return [{"id": "a", "score": 0.5}]
+
+        self.assertEqual(cache.get_or_retrieve(index, "hybrid", [0.1], self.filters, retrieve), [{"id": "a", "score": 0.5}])
+        complete = MagicMock(return_value=[])
+        cache.get_or_retrieve(index, "hybrid", [0.1], self.filters, complete)
+        cache.get_or_retrieve(index, "hybrid", [0.1], self.filters, complete)
+
+        self.assertEqual(complete.call_count, 1)
+
+    def test_result_changing_settings_are_part_of_the_key(self):
+        cache = RetrievalCache(max_entries=8)
+        key = cache.make_key("hybrid", [0.1], self.filters, "v1")
+        for name, value in (
+            ("RERANKER_MODEL_ID", "other-reranker"), ("RERANKER_BACKEND", "onnx"), ("ADAPTIVE_DEPTH_MIN", 3),
+            ("DEDUP_ENABLED", False), ("CASCADE_SHORTLIST_SIZE", 7), ("GROUPED_COUNTY_QUERIES", False),
+            ("METADATA_CATALOG_PATH", "catalog.parquet"),
+        ):
+            with self.subTest(name=name), patch.object(Config, name, value):
+                self.assertNotEqual(cache.make_key("hybrid", [0.1], self.filters, "v1"), key)
+        self.assertEqual(cache.make_key("hybrid", [0.1], self.filters, "v1"), key)
+
+    def test_lru_eviction(self):
+        cache = RetrievalCache(max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.put(key, [])
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("c"), [])
+
+    def test_persistence_survives_restart(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "retrieval.sqlite")
+            index = make_index(10)
+            retrieve = MagicMock(return_value=[{"id": "a", "score": 0.5}])
+
+            RetrievalCache(4, persist_path=path).get_or_retrieve(index, "baseline", [0.1], self.filters, retrieve)
+            restarted = RetrievalCache(4, persist_path=path)
+            chunks = restarted.get_or_retrieve(index, "baseline", [0.1], self.filters, retrieve)
+
+            self.assertEqual(retrieve.call_count, 1)
+            self.assertEqual(chunks, [{"id": "a", "score": 0.5}])
+
+
+class TestSQLiteStore(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = SQLiteStore(os.path.join(tmp, "kv.sqlite"), max_entries=2)
+            store.put("a", b"1")
+            store.put("b", b"2")
+            store.get("a")  # "b" is now least recently used
+            store.put("c", b"3")
+
+            self.assertEqual(sorted(store.keys()), ["a", "c"])
+            self.assertEqual(store.get_many(["a", "c", "x"]), {"a": b"1", "c": b"3"})
+            store.close()
+
+    def test_evicts_least_recently_used_past_max_bytes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = SQLiteStore(os.path.join(tmp, "kv.sqlite"), max_entries=100, max_bytes=10)
+            store.put("a", b"1234")
+            store.put("b", b"1234")
+            store.get("a")  # "b" is now least recently used
+            store.put("c", b"1234")
+
+            self.assertEqual(sorted(store.keys()), ["a", "c"])
+            self.assertEqual(store.size_bytes(), 8)
+            store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from semantic_cache import SemanticAnswerCache
+
+
+class TestSemanticAnswerCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = SemanticAnswerCache(max_entries=2, threshold=0.95)
+        self.filters = {"locations": [{"state": "ca", "county": "alameda-county"}]}
+
+    def test_near_duplicate_with_same_chunks_hits(self):
+        self.cache.store([1.0, 0.0, 0.0], "hybrid", self.filters, ["a", "b"], "answer")
+        cached = self.cache.lookup([0.99, 0.05, 0.0], "hybrid", self.filters, ["b", "a"])
+
+        self.assertEqual(cached, "answer")
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_dissimilar_question_misses(self):
+        self.cache.store([1.0, 0.0, 0.0], "hybrid", self.filters, ["a"], "answer")
+        self.assertIsNone(self.cache.lookup([0.0, 1.0, 0.0], "hybrid", self.filters, ["a"]))
+
+    def test_different_chunks_miss(self):
+        """A similar question over a different context must be regenerated"""
+        self.cache.store([1.0, 0.0, 0.0], "hybrid", self.filters, ["a"], "answer")
+        self.assertIsNone(self.cache.lookup([1.0, 0.0, 0.0], "hybrid", self.filters, ["a", "c"]))
+        self.assertEqual(self.cache.stats()["context_mismatches"], 1)
+
+    def test_different_locations_miss(self):
+        self.cache.store([1.0, 0.0, 0.0], "hybrid", self.filters, ["a"], "answer")
+        other = {"locations": [{"state": "ga", "county": "fulton-county"}]}
+        self.assertIsNone(self.cache.lookup([1.0, 0.0, 0.0], "hybrid", other, ["a"]))
+
+    def test_evicts_least_recently_used(self):
+        self.cache.store([1.0, 0.0], "hybrid", self.filters, ["a"], "first")
+        self.cache.store([0.0, 1.0], "hybrid", self.filters, ["b"], "second")
+        self.cache.lookup([1.0, 0.0], "hybrid", self.filters, ["a"])  # "second" is now least recently used
+        self.cache.store([0.7, -0.7], "hybrid", self.filters, ["c"], "third")
+
+        self.assertEqual(self.cache.lookup([1.0, 0.0], "hybrid", self.filters, ["a"]), "first")
+        self.assertIsNone(self.cache.lookup([0.0, 1.0], "hybrid", self.filters, ["b"]))
+        self.assertEqual(self.cache.stats()["size"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
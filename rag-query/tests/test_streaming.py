@@ -0,0 +1,121 @@
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from config import Config
+from encoding import get_embedding_cache
+from retrieval import run_query_for_each_location_reranking
+from streaming import RerankStream
+
+
+def length_scores(reranker_model, query, matches):
+    return [float(len(m["id"])) for m in matches]
+
+
+class TestRerankStream(unittest.TestCase):
+
+    def test_queued_locations_share_a_micro_batch(self):
+        """Locations queued before the worker runs are drained into one batch"""
+        score_fn = MagicMock(side_effect=length_scores)
+        stream = RerankStream(None, "q", score_fn, micro_batch_pairs=10)
+        stream.submit(0, [{"id": "a"}, {"id": "bbb"}])
+        stream.submit(1, [{"id": "cc"}])
+        stream.submit(0, [{"id": "ignored"}])  # Duplicate submission keeps the first list
+
+        results = stream.start().finish()
+
+        score_fn.assert_called_once()
+        self.assertEqual(stream.batches, 1)
+        self.assertEqual([m["rerank_score"] for m in results[0]], [1.0, 3.0])
+        self.assertEqual(results[1][0]["rerank_score"], 2.0)
+
+    def test_prepare_runs_once_per_micro_batch(self):
+        """The prepare step sees every location drained into the micro-batch at once"""
+        prepare_fn = MagicMock(side_effect=lambda query, lists: [matches[:1] for matches in lists])
+        stream = RerankStream(None, "q", length_scores, micro_batch_pairs=10, prepare_fn=prepare_fn)
+        stream.submit(0, [{"id": "a"}, {"id": "bbb"}])
+        stream.submit(1, [{"id": "cc"}, {"id": "d"}])
+
+        results = stream.start().finish()
+
+        prepare_fn.assert_called_once()
+        self.assertEqual(len(prepare_fn.call_args.args[1]), 2)
+        self.assertEqual({i: [m["id"] for m in matches] for i, matches in results.items()}, {0: ["a"], 1: ["cc"]})
+        self.assertEqual(stream.pairs, 2)
+
+    def test_micro_batch_size_bounds_draining(self):
+        """Draining stops once the micro-batch reaches its pair budget"""
+        stream = RerankStream(None, "q", length_scores, micro_batch_pairs=2)
+        for i in range(4):
+            stream.submit(i, [{"id": "x"}, {"id": "y"}])
+
+        results = stream.start().finish()
+
+        self.assertEqual(stream.batches, 4)
+        self.assertEqual(sorted(results), [0, 1, 2, 3])
+
+    def test_scoring_error_is_raised_by_finish(self):
+        def fail(reranker_model, query, matches):
+            raise RuntimeError("model crashed")
+
+        stream = RerankStream(None, "q", fail).start()
+        stream.submit(0, [{"id": "a"}])
+        stream.submit(1, [{"id": "b"}])
+
+        with self.assertRaises(RuntimeError):
+            stream.finish(timeout=5)
+
+
+class TestStreamingRerankPipeline(unittest.TestCase):
+
+    def setUp(self):
+        get_embedding_cache().clear()
+
+    @patch.object(Config, "STREAMING_RERANK", True)
+    @patch.object(Config, "GROUPED_COUNTY_QUERIES", False)
+    @patch.object(Config, "RERANK_CACHE_ENABLED", False)
+    def test_fast_location_is_scored_while_slow_query_is_in_flight(self):
+        """Reranking starts before the slowest location query returns"""
+        mock_pc = MagicMock()
+        mock_pc.inference.embed.return_value = [
+            {"values": [0.1] * 4, "sparse_indices": [1], "sparse_values": [0.5]}
+        ]
+        first_rerank_done = threading.Event()
+
+        def query(**kwargs):
+            county = kwargs["filter"]["county"]["$in"][0]
+            if county == "slow-county":
+                # Only returns once the fast county has been reranked.
+                self.assertTrue(first_rerank_done.wait(timeout=5))
+            if county == "bad-county":
+                raise RuntimeError("timeout")
+            return {"matches": [
+                {"id": f"{county}-{i}", "score": 1.0 - i / 10, "metadata": {"chunk_text": f"text {i}"}}
+                for i in range(3)
+            ]}
+
+        mock_index = MagicMock()
+        mock_index.query.side_effect = query
+
+        reranker = MagicMock(spec=["predict"])
+
+        def predict(pairs, batch_size):
+            first_rerank_done.set()
+            return [float(len(text)) for _, text in pairs]
+
+        reranker.predict.side_effect = predict
+        filters = {"locations": [
+            {"state": "ca", "county": "slow-county"},
+            {"state": "ca", "county": "bad-county"},
+            {"state": "ca", "county": "fast-county"},
+        ]}
+
+        chunks = run_query_for_each_location_reranking(mock_pc, mock_index, reranker, "dogs", filters, False)
+
+        self.assertEqual(reranker.predict.call_count, 2)
+        self.assertEqual({c["id"].rsplit("-", 1)[0] for c in chunks}, {"slow-county", "fast-county"})
+        self.assertTrue(all("rerank_score" in c for c in chunks))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from tests.test_onnx_reranker import save_tiny_cross_encoder
+from token_cache import (
+    PairTemplate,
+    PassageTokenCache,
+    TokenCachingReranker,
+    collate_pairs,
+    truncate_longest_first,
+)
+
+
+class TestPassageTokenCache(unittest.TestCase):
+
+    def test_evicts_least_recently_used_past_token_budget(self):
+        cache = PassageTokenCache(max_tokens=5)
+        cache.put("a", np.arange(2))
+        cache.put("b", np.arange(2))
+        cache.get("a")
+        cache.put("c", np.arange(2))  # 6 tokens > 5: evicts "b"
+
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertEqual(cache.stats()["tokens"], 4)
+
+
+class TestTruncateLongestFirst(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        from transformers import AutoTokenizer
+
+        cls.tmp = tempfile.TemporaryDirectory()
+        save_tiny_cross_encoder(cls.tmp.name)
+        cls.tokenizer = AutoTokenizer.from_pretrained(cls.tmp.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_matches_fast_tokenizer(self):
+        """Same lengths as the tokenizer's own longest_first truncation, odd and even alike"""
+        template = PairTemplate(self.tokenizer)
+        for q in range(1, 14):
+            for p in range(1, 14):
+                for budget in range(2, 24):
+                    encoded = self.tokenizer(
+                        " ".join(["dogs"] * q), " ".join(["leash"] * p), truncation="longest_first",
+                        max_length=budget + template.num_special, return_token_type_ids=True
+                    )
+                    types = encoded["token_type_ids"]
+                    expected = (
+                        types.count(template.query_type) - len(template.prefix) - len(template.middle),
+                        types.count(template.passage_type) - len(template.suffix),
+                    )
+                    self.assertEqual(truncate_longest_first(q, p, budget), expected, (q, p, budget))
+
+
+class TestCollateAndReranker(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        from transformers import AutoTokenizer
+
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.model_dir = os.path.join(cls.tmp.name, "model")
+        save_tiny_cross_encoder(cls.model_dir)
+        cls.tokenizer = AutoTokenizer.from_pretrained(cls.model_dir)
+        cls.pairs = [
+            ("dogs in parks", "dogs must be on a leash in public parks " * 3),
+            ("fence permit required", "permit required for fences taller than six feet"),
+            ("leash", "a leash"),
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_collate_matches_pair_tokenization(self):
+        """Cached-token collation gives the tokenizer's own padded, truncated inputs"""
+        max_length = 16
+        expected = self.tokenizer(
+            [q for q, _ in self.pairs], [p for _, p in self.pairs],
+            padding=True, truncation="longest_first", max_length=max_length, return_tensors="np"
+        )
+        query_ids = self.tokenizer([q for q, _ in self.pairs], add_special_tokens=False)["input_ids"]
+        passage_ids = self.tokenizer([p for _, p in self.pairs], add_special_tokens=False)["input_ids"]
+
+        features = collate_pairs(PairTemplate(self.tokenizer), query_ids, passage_ids, max_length)
+
+        for name in ("input_ids", "attention_mask", "token_type_ids"):
+            np.testing.assert_array_equal(features[name], expected[name])
+
+    def test_reranker_scores_match_cross_encoder_and_reuse_tokens(self):
+        """Scores equal CrossEncoder.predict, and repeated chunks skip tokenization"""
+        from sentence_transformers.cross_encoder import CrossEncoder
+
+        model = CrossEncoder(self.model_dir, device="cpu", max_length=32)
+        reranker = TokenCachingReranker(model, cache=PassageTokenCache(10_000), max_length=32)
+        items = [(q, f"chunk-{i}", p) for i, (q, p) in enumerate(self.pairs)]
+
+        expected = model.predict(self.pairs, batch_size=2)
+        np.testing.assert_allclose(reranker.predict_items(items, batch_size=2), expected, atol=1e-5)
+        np.testing.assert_allclose(reranker.predict_items(items, batch_size=2), expected, atol=1e-5)
+
+        stats = reranker.cache.stats()
+        self.assertEqual((stats["misses"], stats["hits"]), (3, 3))
+
+    def test_rerankers_with_other_max_length_do_not_share_entries(self):
+        """A chunk cached truncated for one reranker is re-tokenized for a longer one"""
+        from sentence_transformers.cross_encoder import CrossEncoder
+
+        model = CrossEncoder(self.model_dir, device="cpu", max_length=32)
+        cache = PassageTokenCache(10_000)
+        short = TokenCachingReranker(model, cache=cache, max_length=8)
+        long = TokenCachingReranker(model, cache=cache, max_length=32)
+        items = [(query, "chunk-0", passage) for query, passage in self.pairs[:1]]
+
+        short.predict_items(items)
+        np.testing.assert_allclose(long.predict_items(items), model.predict(self.pairs[:1]), atol=1e-5)
+
+        self.assertEqual(cache.stats()["entries"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
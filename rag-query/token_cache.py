@@ -0,0 +1,292 @@
+"""
+Pre-tokenized passage cache for cross-encoder inputs.
+
+The same chunk texts, often hundreds of tokens each, come back for many
+queries. Their token IDs are cached in an LRU bounded by total tokens and
+keyed by (tokenizer, max_length, chunk ID), so a rerank only tokenizes the
+query and rerankers with different tokenizers or lengths can share the cache.
+Pairs are then assembled with the tokenizer's own special-token template and
+'longest_first' truncation, giving the same model inputs as tokenizing the
+(query, passage) pair directly with a fast tokenizer.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import Config
+
+
+class PassageTokenCache:
+    """LRU cache of passage token IDs, bounded by total tokens."""
+
+    def __init__(self, max_tokens: int):
+        """
+        Initialize the cache.
+
+        Args:
+            max_tokens: Maximum token IDs held across all entries
+        """
+        self.max_tokens = max_tokens
+        self._entries: "OrderedDict[Hashable, np.ndarray]" = OrderedDict()
+        self._tokens = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        """Return cached token IDs for a passage key, or None."""
+        with self._lock:
+            ids = self._entries.get(key)
+            if ids is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return ids
+
+    def put(self, key: Hashable, ids: np.ndarray) -> None:
+        """Cache token IDs for a passage key, evicting least recently used entries past max_tokens."""
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._tokens -= len(previous)
+            self._entries[key] = ids
+            self._tokens += len(ids)
+            while self._tokens > self.max_tokens and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._tokens -= len(evicted)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tokens = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit-rate metrics and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "tokens": self._tokens,
+                "max_tokens": self.max_tokens,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Shared by every reranker wrapper in the process.
+_passage_token_cache = PassageTokenCache(Config.TOKEN_CACHE_MAX_TOKENS)
+
+
+def get_passage_token_cache() -> PassageTokenCache:
+    """Return the process-wide passage token cache."""
+    return _passage_token_cache
+
+
+class PairTemplate:
+    """A tokenizer's special-token layout for (query, passage) pairs."""
+
+    def __init__(self, tokenizer: Any):
+        """
+        Derive the template by encoding a probe pair and locating the special tokens.
+
+        Args:
+            tokenizer: Hugging Face tokenizer
+        """
+        probe = tokenizer("a", "b", return_special_tokens_mask=True, return_token_type_ids=True)
+        ids = probe['input_ids']
+        special = probe['special_tokens_mask']
+        types = probe.get('token_type_ids') or [0] * len(ids)
+
+        # Layout: prefix specials, query run, middle specials, passage run, suffix specials.
+        runs, start = [], None
+        for i, is_special in enumerate(special + [1]):
+            if not is_special and start is None:
+                start = i
+            elif is_special and start is not None:
+                runs.append((start, i))
+                start = None
+        if len(runs) != 2:
+            raise ValueError("Unsupported tokenizer pair template")
+        (a_start, a_end), (b_start, b_end) = runs
+
+        self.prefix = ids[:a_start]
+        self.middle = ids[a_end:b_start]
+        self.suffix = ids[b_end:]
+        self.prefix_types = types[:a_start]
+        self.middle_types = types[a_end:b_start]
+        self.suffix_types = types[b_end:]
+        self.query_type = types[a_start]
+        self.passage_type = types[b_start]
+        self.num_special = len(self.prefix) + len(self.middle) + len(self.suffix)
+        self.pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else 0
+        self.returns_token_type_ids = 'token_type_ids' in tokenizer.model_input_names
+
+
+def truncate_longest_first(query_len: int, passage_len: int, budget: int) -> Tuple[int, int]:
+    """
+    Lengths after a fast tokenizer's 'longest_first' truncation.
+
+    The shorter sequence (the query on ties) keeps up to half the budget and
+    the longer one gets the rest, so with an odd budget the extra token goes
+    to the longer sequence.
+
+    Args:
+        query_len: Query tokens
+        passage_len: Passage tokens
+        budget: Tokens available for both (max_length minus special tokens)
+
+    Returns:
+        Tuple of (query_len, passage_len)
+    """
+    if query_len + passage_len <= budget:
+        return query_len, passage_len
+    if query_len <= passage_len:
+        query_len = min(query_len, budget // 2)
+        return query_len, min(passage_len, budget - query_len)
+    passage_len = min(passage_len, budget // 2)
+    return min(query_len, budget - passage_len), passage_len
+
+
+def collate_pairs(
+    template: PairTemplate,
+    query_ids: Sequence[Sequence[int]],
+    passage_ids: Sequence[Sequence[int]],
+    max_length: int
+) -> Dict[str, np.ndarray]:
+    """
+    Assemble padded model inputs from pre-tokenized queries and passages.
+
+    Args:
+        template: Special-token layout of the tokenizer
+        query_ids: Query token IDs (no special tokens), one per pair
+        passage_ids: Passage token IDs (no special tokens), one per pair
+        max_length: Maximum tokens per pair, special tokens included
+
+    Returns:
+        {'input_ids', 'attention_mask'[, 'token_type_ids']} int64 arrays of shape (pairs, longest)
+    """
+    budget = max_length - template.num_special
+    lengths = [
+        truncate_longest_first(len(q), len(p), budget) for q, p in zip(query_ids, passage_ids)
+    ]
+    width = max((q + p for q, p in lengths), default=0) + template.num_special
+
+    input_ids = np.full((len(lengths), width), template.pad_id, dtype=np.int64)
+    attention_mask = np.zeros((len(lengths), width), dtype=np.int64)
+    token_type_ids = np.zeros((len(lengths), width), dtype=np.int64)
+
+    for row, ((q_len, p_len), q, p) in enumerate(zip(lengths, query_ids, passage_ids)):
+        ids = [*template.prefix, *q[:q_len], *template.middle, *p[:p_len], *template.suffix]
+        types = [
+            *template.prefix_types, *[template.query_type] * q_len, *template.middle_types,
+            *[template.passage_type] * p_len, *template.suffix_types
+        ]
+        input_ids[row, :len(ids)] = ids
+        attention_mask[row, :len(ids)] = 1
+        token_type_ids[row, :len(types)] = types
+
+    features = {'input_ids': input_ids, 'attention_mask': attention_mask}
+    if template.returns_token_type_ids:
+        features['token_type_ids'] = token_type_ids
+    return features
+
+
+class TokenCachingReranker:
+    """Reranker wrapper that reuses cached passage tokens."""
+
+    def __init__(self, model: Any, cache: Optional[PassageTokenCache] = None, max_length: Optional[int] = None):
+        """
+        Wrap a loaded reranker.
+
+        Args:
+            model: CrossEncoder or OnnxCrossEncoder (anything with .tokenizer and predict)
+            cache: Passage token cache (defaults to the process-wide cache)
+            max_length: Maximum tokens per pair (defaults to Config.RERANKER_MAX_LENGTH)
+        """
+        self.model = model
+        self.tokenizer = model.tokenizer
+        self.cache = cache if cache is not None else _passage_token_cache
+        self.max_length = min(max_length or Config.RERANKER_MAX_LENGTH, self.tokenizer.model_max_length)
+        self.template = PairTemplate(self.tokenizer)
+        # Token IDs depend on the tokenizer and are stored truncated to max_length.
+        tokenizer_name = getattr(self.tokenizer, 'name_or_path', None) or f"tokenizer-{id(self.tokenizer)}"
+        self.cache_namespace = (tokenizer_name, self.max_length)
+
+    def predict(self, pairs: Sequence[Tuple[str, str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """Score plain (query, passage) pairs; passages have no ID, so nothing is cached."""
+        return self.predict_items([(query, None, passage) for query, passage in pairs], batch_size)
+
+    def tokenize_passages(self, items: Sequence[Tuple[str, Optional[str], str]]) -> List[Sequence[int]]:
+        """Token IDs for each item's passage, from the cache where possible."""
+        passage_ids: List[Optional[Sequence[int]]] = [None] * len(items)
+        to_tokenize: List[int] = []
+        for i, (_, chunk_id, _) in enumerate(items):
+            cached = self.cache.get((*self.cache_namespace, chunk_id)) if chunk_id is not None else None
+            if cached is None:
+                to_tokenize.append(i)
+            else:
+                passage_ids[i] = cached
+
+        if to_tokenize:
+            encoded = self.tokenizer([items[i][2] for i in to_tokenize], add_special_tokens=False)['input_ids']
+            for i, ids in zip(to_tokenize, encoded):
+                # Nothing past max_length can ever reach the model.
+                ids = np.asarray(ids[:self.max_length], dtype=np.int32)
+                passage_ids[i] = ids
+                if items[i][1] is not None:
+                    self.cache.put((*self.cache_namespace, items[i][1]), ids)
+        return passage_ids
+
+    def predict_items(self, items: Sequence[Tuple[str, Optional[str], str]], batch_size: int = 32) -> np.ndarray:
+        """
+        Score (query, chunk_id, passage) items.
+
+        Args:
+            items: Triples; chunk_id None disables caching for that passage
+            batch_size: Pairs per forward pass
+
+        Returns:
+            One score per item
+        """
+        if not items:
+            return np.zeros(0, dtype=np.float32)
+
+        queries = list(dict.fromkeys(query for query, _, _ in items))
+        query_tokens = dict(zip(queries, self.tokenizer(queries, add_special_tokens=False)['input_ids']))
+        query_ids = [query_tokens[query] for query, _, _ in items]
+        passage_ids = self.tokenize_passages(items)
+
+        # Token lengths are known exactly here, so bucket on them.
+        order = np.argsort([len(q) + len(p) for q, p in zip(query_ids, passage_ids)], kind="stable")
+        scores = np.empty(len(items), dtype=np.float32)
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            features = collate_pairs(
+                self.template, [query_ids[i] for i in rows], [passage_ids[i] for i in rows], self.max_length
+            )
+            scores[rows] = self._forward(features)
+        return scores
+
+    def _forward(self, features: Dict[str, np.ndarray]) -> np.ndarray:
+        if hasattr(self.model, 'score_features'):  # OnnxCrossEncoder
+            return self.model.score_features(features)
+
+        import torch
+
+        hf_model = self.model.model
+        device = next(hf_model.parameters()).device
+        with torch.inference_mode():
+            logits = hf_model(**{name: torch.from_numpy(array).to(device) for name, array in features.items()}).logits
+            activation_fn = getattr(self.model, 'activation_fn', None)
+            if activation_fn is not None:
+                logits = activation_fn(logits)
+        logits = logits.float().cpu().numpy()
+        return logits[:, 0] if logits.shape[1] == 1 else logits